@@ -13,9 +13,9 @@ from langchain_core.messages.utils import (
     trim_messages,
     count_tokens_approximately
 )
-from langgraph.checkpoint.serde.encrypted import EncryptedSerializer
-from langgraph.checkpoint.sqlite import SqliteSaver
-import sqlite3
+from saarthi_assistant.sub_graphs.checkpointing import create_checkpointer
+from langgraph.checkpoint.base import BaseCheckpointSaver
+import os
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -40,10 +40,11 @@ qwen_fast = ChatOllama(
     repeat_penalty=1.5
 )
 
-# Setup Checkopoint store for short-term memory
-checkpointer = SqliteSaver(
-    sqlite3.connect("checkpoint.db", check_same_thread=False),
-    serde=EncryptedSerializer.from_pycryptodome_aes(),
+# Setup Checkopoint store for short-term memory: "sqlite" (default) or "memory"
+checkpointer = create_checkpointer(
+    "checkpoint.db",
+    os.getenv("SAARTHI_CHECKPOINTER", "sqlite"),
+    ttl_seconds=float(os.getenv("SAARTHI_CHECKPOINT_TTL_MINUTES", 60)) * 60,
 )
 
 MAX_MESSAGE_HISTORY = 10
@@ -744,7 +745,8 @@ def fill_secure_form(
 
 
 # Graph factory function
-def create_saarthi_graph(identity_manager: IdentityManager, camera_id: int = 0):
+def create_saarthi_graph(identity_manager: IdentityManager, camera_id: int = 0,
+                         graph_checkpointer: Optional[BaseCheckpointSaver] = None):
     """Create the refactored Saarthi graph with dependency injection"""
 
     # Set up the runtime context
@@ -826,7 +828,7 @@ def create_saarthi_graph(identity_manager: IdentityManager, camera_id: int = 0):
     builder.add_edge("tools", "query_handler")
     builder.add_edge("error_handler", END)
 
-    return builder.compile(checkpointer=checkpointer)
+    return builder.compile(checkpointer=graph_checkpointer or checkpointer)
 
 
 # Main execution
@@ -0,0 +1,93 @@
+"""
+Concurrency check: parallel graph sessions on the original shared-connection
+SqliteSaver versus ThreadLocalSqliteSaver (WAL, one connection per thread).
+
+Each session is its own thread_id running a few steps of a small graph; the run
+fails if any session's final state is wrong.
+
+Usage:
+    LANGGRAPH_AES_KEY=... python -m benchmarks.checkpoint_concurrency_benchmark --threads 8 --sessions 64
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, List
+
+from typing_extensions import TypedDict
+from langchain_core.messages import AIMessage
+from langgraph.graph import StateGraph, START, END, add_messages
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from saarthi_assistant.sub_graphs.checkpointing import ThreadLocalSqliteSaver, create_checkpoint_serializer
+
+
+class BenchmarkState(TypedDict):
+    messages: Annotated[List, add_messages]
+    steps: int
+
+
+def respond(state: BenchmarkState) -> BenchmarkState:
+    # A search-result sized reply, like government_scheme_lookup output
+    reply = " ".join(f"scheme {state['steps']}-{i} eligibility criteria and documents" for i in range(200))
+    return {"messages": [AIMessage(content=reply)], "steps": state["steps"] + 1}
+
+
+def build_graph(checkpointer):
+    builder = StateGraph(BenchmarkState)
+    builder.add_node("respond", respond)
+    builder.add_edge(START, "respond")
+    builder.add_edge("respond", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def run_session(graph, session: int, turns: int) -> bool:
+    config = {"configurable": {"thread_id": f"bench_{session}"}}
+    steps = 0
+    for turn in range(turns):
+        result = graph.invoke({"messages": [("user", f"turn {turn}")], "steps": steps}, config)
+        steps = result["steps"]
+        graph.get_state(config)
+    return steps == turns and len(graph.get_state(config).values["messages"]) == 2 * turns
+
+
+def run(name: str, checkpointer, threads: int, sessions: int, turns: int):
+    graph = build_graph(checkpointer)
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda session: run_session(graph, session, turns), range(sessions)))
+    elapsed = time.perf_counter() - started_at
+    if not all(results):
+        raise AssertionError(f"{name}: {results.count(False)} sessions ended with the wrong state")
+    print(f"  {name:<28} {elapsed:7.2f} s  {sessions * turns / elapsed:8.1f} turns/s")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--sessions", type=int, default=64)
+    parser.add_argument("--turns", type=int, default=5)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="saarthi_checkpoints_")
+    shared_path = os.path.join(work_dir, "shared.db")
+    tuned_path = os.path.join(work_dir, "tuned.db")
+
+    shared_conn = sqlite3.connect(shared_path, check_same_thread=False)
+    # The pre-WAL layout: rollback journal, one connection, one lock
+    shared_conn.execute("PRAGMA journal_mode = DELETE")
+    shared = SqliteSaver(shared_conn, serde=create_checkpoint_serializer())
+    shared.setup()
+    shared_conn.execute("PRAGMA journal_mode = DELETE")
+    tuned = ThreadLocalSqliteSaver(tuned_path, serde=create_checkpoint_serializer())
+
+    print(f"{args.sessions} sessions x {args.turns} turns on {args.threads} threads")
+    baseline = run("shared connection", shared, args.threads, args.sessions, args.turns)
+    improved = run("per-thread WAL connections", tuned, args.threads, args.sessions, args.turns)
+    print(f"  speedup: {baseline / improved:.2f}x")
+
+    shared_conn.close()
+    tuned.close()
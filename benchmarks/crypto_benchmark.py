@@ -0,0 +1,56 @@
+"""
+Microbenchmark: per-call AES-GCM (encrypt_with_key / decrypt_with_key) versus the
+batch path (encrypt_batch / decrypt_batch) for DEK-sized and PII-sized payloads.
+
+Usage:
+    python -m benchmarks.crypto_benchmark --count 10000
+"""
+import argparse
+import secrets
+import time
+
+from saarthi_assistant.identity_wallet.utilities.crypto_manager import CryptoManager
+
+
+def _time(func, repeat: int) -> float:
+    """Best wall time of `repeat` runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(count: int, payload_size: int, repeat: int = 5):
+    key = CryptoManager.generate_key()
+    payloads = [secrets.token_bytes(payload_size) for _ in range(count)]
+    sealed = [CryptoManager.encrypt_with_key(payload, key) for payload in payloads]
+
+    # Both paths must produce interchangeable blobs
+    assert CryptoManager.decrypt_batch(sealed[:8], key) == payloads[:8]
+    assert [CryptoManager.decrypt_with_key(bytes(item), key) for item in CryptoManager.encrypt_batch(payloads[:8], key)] == payloads[:8]
+
+    results = {
+        "encrypt_with_key": _time(lambda: [CryptoManager.encrypt_with_key(p, key) for p in payloads], repeat),
+        "encrypt_batch": _time(lambda: CryptoManager.encrypt_batch(payloads, key), repeat),
+        "decrypt_with_key": _time(lambda: [CryptoManager.decrypt_with_key(s, key) for s in sealed], repeat),
+        "decrypt_batch": _time(lambda: CryptoManager.decrypt_batch(sealed, key), repeat),
+    }
+
+    print(f"{count} payloads x {payload_size} bytes")
+    for name, seconds in results.items():
+        print(f"  {name:<18} {seconds * 1000:8.2f} ms  ({count / seconds:,.0f} ops/s)")
+    print(f"  encrypt speedup    {results['encrypt_with_key'] / results['encrypt_batch']:.2f}x")
+    print(f"  decrypt speedup    {results['decrypt_with_key'] / results['decrypt_batch']:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # 32 bytes is a wrapped DEK during key rotation; 256 bytes is a typical PII value
+    for size in (32, 256, 4096):
+        run(args.count, size, args.repeat)
@@ -0,0 +1,59 @@
+"""
+Benchmark: wrapping-key retrieval plus KEK unwrap (the key-store part of login) per
+key store backend, with and without the in-process key cache.
+
+Usage:
+    SAARTHI_KEYSTORE_PASSPHRASE=... python -m benchmarks.key_store_benchmark --iterations 200
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from saarthi_assistant.identity_wallet.utilities.crypto_manager import CryptoManager
+from saarthi_assistant.identity_wallet.utilities.key_manager import SecureKeyManager
+from saarthi_assistant.identity_wallet.utilities.key_store import KeyringBackend, EncryptedFileBackend
+
+
+def run(backend, iterations: int, cache_ttl: float):
+    SecureKeyManager.set_backend(backend)
+    SecureKeyManager.CACHE_TTL_SECONDS = cache_ttl
+    user_id = "benchmark_user"
+    wrapping_key = CryptoManager.generate_key()
+    encrypted_kek = CryptoManager.encrypt_with_key(CryptoManager.generate_key(), wrapping_key)
+    if not SecureKeyManager.store_wrapping_key(user_id, wrapping_key):
+        print(f"  {backend.name}: unavailable")
+        return
+    SecureKeyManager.clear_cached_keys()
+
+    timings = []
+    try:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            key = SecureKeyManager.retrieve_wrapping_key(user_id)
+            CryptoManager.decrypt_with_key(encrypted_kek, key)
+            timings.append(time.perf_counter() - start)
+    finally:
+        SecureKeyManager.delete_wrapping_key(user_id)
+
+    timings.sort()
+    label = f"{backend.name} ({'cached' if cache_ttl else 'uncached'})"
+    print(f"  {label:<20} max {timings[-1] * 1000:8.3f} ms  "
+          f"p50 {timings[len(timings) // 2] * 1000:8.3f} ms  p99 {timings[int(len(timings) * 0.99)] * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    key_file = os.path.join(tempfile.mkdtemp(prefix="saarthi_keys_"), "wrapping_keys.json")
+    passphrase = os.getenv("SAARTHI_KEYSTORE_PASSPHRASE", "benchmark-passphrase")
+    backends = [EncryptedFileBackend(key_file, passphrase)]
+    if KeyringBackend.is_available():
+        backends.insert(0, KeyringBackend())
+
+    print(f"Key lookup + KEK unwrap, {args.iterations} iterations")
+    for backend in backends:
+        for ttl in (0, 300):
+            run(backend, args.iterations, ttl)
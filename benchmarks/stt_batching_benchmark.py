@@ -0,0 +1,83 @@
+"""
+Throughput of concurrent STT sessions: every session calling STTModel directly (one
+generate per utterance) versus the micro-batching BatchingSTTService, at 1, 4 and 16
+concurrent streams.
+
+Each stream transcribes --utterances clips back to back. Clips come from the given
+audio files, or are synthetic 2-4 s tones when none are given.
+
+Usage:
+    python -m benchmarks.stt_batching_benchmark --streams 1 4 16 --max-batch-size 8 --max-wait-ms 20
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+import numpy as np
+import torchaudio
+
+from saarthi_assistant.voice.batching import BatchingSTTService
+from saarthi_assistant.voice.main import STTModel
+
+SAMPLE_RATE = 16000
+
+
+def load_clips(paths: List[str]) -> List[np.ndarray]:
+    if not paths:
+        rng = np.random.RandomState(0)
+        return [
+            (0.3 * np.sin(2 * np.pi * 220 * np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE)
+             + 0.01 * rng.randn(int(seconds * SAMPLE_RATE))).astype(np.float32)
+            for seconds in (2.0, 2.5, 3.0, 3.5, 4.0)
+        ]
+    clips = []
+    for path in paths:
+        audio, orig_freq = torchaudio.load(path)
+        if orig_freq != SAMPLE_RATE:
+            audio = torchaudio.functional.resample(audio, orig_freq=orig_freq, new_freq=SAMPLE_RATE)
+        clips.append(audio[0].numpy())
+    return clips
+
+
+def run(name: str, transcribe: Callable, clips: List[np.ndarray], streams: int, utterances: int) -> float:
+    def session(stream: int):
+        latencies = []
+        for index in range(utterances):
+            result = transcribe(clips[(stream + index) % len(clips)])
+            if not result["success"]:
+                raise RuntimeError(f"{name}: {result['error']}")
+            latencies.append(result["processing_time"])
+        return latencies
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=streams) as pool:
+        latencies = sorted(latency for result in pool.map(session, range(streams)) for latency in result)
+    elapsed = time.perf_counter() - started_at
+    throughput = streams * utterances / elapsed
+    print(f"    {name:<10} {throughput:7.2f} utt/s   p50 {latencies[len(latencies) // 2]:6.2f} s   "
+          f"p95 {latencies[int(len(latencies) * 0.95)]:6.2f} s")
+    return throughput
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio", nargs="*", help="Audio files to use as utterances")
+    parser.add_argument("--streams", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--utterances", type=int, default=4, help="Utterances per stream")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    STTModel.load()
+    clips = load_clips(args.audio)
+    # Warm-up outside the timings
+    STTModel.transcribe_batch(clips[:2], SAMPLE_RATE)
+
+    for streams in args.streams:
+        print(f"  {streams} concurrent streams x {args.utterances} utterances")
+        direct = run("direct", lambda audio: STTModel.transcribe_from_numpy(audio, SAMPLE_RATE), clips, streams, args.utterances)
+        service = BatchingSTTService(args.max_batch_size, args.max_wait_ms, SAMPLE_RATE)
+        batched = run("batched", service.transcribe, clips, streams, args.utterances)
+        service.close()
+        print(f"    speedup {batched / direct:.2f}x, mean batch size {service.mean_batch_size:.1f}")
@@ -0,0 +1,137 @@
+"""
+CPU speech-to-text check: real-time factor (processing time / audio duration) and
+word error rate of each STT profile on a small local audio set.
+
+WER is measured against a reference transcript next to each clip (clip.wav ->
+clip.txt, English) when there is one, and against the first profile's output
+otherwise, so the default run reports how far int8 drifts from the float32 baseline.
+The run fails if a profile's English WER exceeds --max-wer.
+
+Usage:
+    python -m benchmarks.stt_cpu_benchmark --threads 8 saarthi_assistant/voice/audio.wav
+    python -m benchmarks.stt_cpu_benchmark --profiles cpu-fp32 cpu-int8 --compile path/to/clips/
+"""
+import argparse
+import gc
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+import torch
+import torchaudio
+
+from saarthi_assistant.voice.main import STTModel, configure_cpu_threads
+
+SAMPLE_RATE = 16000
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word-level Levenshtein distance divided by the reference length"""
+    ref = re.sub(r"[^\w\s]", "", reference.lower()).split()
+    hyp = re.sub(r"[^\w\s]", "", hypothesis.lower()).split()
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def load_clips(paths: List[str]) -> List[Dict]:
+    """16 kHz mono clips with their optional reference transcript"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.lower().endswith((".wav", ".ogg", ".flac", ".mp3")))
+        else:
+            files.append(path)
+
+    clips = []
+    for file in files:
+        audio, orig_freq = torchaudio.load(file)
+        if orig_freq != SAMPLE_RATE:
+            audio = torchaudio.functional.resample(audio, orig_freq=orig_freq, new_freq=SAMPLE_RATE)
+        reference_path = os.path.splitext(file)[0] + ".txt"
+        reference = None
+        if os.path.exists(reference_path):
+            with open(reference_path, "r", encoding="utf-8") as reference_file:
+                reference = reference_file.read().strip()
+        clips.append({"name": os.path.basename(file), "audio": audio[0].numpy(), "reference": reference})
+    return clips
+
+
+def run(profile: str, clips: List[Dict], repeats: int, compile_model: bool) -> List[Dict]:
+    if STTModel.profile != profile:
+        load_start = time.perf_counter()
+        STTModel.model = None
+        gc.collect()
+        STTModel.model = STTModel.build_model(profile, compile_model=compile_model)
+        STTModel.profile = profile
+        print(f"  {profile}: loaded in {time.perf_counter() - load_start:.1f} s")
+
+    # Warm-up (and torch.compile tracing) outside the timings
+    STTModel.transcribe_from_numpy(clips[0]["audio"], SAMPLE_RATE)
+
+    results = []
+    for clip in clips:
+        timings = []
+        for _ in range(repeats):
+            result = STTModel.transcribe_from_numpy(clip["audio"], SAMPLE_RATE)
+            if not result["success"]:
+                raise RuntimeError(f"{profile} failed on {clip['name']}: {result['error']}")
+            timings.append(result["processing_time"])
+        duration = len(clip["audio"]) / SAMPLE_RATE
+        results.append({"text": result["text"], "hindi_text": result["hindi_text"], "rtf": min(timings) / duration})
+    return results
+
+
+def report(profile: str, clips: List[Dict], results: List[Dict], baseline: Optional[List[Dict]]) -> float:
+    errors = []
+    for index, (clip, result) in enumerate(zip(clips, results)):
+        reference = clip["reference"] or (baseline[index]["text"] if baseline else None)
+        wer = word_error_rate(reference, result["text"]) if reference is not None else None
+        if wer is not None:
+            errors.append(wer)
+        wer_label = f"{wer:6.1%}" if wer is not None else "     -"
+        print(f"    {clip['name']:<24} RTF {result['rtf']:5.2f}  WER {wer_label}  {result['text'][:60]}")
+    mean_rtf = sum(result["rtf"] for result in results) / len(results)
+    mean_wer = sum(errors) / len(errors) if errors else 0.0
+    print(f"  {profile}: mean RTF {mean_rtf:.2f}, mean WER {mean_wer:.1%}")
+    return mean_wer
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio", nargs="*", default=["saarthi_assistant/voice/audio.wav"],
+                        help="Audio files or directories of clips")
+    parser.add_argument("--profiles", nargs="+", default=["cpu-fp32", "cpu-int8"])
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads (default: torch's choice)")
+    parser.add_argument("--compile", action="store_true", help="torch.compile the speech encoder")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-wer", type=float, default=0.15)
+    args = parser.parse_args()
+
+    configure_cpu_threads(args.threads)
+    os.environ["STT_PROFILE"] = args.profiles[0]
+    os.environ["STT_COMPILE"] = "1" if args.compile else "0"
+    load_start = time.perf_counter()
+    STTModel.load()
+    print(f"  {args.profiles[0]}: loaded in {time.perf_counter() - load_start:.1f} s")
+    clips = load_clips(args.audio)
+    print(f"{len(clips)} clips, {torch.get_num_threads()} threads")
+
+    baseline = None
+    failed = []
+    for profile in args.profiles:
+        results = run(profile, clips, args.repeats, args.compile)
+        mean_wer = report(profile, clips, results, baseline)
+        if mean_wer > args.max_wer:
+            failed.append(profile)
+        baseline = baseline or results
+    if failed:
+        raise AssertionError(f"WER above {args.max_wer:.0%} for: {', '.join(failed)}")
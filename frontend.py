@@ -3,11 +3,11 @@ load_dotenv()
 
 import streamlit as st
 import pyttsx3
-import sounddevice as sd
-import numpy as np
 import time
 import uuid
-from saarthi_assistant.voice.main import transcribe_audio_numpy
+import functools
+from saarthi_assistant.voice.main import preload_stt_model, stt_model_status, open_transcription_stream, submit_audio_numpy
+from saarthi_assistant.voice.vad import record_utterance
 from saarthi_assistant.sub_graphs.graph_runner import (
     run_authentication, 
     submit_registration_data, 
@@ -328,34 +328,77 @@ header {visibility: hidden;}
 """, unsafe_allow_html=True)
 
 # --- Audio Recording Functions ---
-def record_audio(duration=5, sample_rate=16000):
-    """Record audio using sounddevice and return as numpy array"""
+# Load the speech model in the background so the page renders right away (no-op after the first run)
+preload_stt_model()
+
+# How often the voice controls re-check the model status while it loads
+VOICE_STATUS_POLL_SECONDS = 1.0
+
+def show_voice_status():
+    """Caption under the mic button while the speech model is still loading"""
+    status = stt_model_status()
+    if status["state"] == "ready":
+        return True
+    if status["state"] == "failed":
+        st.caption(f"⚠️ Voice input unavailable: {status['error']}")
+    else:
+        st.progress(status["progress"], text=f"🎙 Voice input is getting ready (loading {status['stage'] or 'model'})... the quick questions above work meanwhile.")
+    return False
+
+def voice_controls(was_ready):
+    """
+    Model status and mic button. A click is handed to the full script run below through
+    session state, since a fragment rerun only re-executes this function.
+    """
+    voice_ready = show_voice_status()
+    if voice_ready and not was_ready:
+        # Re-render the whole page, registering the controls without the poll
+        st.rerun()
+    if st.button("🎙 Speak to Saarthi", key="mic_btn", help="Click to speak your question", use_container_width=True, disabled=not voice_ready):
+        st.session_state.mic_requested = True
+        st.rerun()
+
+@st.fragment(run_every=VOICE_STATUS_POLL_SECONDS)
+def polling_voice_controls():
+    """Voice controls re-run every VOICE_STATUS_POLL_SECONDS until the model is ready"""
+    voice_controls(was_ready=False)
+
+@st.fragment
+def ready_voice_controls():
+    voice_controls(was_ready=True)
+
+def record_audio(sample_rate=16000, max_duration=None, trailing_silence=None, on_frame=None):
+    """
+    Record until the user stops speaking and return the voiced part as a numpy array.
+    on_frame receives the audio as it is captured (used for streaming transcription).
+    """
     try:
-        st.info("🎙️ Recording... Please speak now!")
+        st.info("🎙️ Recording... Please speak now! Recording stops when you pause.")
         
-        # Record audio
-        recording = sd.rec(int(duration * sample_rate), 
-                          samplerate=sample_rate, 
-                          channels=1, 
-                          dtype=np.float32)
-        sd.wait()  # Wait until recording is finished
-        
-        # Normalize audio to prevent clipping
-        recording = recording.flatten()
-        if np.max(np.abs(recording)) > 0:
-            recording = recording / np.max(np.abs(recording)) * 0.8
+        # Stream from the microphone until trailing silence or max_duration
+        recording = record_utterance(sample_rate=sample_rate,
+                                     max_duration_seconds=max_duration,
+                                     trailing_silence_seconds=trailing_silence,
+                                     on_frame=on_frame)
         
+        # Returned as captured: trimming and loudness normalization happen in the STT preprocessing
         return recording, sample_rate
     except Exception as e:
         st.error(f"Recording failed: {str(e)}")
         return None, None
 
-def transcribe_with_voice_service(audio_array, sample_rate=16000):
-    """Transcribe audio using the voice service"""
+def transcribe_with_voice_service(audio_array, sample_rate=16000, stream=None):
+    """
+    Transcribe audio using the voice service. With a stream that was fed during
+    recording, only the segments still in flight are waited for.
+    """
     try:
         with st.spinner("🤖 Processing your speech..."):
             start_time = time.time()
-            result = transcribe_audio_numpy(audio_array, sample_rate)
+            if stream is not None:
+                result = stream.finish()
+            else:
+                result = submit_audio_numpy(audio_array, defer_display_text=True).result()
             processing_time = time.time() - start_time
             
             if result["success"]:
@@ -732,7 +775,11 @@ if st.session_state.user_authenticated:
     st.markdown('<div class="input-area">', unsafe_allow_html=True)
     col1, col2 = st.columns([4, 1])
     with col1:
-        mic_button = st.button("🎙 Speak to Saarthi", key="mic_btn", help="Click to speak your question", use_container_width=True)
+        if stt_model_status()["state"] == "ready":
+            ready_voice_controls()
+        else:
+            polling_voice_controls()
+        mic_button = st.session_state.pop("mic_requested", False)
     with col2:
         if st.button("🚪 Logout", key="logout_btn", help="Logout and clear session", use_container_width=True):
             # Clear the identity manager instance from session state
@@ -762,32 +809,45 @@ if mic_button:
     try:
         speak("Yes, I'm listening.")
         
-        # Record audio using sounddevice
-        audio_array, sample_rate = record_audio(duration=5, sample_rate=16000)
+        # Record audio, transcribing finished segments while the user is still speaking
+        # (segments go to the STT worker and are batched with other browser sessions)
+        transcription_stream = open_transcription_stream(
+            sample_rate=16000, submit=functools.partial(submit_audio_numpy, defer_display_text=True))
+        audio_array, sample_rate = record_audio(sample_rate=16000, on_frame=transcription_stream.feed)
         
         if audio_array is not None:
-            # Check if audio has enough signal
-            if np.max(np.abs(audio_array)) < 0.01:
+            # Check if any speech was captured (the recorder only keeps voiced audio)
+            if audio_array.size == 0:
+                transcription_stream.cancel()
                 error_msg = "No speech detected. Please speak louder and try again."
                 st.warning(error_msg)
                 st.session_state.pending_tts = error_msg
                 st.rerun()  # Force update for warning message
             else:
                 # Transcribe using voice service
-                transcription_result = transcribe_with_voice_service(audio_array, sample_rate)
+                transcription_result = transcribe_with_voice_service(audio_array, sample_rate, stream=transcription_stream)
                 
                 if transcription_result and transcription_result.get("text", "").strip():
                     user_input_english = transcription_result["text"].strip()
-                    user_input_hindi = transcription_result.get("hindi_text", user_input_english).strip()
+                    user_input_hindi = transcription_result.get("hindi_text")
                     
-                    # Add user message immediately (in Hindi)
-                    st.session_state.messages.append({"type": "user", "content": user_input_hindi})
-                    st.success(f"You said (English): {user_input_english} | आपने कहा (Hindi): {user_input_hindi}")
+                    # Only English was decoded (STT_LAZY_DISPLAY_TEXT): get the Hindi display text while the agent works
+                    display_future = submit_audio_numpy(audio_array, languages=("hin",)) if user_input_hindi is None else None
+                    
+                    # Add user message immediately (in Hindi, filled in below if still decoding)
+                    user_message = {"type": "user", "content": user_input_hindi or user_input_english}
+                    st.session_state.messages.append(user_message)
+                    st.success(f"You said (English): {user_input_english}" + (f" | आपने कहा (Hindi): {user_input_hindi}" if user_input_hindi else ""))
                     
                     # Send English transcribed text to agent graph
                     with st.spinner("🤖 Processing your query..."):
                         result = send_agent_message(user_input_english, st.session_state.agent_thread_id)
                     
+                    if display_future is not None:
+                        display_result = display_future.result()
+                        if display_result["success"] and display_result.get("hindi_text"):
+                            user_message["content"] = display_result["hindi_text"]
+                    
                     if result["success"]:
                         # Add agent response
                         st.session_state.messages.append({"type": "bot", "content": result["response"]})
@@ -810,6 +870,7 @@ if mic_button:
                     st.session_state.pending_tts = error_msg
                     st.rerun()  # Force update for error message
         else:
+            transcription_stream.cancel()
             error_msg = "Recording failed. Please check your microphone and try again."
             st.error(error_msg)
             st.session_state.pending_tts = error_msg
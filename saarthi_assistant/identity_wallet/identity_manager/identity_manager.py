@@ -1,17 +1,22 @@
+import asyncio
 import sqlite3
 import hashlib
 
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import numpy as np
 import uuid
+import time
 import appdirs
 import os
 
-from ..utilities.identity_db_manager import DatabaseManager
+from ..utilities.identity_db_manager import DatabaseManager, get_default_vault_path
+from ..utilities.async_identity_db_manager import AsyncDatabaseManager
 from ..models.User import User
 from ..identity_manager.face_recognition import FaceRecognitionUtility, CameraManager
 from ..utilities.crypto_manager import CryptoManager
 from ..utilities.key_manager import SecureKeyManager
+from ..utilities.key_rotation import unwrap_user_kek
+from cryptography.exceptions import InvalidTag
 import os
 from dotenv import load_dotenv
 
@@ -24,16 +29,26 @@ class IdentityManager:
     """Main identity management class implementing the face-gated identity vault"""
 
     def __init__(self, camera_id: int = int(os.getenv("CAMERA_ID", 0))):
-        db_path = os.path.join(appdirs.user_data_dir("Saarthi", "AlgoHackers"), "identity_vault.db")
+        db_path = get_default_vault_path()
         self.is_logged_in = False
         self.current_user = None
         self.camera_manager = CameraManager(camera_id=camera_id)
-        self.db_manager = DatabaseManager(db_path)
+        self.db_manager = DatabaseManager(
+            db_path,
+            pii_versions_to_keep=int(os.getenv("PII_VERSIONS_TO_KEEP", 3)),
+            shard_count=int(os.getenv("VAULT_SHARD_COUNT", 1))
+        )
+        # Shares the sync manager; its DB thread is only started on first async call
+        self.async_db_manager = AsyncDatabaseManager(db_manager=self.db_manager)
 
         # Session-only memory (wiped on logout/close)
         self._wrapping_key: Optional[bytes] = None
         self._kek: Optional[bytes] = None
         self._session_active = False
+        # Verified embedding from the last login that matched nobody, kept so the
+        # registration that follows can enroll without another capture
+        self._unmatched_capture: Optional[Tuple[np.ndarray, float]] = None
+        self.enrollment_capture_max_age = float(os.getenv("ENROLLMENT_CAPTURE_MAX_AGE_SECONDS", 120))
 
     def _generate_user_id(self, name: str) -> str:
         """Generate a unique user ID based on name and timestamp and a uuid"""
@@ -54,20 +69,33 @@ class IdentityManager:
         """Capture frames from camera"""
         return self.camera_manager.get_frames()
 
-    def add_user(self, first_name: str, dob: str, phone: int, last_name:Optional[str] = None) -> Dict[str, Any]:
+    def _peek_unmatched_capture(self) -> Optional[np.ndarray]:
+        """Embedding from a recent unmatched login, if still fresh; kept until an enrollment succeeds"""
+        capture = self._unmatched_capture
+        if capture and time.monotonic() - capture[1] <= self.enrollment_capture_max_age:
+            return capture[0]
+        return None
+
+    def add_user(self, first_name: str, dob: str, phone: int, last_name:Optional[str] = None,
+                 reuse_login_capture: bool = False) -> Dict[str, Any]:
         """
-        Enrollment process: Capture face, generate keys, and store securely
+        Enrollment process: Capture face, generate keys, and store securely.
+        With `reuse_login_capture`, the face verified by a login that just failed to
+        match is enrolled instead of capturing again.
         """
         try:
             # Step 1: Capture User's Face
-            frames = self.capture_frames()
-            if not frames:
-                return {"result": False, "error": "Failed to capture frames from camera"}
+            embedding = self._peek_unmatched_capture() if reuse_login_capture else None
+            if embedding is None:
+                frames = self.capture_frames()
+                if not frames:
+                    return {"result": False, "error": "Failed to capture frames from camera"}
 
-            validation_result = FaceRecognitionUtility.verify_embeddings(list(frames))
+                validation_result = FaceRecognitionUtility.verify_embeddings(list(frames))
 
-            if not validation_result["result"]:
-                return {"result": False, "error": validation_result["error"]}
+                if not validation_result["result"]:
+                    return {"result": False, "error": validation_result["error"]}
+                embedding = validation_result["embedding"]
 
             # Step 2: Generate Key Encryption Key (KEK)
             kek = CryptoManager.generate_key()
@@ -81,7 +109,7 @@ class IdentityManager:
             # Step 5: Store Face Template and Encrypted KEK
             name = f"{first_name} {last_name}" if last_name else first_name
             user_id = self._generate_user_id(name)
-            face_embedding_bytes = CryptoManager.serialize_embedding(validation_result["embedding"])
+            face_embedding_bytes = CryptoManager.serialize_embedding(embedding)
 
             user = User(_id=user_id, first_name=first_name, last_name=last_name, dob=dob, phone=phone)
             self.db_manager.store_user(user, face_embedding_bytes, encrypted_kek)
@@ -90,6 +118,9 @@ class IdentityManager:
             if not SecureKeyManager.store_wrapping_key(user_id, wrapping_key):
                 return {"result": False, "error": "Failed to securely store wrapping key"}
 
+            # The login capture is single use; a failed enrollment leaves it for the retry
+            self._unmatched_capture = None
+
             # Store keys in session memory
             self._wrapping_key = wrapping_key
             self._kek = kek
@@ -125,19 +156,22 @@ class IdentityManager:
 
             live_embedding = validation_result["embedding"]
 
-            # Step 2: Compare to Stored Templates
-            all_users = self.db_manager.get_all_users()
-            matched_user = None
+            # Step 2: Compare to Stored Templates (streams only user_id + embedding)
+            matched_user_id = None
 
-            for user_data in all_users:
-                stored_embedding = CryptoManager.deserialize_embedding(user_data['face_embedding'])
+            for user_id, face_embedding in self.db_manager.iter_face_embeddings():
+                stored_embedding = CryptoManager.deserialize_embedding(face_embedding)
 
                 if self._compare_face_embeddings(live_embedding, stored_embedding):
-                    matched_user = user_data
+                    matched_user_id = user_id
                     break
 
+            # Load the full row only for the matched user
+            matched_user = self.db_manager.get_user_by_id(matched_user_id) if matched_user_id else None
             if not matched_user:
+                self._unmatched_capture = (live_embedding, time.monotonic())
                 return {"result": False, "error": "Face not recognized"}
+            self._unmatched_capture = None
 
             # Step 3: Retrieve wrapping key from secure hardware storage
             wrapping_key = SecureKeyManager.retrieve_wrapping_key(matched_user['user_id'])
@@ -149,6 +183,12 @@ class IdentityManager:
             # Step 4: Decrypt the KEK using the retrieved wrapping key
             try:
                 self._kek = CryptoManager.decrypt_with_key(matched_user['encrypted_kek'], self._wrapping_key)
+            except InvalidTag:
+                # A wrapping-key rotation may be between its vault and keyring updates
+                keys = unwrap_user_kek(matched_user['user_id'], matched_user['encrypted_kek'])
+                if not keys:
+                    return {"result": False, "error": "Key decryption failed: wrapping key does not match"}
+                self._wrapping_key, self._kek = keys
             except Exception as e:
                 return {"result": False, "error": f"Key decryption failed: {str(e)}"}
 
@@ -174,8 +214,11 @@ class IdentityManager:
         Session cleanup: Wipe keys from memory
         """
         # Step 5: Session Handling - Wipe memory
+        if self.current_user is not None:
+            SecureKeyManager.clear_cached_keys(self.current_user._id)
         self._wrapping_key = None
         self._kek = None
+        self._unmatched_capture = None
         self._session_active = False
         self.current_user = None
         self.is_logged_in = False
@@ -210,15 +253,13 @@ class IdentityManager:
             return {"result": False, "error": "User not authenticated"}
 
         try:
-            # Step 1: Generate Data Encryption Key (DEK)
-            dek = CryptoManager.generate_key()
+            # Mid-rotation the pending KEK is newest; the rotation pipeline accepts either
+            keks = self._load_keks()
+            if not keks:
+                return {"result": False, "error": "Encryption failed: could not unwrap the user's KEK"}
 
-            # Step 2: Encrypt PII data with DEK
-            pii_bytes = pii_data.encode('utf-8')
-            encrypted_data = CryptoManager.encrypt_with_key(pii_bytes, dek)
-
-            # Step 3: Encrypt DEK with KEK
-            encrypted_dek = CryptoManager.encrypt_with_key(dek, self._kek)
+            # Steps 1-3: Generate DEK, encrypt PII with DEK, encrypt DEK with KEK
+            encrypted_data, encrypted_dek = self._seal_pii(pii_data, keks[-1])
 
             # Step 4: Store encrypted data and encrypted DEK
             self.db_manager.store_encrypted_data(
@@ -247,12 +288,125 @@ class IdentityManager:
             if not stored_data:
                 return {"result": False, "error": f"No data found for type '{data_type}'"}
 
-            # Step 2: Decrypt DEK with KEK
-            dek = CryptoManager.decrypt_with_key(stored_data['encrypted_dek'], self._kek)
+            # Steps 2-3: Decrypt DEK with KEK, decrypt data with DEK
+            try:
+                decrypted_data = self._open_pii(stored_data)
+            except InvalidTag:
+                # The KEK was rotated since login: reload it and retry
+                decrypted_data = self._open_pii(stored_data, self._load_keks())
+
+            return {
+                "result": True,
+                "data": decrypted_data,
+                "data_type": data_type
+            }
+
+        except Exception as e:
+            return {"result": False, "error": f"Decryption failed: {str(e)}"}
+
+    def _load_keks(self) -> List[bytes]:
+        """
+        Re-read the user's committed KEK and, while a rotation is in flight, the pending one.
+        Lets a session that logged in before a key rotation keep working through it.
+        """
+        user_id = self.current_user._id
+        return self._unwrap_keks(self.db_manager.get_user_by_id(user_id), self.db_manager.get_key_rotation(user_id))
+
+    async def _load_keks_async(self) -> List[bytes]:
+        """
+        _load_keks with the vault reads on the DB thread and the unwrap on a worker thread,
+        since after a wrapping-key rotation it falls back to the key store (scrypt, keyring)
+        """
+        user_id = self.current_user._id
+        user = await self.async_db_manager.get_user_by_id(user_id)
+        rotation = await self.async_db_manager.get_key_rotation(user_id)
+        return await asyncio.to_thread(self._unwrap_keks, user, rotation)
+
+    def _unwrap_keks(self, user: Optional[Dict[str, Any]], rotation: Optional[Dict[str, Any]]) -> List[bytes]:
+        """Committed KEK then pending KEK, skipping any the wrapping keys cannot open"""
+        user_id = self.current_user._id
+        wrapped_keks = [user['encrypted_kek']] if user else []
+        if rotation:
+            wrapped_keks.append(rotation['pending_encrypted_kek'])
+
+        keks = []
+        for encrypted_kek in wrapped_keks:
+            try:
+                keks.append(CryptoManager.decrypt_with_key(encrypted_kek, self._wrapping_key))
+            except InvalidTag:
+                keys = unwrap_user_kek(user_id, encrypted_kek)
+                if keys:
+                    self._wrapping_key, kek = keys
+                    keks.append(kek)
+        return keks
+
+    @staticmethod
+    def _seal_pii(pii_data: str, kek: bytes):
+        """Generate a DEK, encrypt the PII with it and wrap the DEK with `kek`"""
+        dek = CryptoManager.generate_key()
+        encrypted_data = CryptoManager.encrypt_with_key(pii_data.encode('utf-8'), dek)
+        encrypted_dek = CryptoManager.encrypt_with_key(dek, kek)
+        return encrypted_data, encrypted_dek
+
+    def _open_pii(self, stored_data: Dict[str, Any], keks: Optional[List[bytes]] = None) -> str:
+        """
+        Unwrap the DEK with the session KEK (or the first of `keks` that opens it, which
+        becomes the session KEK) and decrypt the stored PII. Raises InvalidTag if none does.
+        """
+        for kek in keks if keks is not None else [self._kek]:
+            try:
+                dek = CryptoManager.decrypt_with_key(stored_data['encrypted_dek'], kek)
+                self._kek = kek
+                break
+            except InvalidTag:
+                continue
+        else:
+            raise InvalidTag()
+        return CryptoManager.decrypt_with_key(stored_data['encrypted_data'], dek).decode('utf-8')
+
+    async def encrypt_pii_data_async(self, data_type: str, pii_data: str) -> Dict[str, Any]:
+        """
+        Async variant of encrypt_pii_data: the vault write runs on the DB thread
+        so the event loop is never blocked on sqlite3
+        """
+        if not self.verify_user():
+            return {"result": False, "error": "User not authenticated"}
+
+        try:
+            keks = await self._load_keks_async()
+            if not keks:
+                return {"result": False, "error": "Encryption failed: could not unwrap the user's KEK"}
+
+            encrypted_data, encrypted_dek = self._seal_pii(pii_data, keks[-1])
+            await self.async_db_manager.store_encrypted_data(
+                self.current_user._id, data_type, encrypted_data, encrypted_dek
+            )
 
-            # Step 3: Decrypt data with DEK
-            decrypted_bytes = CryptoManager.decrypt_with_key(stored_data['encrypted_data'], dek)
-            decrypted_data = decrypted_bytes.decode('utf-8')
+            return {
+                "result": True,
+                "message": f"PII data '{data_type}' encrypted and stored successfully"
+            }
+
+        except Exception as e:
+            return {"result": False, "error": f"Encryption failed: {str(e)}"}
+
+    async def decrypt_pii_data_async(self, data_type: str) -> Dict[str, Any]:
+        """
+        Async variant of decrypt_pii_data: the vault read runs on the DB thread
+        """
+        if not self.verify_user():
+            return {"result": False, "error": "User not authenticated"}
+
+        try:
+            stored_data = await self.async_db_manager.get_encrypted_data(self.current_user._id, data_type)
+
+            if not stored_data:
+                return {"result": False, "error": f"No data found for type '{data_type}'"}
+
+            try:
+                decrypted_data = self._open_pii(stored_data)
+            except InvalidTag:
+                decrypted_data = self._open_pii(stored_data, await self._load_keks_async())
 
             return {
                 "result": True,
@@ -270,7 +424,7 @@ class IdentityManager:
         if not self.verify_user():
             return []
 
-        with sqlite3.connect(self.db_manager.db_path) as conn:
+        with sqlite3.connect(self.db_manager.get_shard_path(self.current_user._id)) as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT DISTINCT data_type FROM user_data WHERE user_id = ?
@@ -0,0 +1,89 @@
+import asyncio
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, AsyncIterator, Tuple, Callable
+
+from ..models.User import User
+from .identity_db_manager import DatabaseManager
+
+
+class AsyncDatabaseManager:
+    """
+    Asyncio counterpart of DatabaseManager.
+
+    Every call runs on one dedicated DB thread, so sqlite3 never blocks the event loop
+    and connections opened by streaming reads stay on the thread that created them.
+    """
+
+    def __init__(self, db_path: str = "identity_vault.db", pii_versions_to_keep: Optional[int] = None,
+                 shard_count: int = 1, db_manager: Optional[DatabaseManager] = None):
+        self.db_manager = db_manager or DatabaseManager(
+            db_path, pii_versions_to_keep=pii_versions_to_keep, shard_count=shard_count
+        )
+        self.db_path = self.db_manager.db_path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="identity-vault-db")
+
+    async def _run(self, func: Callable, *args, **kwargs):
+        """Run a blocking DatabaseManager call on the DB thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def get_shard_path(self, user_id: str) -> str:
+        """Database file holding the given user's rows"""
+        return self.db_manager.get_shard_path(user_id)
+
+    async def store_user(self, user: User, face_embedding: bytes, encrypted_kek: bytes):
+        """Store user enrollment data"""
+        return await self._run(self.db_manager.store_user, user, face_embedding, encrypted_kek)
+
+    async def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Retrieve user data by ID"""
+        return await self._run(self.db_manager.get_user_by_id, user_id)
+
+    async def get_all_users(self) -> List[Dict[str, Any]]:
+        """Get all users for face matching during login"""
+        return await self._run(self.db_manager.get_all_users)
+
+    async def iter_face_embeddings(self, chunk_size: int = 256) -> AsyncIterator[Tuple[str, bytes]]:
+        """Stream (user_id, face_embedding) pairs, fetching one chunk per DB-thread hop"""
+        rows = await self._run(self.db_manager.iter_face_embeddings, chunk_size)
+        try:
+            while True:
+                # islice returns an empty chunk at the end instead of raising StopIteration across the executor
+                chunk = await self._run(lambda: list(itertools.islice(rows, chunk_size)))
+                if not chunk:
+                    break
+                for row in chunk:
+                    yield row
+        finally:
+            # Close the generator (and its connection) on the thread that opened it
+            await self._run(rows.close)
+
+    async def get_all_data_types(self, user_id: str) -> List[str]:
+        """Get all available data types for the given user"""
+        return await self._run(self.db_manager.get_all_data_types, user_id)
+
+    async def store_encrypted_data(self, user_id: str, data_type: str, encrypted_data: bytes, encrypted_dek: bytes):
+        """Store encrypted PII data with encrypted DEK"""
+        return await self._run(self.db_manager.store_encrypted_data, user_id, data_type, encrypted_data, encrypted_dek)
+
+    async def get_encrypted_data(self, user_id: str, data_type: str) -> Optional[Dict[str, Any]]:
+        """Retrieve encrypted data and DEK"""
+        return await self._run(self.db_manager.get_encrypted_data, user_id, data_type)
+
+    async def get_key_rotation(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Return the in-flight KEK rotation for a user, if any"""
+        return await self._run(self.db_manager.get_key_rotation, user_id)
+
+    async def prune_superseded_data(self, versions_to_keep: Optional[int] = None) -> int:
+        """Delete superseded PII versions"""
+        return await self._run(self.db_manager.prune_superseded_data, versions_to_keep)
+
+    async def compact(self, versions_to_keep: Optional[int] = None, full_vacuum: bool = False) -> Dict[str, Any]:
+        """Prune superseded PII versions and vacuum"""
+        return await self._run(self.db_manager.compact, versions_to_keep, full_vacuum)
+
+    def close(self):
+        """Stop the DB thread once queued calls have finished"""
+        self._executor.shutdown(wait=True)
@@ -1,11 +1,17 @@
 import secrets
 import json
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from typing import List
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from typing import List, Sequence, Union
 
 class CryptoManager:
     """Handles all cryptographic operations for the identity vault"""
 
+    # Layout of every encrypted blob: IV (12 bytes) + tag (16 bytes) + ciphertext
+    IV_SIZE = 12
+    TAG_SIZE = 16
+    HEADER_SIZE = IV_SIZE + TAG_SIZE
+
     @staticmethod
     def generate_key() -> bytes:
         """Generate a secure random 256-bit key"""
@@ -34,6 +40,60 @@ class CryptoManager:
         decryptor = cipher.decryptor()
         return decryptor.update(ciphertext) + decryptor.finalize()
 
+    @classmethod
+    def encrypt_batch(cls, payloads: Sequence[bytes], key: bytes) -> List[memoryview]:
+        """
+        Encrypt many payloads under one key using a single AESGCM context.
+
+        Results use the same IV + tag + ciphertext layout as encrypt_with_key and are
+        written into one preallocated buffer; each returned item is a zero-copy
+        memoryview into it (sqlite3 binds these directly as BLOBs).
+        """
+        if not payloads:
+            return []
+        aead = AESGCM(key)
+        count = len(payloads)
+        buffer = bytearray(sum(len(payload) for payload in payloads) + count * cls.HEADER_SIZE)
+        view = memoryview(buffer)
+        # One call to the CSPRNG for every IV in the batch
+        ivs = memoryview(secrets.token_bytes(count * cls.IV_SIZE))
+
+        results = []
+        offset = 0
+        for index, payload in enumerate(payloads):
+            iv = ivs[index * cls.IV_SIZE:(index + 1) * cls.IV_SIZE]
+            size = len(payload)
+            # AESGCM returns ciphertext + tag; reorder into the vault layout
+            sealed = memoryview(aead.encrypt(iv, payload, None))
+            end = offset + cls.HEADER_SIZE + size
+            view[offset:offset + cls.IV_SIZE] = iv
+            view[offset + cls.IV_SIZE:offset + cls.HEADER_SIZE] = sealed[size:]
+            view[offset + cls.HEADER_SIZE:end] = sealed[:size]
+            results.append(view[offset:end])
+            offset = end
+        return results
+
+    @classmethod
+    def decrypt_batch(cls, encrypted_payloads: Sequence[Union[bytes, memoryview]], key: bytes) -> List[bytes]:
+        """
+        Decrypt many IV + tag + ciphertext blobs under one key using a single AESGCM context.
+        Ciphertext and tag are reassembled in one reusable scratch buffer instead of
+        concatenating new bytes objects per item.
+        """
+        if not encrypted_payloads:
+            return []
+        aead = AESGCM(key)
+        scratch = memoryview(bytearray(max(len(item) for item in encrypted_payloads) - cls.IV_SIZE))
+
+        results = []
+        for item in encrypted_payloads:
+            view = memoryview(item)
+            size = len(view) - cls.HEADER_SIZE
+            scratch[:size] = view[cls.HEADER_SIZE:]
+            scratch[size:size + cls.TAG_SIZE] = view[cls.IV_SIZE:cls.HEADER_SIZE]
+            results.append(aead.decrypt(view[:cls.IV_SIZE], scratch[:size + cls.TAG_SIZE], None))
+        return results
+
     @staticmethod
     def serialize_embedding(embedding: List[float]) -> bytes:
         """Convert face embedding to bytes for storage"""
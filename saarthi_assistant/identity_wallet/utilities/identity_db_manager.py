@@ -1,23 +1,74 @@
 import os
 import sqlite3
+import hashlib
+import appdirs
 from ..models.User import User
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterator, Tuple, Callable
+
+
+def get_default_vault_path() -> str:
+    """Location of the identity vault used by IdentityManager"""
+    return os.path.join(appdirs.user_data_dir("Saarthi", "AlgoHackers"), "identity_vault.db")
+
+
+def get_shard_index(user_id: str, shard_count: int) -> int:
+    """Stable shard assignment from a hash of the user ID"""
+    digest = hashlib.sha256(user_id.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shard_count
+
+
+def get_shard_paths(db_path: str, shard_count: int) -> List[str]:
+    """
+    File paths for a vault split into `shard_count` shards.
+    A single shard is the plain `db_path`, so unsharded vaults keep their layout.
+    """
+    if shard_count == 1:
+        return [db_path]
+    root, ext = os.path.splitext(db_path)
+    return [f"{root}.shard{i}of{shard_count}{ext}" for i in range(shard_count)]
 
 
 class DatabaseManager:
     """Handles database operations for user data and encrypted keys"""
 
-    def __init__(self, db_path: str = "identity_vault.db"):
+    def __init__(self, db_path: str = "identity_vault.db", pii_versions_to_keep: Optional[int] = None, shard_count: int = 1):
+        """
+        Args:
+            db_path: Path to the SQLite vault file
+            pii_versions_to_keep: Number of versions kept per (user_id, data_type).
+                None keeps the full history, 1 updates the latest row in place.
+            shard_count: Number of SQLite files users are spread across by a hash of user_id.
+                1 keeps everything in `db_path`.
+        """
+        if pii_versions_to_keep is not None and pii_versions_to_keep < 1:
+            raise ValueError("pii_versions_to_keep must be at least 1")
+        if shard_count < 1:
+            raise ValueError("shard_count must be at least 1")
         self.db_path = db_path
+        self.pii_versions_to_keep = pii_versions_to_keep
+        self.shard_count = shard_count
+        self.shard_paths = get_shard_paths(db_path, shard_count)
         self.init_database()
 
+    def get_shard_path(self, user_id: str) -> str:
+        """Database file holding the given user's rows"""
+        return self.shard_paths[get_shard_index(user_id, self.shard_count)]
+
     def init_database(self):
-        """Initialize the database with required tables"""
-        if not os.path.exists(os.path.dirname(self.db_path)):
-            os.makedirs(os.path.dirname(self.db_path))
-        with sqlite3.connect(self.db_path) as conn:
+        """Initialize every shard with the required tables"""
+        for shard_path in self.shard_paths:
+            self._init_shard(shard_path)
+
+    def _init_shard(self, shard_path: str):
+        """Create tables and indexes in a single vault file"""
+        if os.path.dirname(shard_path) and not os.path.exists(os.path.dirname(shard_path)):
+            os.makedirs(os.path.dirname(shard_path))
+        with sqlite3.connect(shard_path) as conn:
             cursor = conn.cursor()
 
+            # Only takes effect on a fresh file; existing vaults switch on the next full VACUUM
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
             # Users table with face templates and encrypted KEKs
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS users (
@@ -40,16 +91,68 @@ class DatabaseManager:
                     data_type TEXT NOT NULL,
                     encrypted_data BLOB NOT NULL,
                     encrypted_dek BLOB NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 1,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (user_id) REFERENCES users (user_id)
                 )
             ''')
 
+            # Vaults created before versioning have no version column
+            columns = [row[1] for row in cursor.execute("PRAGMA table_info(user_data)")]
+            if 'version' not in columns:
+                cursor.execute("ALTER TABLE user_data ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+                self._renumber_versions(cursor)
+
+            # Older vaults have a non-unique index and may hold duplicate versions written concurrently
+            unique_by_index = {row[1]: row[2] for row in cursor.execute("PRAGMA index_list(user_data)")}
+            if unique_by_index.get('idx_user_data_version') == 0:
+                duplicate = cursor.execute('''
+                    SELECT 1 FROM user_data GROUP BY user_id, data_type, version HAVING COUNT(*) > 1 LIMIT 1
+                ''').fetchone()
+                if duplicate:
+                    self._renumber_versions(cursor)
+                cursor.execute("DROP INDEX idx_user_data_version")
+            self.create_version_index(cursor)
+
+            # In-flight KEK rotations: the new KEK (wrapped) and the last re-wrapped user_data row
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS key_rotations (
+                    user_id TEXT PRIMARY KEY,
+                    pending_encrypted_kek BLOB NOT NULL,
+                    last_row_id INTEGER NOT NULL DEFAULT 0,
+                    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users (user_id)
+                )
+            ''')
+
             conn.commit()
 
+    @staticmethod
+    def _renumber_versions(cursor: sqlite3.Cursor):
+        """Number each (user_id, data_type) history 1..n in insertion order"""
+        cursor.execute('''
+            UPDATE user_data SET version = (
+                SELECT COUNT(*) FROM user_data AS older
+                WHERE older.user_id = user_data.user_id
+                  AND older.data_type = user_data.data_type
+                  AND older.id <= user_data.id
+            )
+        ''')
+
+    @staticmethod
+    def create_version_index(cursor: sqlite3.Cursor):
+        """
+        Latest-version lookups become an index seek instead of a sort, and the unique
+        constraint rejects a second writer that computed the same next version
+        """
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_user_data_version
+            ON user_data (user_id, data_type, version)
+        ''')
+
     def store_user(self, user: User, face_embedding: bytes, encrypted_kek: bytes):
         """Store user enrollment data"""
-        with sqlite3.connect(self.db_path) as conn:
+        with sqlite3.connect(self.get_shard_path(user._id)) as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO users (user_id, first_name, last_name, dob, phone, face_embedding, encrypted_kek)
@@ -59,7 +162,7 @@ class DatabaseManager:
 
     def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Retrieve user data by ID"""
-        with sqlite3.connect(self.db_path) as conn:
+        with sqlite3.connect(self.get_shard_path(user_id)) as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT user_id, first_name, last_name, dob, phone, face_embedding, encrypted_kek
@@ -81,27 +184,72 @@ class DatabaseManager:
 
     def get_all_users(self) -> List[Dict[str, Any]]:
         """Get all users for face matching during login"""
-        with sqlite3.connect(self.db_path) as conn:
+        rows = []
+        for shard_path in self.shard_paths:
+            with sqlite3.connect(shard_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT user_id, first_name, last_name, dob, phone, face_embedding, encrypted_kek
+                    FROM users
+                ''')
+                rows.extend(cursor.fetchall())
+
+        return [{
+            'user_id': row[0],
+            'first_name': row[1],
+            'last_name': row[2],
+            'dob': row[3],
+            'phone': row[4],
+            'face_embedding': row[5],
+            'encrypted_kek': row[6]
+        } for row in rows]
+
+    def iter_face_embeddings(self, chunk_size: int = 256) -> Iterator[Tuple[str, bytes]]:
+        """
+        Stream (user_id, face_embedding) pairs for face matching during login.
+        Only the two columns needed for matching are read, `chunk_size` rows at a time,
+        fanning out over every shard in turn.
+        """
+        for shard_path in self.shard_paths:
+            yield from self._iter_shard_embeddings(shard_path, chunk_size)
+
+    def _iter_shard_embeddings(self, shard_path: str, chunk_size: int) -> Iterator[Tuple[str, bytes]]:
+        """Stream (user_id, face_embedding) pairs from a single shard"""
+        conn = sqlite3.connect(shard_path)
+        try:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT user_id, first_name, last_name, dob, phone, face_embedding, encrypted_kek
-                FROM users
+                SELECT user_id, face_embedding FROM users
             ''')
-            rows = cursor.fetchall()
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+    def iter_user_ids(self, chunk_size: int = 256) -> Iterator[str]:
+        """
+        Stream every user ID across all shards using keyset pagination.
+        No read transaction is held between chunks, so callers may write to the vault while iterating.
+        """
+        for shard_path in self.shard_paths:
+            last_user_id = ""
+            while True:
+                with sqlite3.connect(shard_path) as conn:
+                    rows = conn.execute('''
+                        SELECT user_id FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?
+                    ''', (last_user_id, chunk_size)).fetchall()
+                if not rows:
+                    break
+                for row in rows:
+                    yield row[0]
+                last_user_id = rows[-1][0]
 
-            return [{
-                'user_id': row[0],
-                'first_name': row[1],
-                'last_name': row[2],
-                'dob': row[3],
-                'phone': row[4],
-                'face_embedding': row[5],
-                'encrypted_kek': row[6]
-            } for row in rows]
-        
     def get_all_data_types(self, user_id: str) -> List[str]:
         """Get all available data types for the given user"""
-        with sqlite3.connect(self.db_path) as conn:
+        with sqlite3.connect(self.get_shard_path(user_id)) as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT data_type FROM user_data WHERE user_id = ?
@@ -110,23 +258,47 @@ class DatabaseManager:
             return list(rows)
 
     def store_encrypted_data(self, user_id: str, data_type: str, encrypted_data: bytes, encrypted_dek: bytes):
-        """Store encrypted PII data with encrypted DEK"""
-        with sqlite3.connect(self.db_path) as conn:
+        """Store encrypted PII data with encrypted DEK, applying the version retention policy"""
+        with sqlite3.connect(self.get_shard_path(user_id), timeout=30) as conn:
             cursor = conn.cursor()
+            # Take the write lock before reading the latest version, so concurrent
+            # writers queue up instead of both appending the same version
+            cursor.execute("BEGIN IMMEDIATE")
             cursor.execute('''
-                INSERT INTO user_data (user_id, data_type, encrypted_data, encrypted_dek)
-                VALUES (?, ?, ?, ?)
-            ''', (user_id, data_type, encrypted_data, encrypted_dek))
+                SELECT id, version FROM user_data
+                WHERE user_id = ? AND data_type = ?
+                ORDER BY version DESC LIMIT 1
+            ''', (user_id, data_type))
+            latest = cursor.fetchone()
+
+            if latest and self.pii_versions_to_keep == 1:
+                # Upsert: overwrite the single retained row instead of appending
+                cursor.execute('''
+                    UPDATE user_data
+                    SET encrypted_data = ?, encrypted_dek = ?, version = ?, created_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (encrypted_data, encrypted_dek, latest[1] + 1, latest[0]))
+            else:
+                version = latest[1] + 1 if latest else 1
+                cursor.execute('''
+                    INSERT INTO user_data (user_id, data_type, encrypted_data, encrypted_dek, version)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (user_id, data_type, encrypted_data, encrypted_dek, version))
+                if self.pii_versions_to_keep is not None:
+                    cursor.execute('''
+                        DELETE FROM user_data
+                        WHERE user_id = ? AND data_type = ? AND version <= ?
+                    ''', (user_id, data_type, version - self.pii_versions_to_keep))
             conn.commit()
 
     def get_encrypted_data(self, user_id: str, data_type: str) -> Optional[Dict[str, Any]]:
         """Retrieve encrypted data and DEK"""
-        with sqlite3.connect(self.db_path) as conn:
+        with sqlite3.connect(self.get_shard_path(user_id)) as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT encrypted_data, encrypted_dek
                 FROM user_data WHERE user_id = ? AND data_type = ?
-                ORDER BY created_at DESC LIMIT 1
+                ORDER BY version DESC LIMIT 1
             ''', (user_id, data_type))
             row = cursor.fetchone()
 
@@ -136,3 +308,238 @@ class DatabaseManager:
                     'encrypted_dek': row[1]
                 }
             return None
+
+    def prune_superseded_data(self, versions_to_keep: Optional[int] = None) -> int:
+        """
+        Delete PII rows older than the newest `versions_to_keep` versions of each data type.
+        Defaults to the configured retention, or the latest version only when history is unbounded.
+        Returns the number of rows deleted.
+        """
+        keep = versions_to_keep if versions_to_keep is not None else self.pii_versions_to_keep
+        if keep is None:
+            keep = 1
+        if keep < 1:
+            raise ValueError("versions_to_keep must be at least 1")
+        rows_deleted = 0
+        for shard_path in self.shard_paths:
+            with sqlite3.connect(shard_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    DELETE FROM user_data
+                    WHERE version <= (
+                        SELECT MAX(latest.version) FROM user_data AS latest
+                        WHERE latest.user_id = user_data.user_id
+                          AND latest.data_type = user_data.data_type
+                    ) - ?
+                ''', (keep,))
+                conn.commit()
+                rows_deleted += cursor.rowcount
+        return rows_deleted
+
+    def _database_size(self, conn: sqlite3.Connection) -> Dict[str, int]:
+        """Return file size and free-page bytes for an open connection"""
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return {
+            'size_bytes': page_size * page_count,
+            'free_bytes': page_size * freelist_count
+        }
+
+    def compact(self, versions_to_keep: Optional[int] = None, full_vacuum: bool = False) -> Dict[str, Any]:
+        """
+        Prune superseded PII versions and return freed pages to the filesystem.
+
+        Uses `PRAGMA incremental_vacuum` when the vault was created with incremental
+        auto-vacuum, otherwise (or when `full_vacuum` is set) a full `VACUUM`, which
+        also converts older vaults to incremental auto-vacuum.
+        """
+        rows_pruned = self.prune_superseded_data(versions_to_keep)
+
+        size_before = size_after = 0
+        modes = set()
+        for shard_path in self.shard_paths:
+            # VACUUM cannot run inside a transaction
+            conn = sqlite3.connect(shard_path, isolation_level=None)
+            try:
+                size_before += self._database_size(conn)['size_bytes']
+                auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+                if full_vacuum or auto_vacuum != 2:
+                    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                    conn.execute("VACUUM")
+                    modes.add("vacuum")
+                else:
+                    # The pragma frees one page per step; executescript runs it to completion
+                    conn.executescript("PRAGMA incremental_vacuum;")
+                    modes.add("incremental_vacuum")
+                size_after += self._database_size(conn)['size_bytes']
+            finally:
+                conn.close()
+
+        return {
+            'rows_pruned': rows_pruned,
+            'mode': "+".join(sorted(modes)),
+            'size_before': size_before,
+            'size_after': size_after,
+            'bytes_reclaimed': size_before - size_after
+        }
+
+    def rebalance(self, from_shard_count: int) -> Dict[str, Any]:
+        """
+        Move users and their PII rows from a `from_shard_count` layout into this
+        manager's layout. Each (source, target) pair is copied in one transaction
+        with ATTACH, so an interrupted run can simply be re-run.
+        Source shard files that end up empty are removed.
+        """
+        source_paths = get_shard_paths(self.db_path, from_shard_count)
+        users_moved = 0
+        rows_moved = 0
+
+        for source_path in source_paths:
+            if not os.path.exists(source_path):
+                continue
+            conn = sqlite3.connect(source_path)
+            try:
+                conn.create_function(
+                    "shard_of", 1, lambda user_id: get_shard_index(user_id, self.shard_count), deterministic=True
+                )
+                for target_index, target_path in enumerate(self.shard_paths):
+                    if os.path.abspath(target_path) == os.path.abspath(source_path):
+                        continue
+                    conn.execute("ATTACH DATABASE ? AS target", (target_path,))
+                    try:
+                        with conn:
+                            cursor = conn.execute('''
+                                INSERT OR IGNORE INTO target.users
+                                    (user_id, first_name, last_name, dob, phone, face_embedding, encrypted_kek, created_at)
+                                SELECT user_id, first_name, last_name, dob, phone, face_embedding, encrypted_kek, created_at
+                                FROM main.users WHERE shard_of(user_id) = ?
+                            ''', (target_index,))
+                            users_moved += cursor.rowcount
+                            # Row ids are per-file, so let the target assign new ones
+                            cursor = conn.execute('''
+                                INSERT INTO target.user_data
+                                    (user_id, data_type, encrypted_data, encrypted_dek, version, created_at)
+                                SELECT user_id, data_type, encrypted_data, encrypted_dek, version, created_at
+                                FROM main.user_data WHERE shard_of(user_id) = ?
+                            ''', (target_index,))
+                            rows_moved += cursor.rowcount
+                            # Row ids change on move, so in-flight rotations restart their scan
+                            conn.execute('''
+                                INSERT OR REPLACE INTO target.key_rotations (user_id, pending_encrypted_kek, last_row_id, started_at)
+                                SELECT user_id, pending_encrypted_kek, 0, started_at
+                                FROM main.key_rotations WHERE shard_of(user_id) = ?
+                            ''', (target_index,))
+                            conn.execute("DELETE FROM main.key_rotations WHERE shard_of(user_id) = ?", (target_index,))
+                            conn.execute("DELETE FROM main.user_data WHERE shard_of(user_id) = ?", (target_index,))
+                            conn.execute("DELETE FROM main.users WHERE shard_of(user_id) = ?", (target_index,))
+                    finally:
+                        conn.execute("DETACH DATABASE target")
+                remaining = conn.execute(
+                    "SELECT (SELECT COUNT(*) FROM users) + (SELECT COUNT(*) FROM user_data) + (SELECT COUNT(*) FROM key_rotations)"
+                ).fetchone()[0]
+            finally:
+                conn.close()
+
+            if remaining == 0 and source_path not in self.shard_paths:
+                os.remove(source_path)
+
+        return {
+            'users_moved': users_moved,
+            'rows_moved': rows_moved,
+            'shard_count': self.shard_count
+        }
+
+    def update_encrypted_kek(self, user_id: str, encrypted_kek: bytes):
+        """Replace the user's wrapped KEK (used when the wrapping key is rotated)"""
+        with sqlite3.connect(self.get_shard_path(user_id)) as conn:
+            conn.execute("UPDATE users SET encrypted_kek = ? WHERE user_id = ?", (encrypted_kek, user_id))
+            conn.commit()
+
+    def get_key_rotation(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Return the in-flight KEK rotation for a user, if any"""
+        with sqlite3.connect(self.get_shard_path(user_id)) as conn:
+            row = conn.execute('''
+                SELECT pending_encrypted_kek, last_row_id FROM key_rotations WHERE user_id = ?
+            ''', (user_id,)).fetchone()
+            if row:
+                return {
+                    'pending_encrypted_kek': row[0],
+                    'last_row_id': row[1]
+                }
+            return None
+
+    def begin_key_rotation(self, user_id: str, pending_encrypted_kek: bytes):
+        """Record a new KEK rotation before any DEK is re-wrapped"""
+        with sqlite3.connect(self.get_shard_path(user_id)) as conn:
+            conn.execute('''
+                INSERT INTO key_rotations (user_id, pending_encrypted_kek) VALUES (?, ?)
+            ''', (user_id, pending_encrypted_kek))
+            conn.commit()
+
+    def get_wrapped_deks(self, user_id: str, after_row_id: int, limit: int) -> List[Tuple[int, bytes]]:
+        """Next chunk of (id, encrypted_dek) rows for a user, in id order"""
+        with sqlite3.connect(self.get_shard_path(user_id)) as conn:
+            return conn.execute('''
+                SELECT id, encrypted_dek FROM user_data
+                WHERE user_id = ? AND id > ?
+                ORDER BY id LIMIT ?
+            ''', (user_id, after_row_id, limit)).fetchall()
+
+    def get_wrapped_deks_by_id(self, user_id: str, row_ids: List[int]) -> List[Tuple[int, bytes]]:
+        """Current (id, encrypted_dek) of the given rows that still exist, in id order"""
+        with sqlite3.connect(self.get_shard_path(user_id)) as conn:
+            return conn.execute(f'''
+                SELECT id, encrypted_dek FROM user_data
+                WHERE user_id = ? AND id IN ({', '.join('?' * len(row_ids))})
+                ORDER BY id
+            ''', (user_id, *row_ids)).fetchall()
+
+    def apply_rewrapped_deks(self, user_id: str, updates: List[Tuple[bytes, int, bytes]], last_row_id: int) -> List[int]:
+        """
+        Write a batch of (re-wrapped DEK, id, DEK as read) updates and advance the rotation
+        checkpoint in the same transaction, so a crash never loses track of progress.
+        A row is only updated if it still holds the DEK that was read; the ids of rows
+        rewritten (or deleted) since are returned for the caller to re-read.
+        """
+        changed = []
+        with sqlite3.connect(self.get_shard_path(user_id), timeout=30) as conn:
+            for encrypted_dek, row_id, read_dek in updates:
+                cursor = conn.execute(
+                    "UPDATE user_data SET encrypted_dek = ? WHERE id = ? AND encrypted_dek = ?",
+                    (encrypted_dek, row_id, read_dek)
+                )
+                if cursor.rowcount == 0:
+                    changed.append(row_id)
+            conn.execute(
+                "UPDATE key_rotations SET last_row_id = ? WHERE user_id = ?", (last_row_id, user_id)
+            )
+            conn.commit()
+        return changed
+
+    def finish_key_rotation(self, user_id: str,
+                            rewrap: Optional[Callable[[List[Tuple[int, bytes]]], List[Tuple[bytes, int]]]] = None) -> int:
+        """
+        Promote the pending KEK and drop the rotation record. With `rewrap`, every one of
+        the user's (id, encrypted_dek) rows is first passed to it under the write lock and
+        the (encrypted_dek, id) updates it returns are applied in the same transaction, so
+        rows written with the old KEK during the rotation are not left behind.
+        Returns the number of rows updated.
+        """
+        with sqlite3.connect(self.get_shard_path(user_id), timeout=30) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            updates = []
+            if rewrap:
+                rows = conn.execute(
+                    "SELECT id, encrypted_dek FROM user_data WHERE user_id = ? ORDER BY id", (user_id,)
+                ).fetchall()
+                updates = rewrap(rows)
+                conn.executemany("UPDATE user_data SET encrypted_dek = ? WHERE id = ?", updates)
+            conn.execute('''
+                UPDATE users SET encrypted_kek = (
+                    SELECT pending_encrypted_kek FROM key_rotations WHERE user_id = ?
+                ) WHERE user_id = ?
+            ''', (user_id, user_id))
+            conn.execute("DELETE FROM key_rotations WHERE user_id = ?", (user_id,))
+            conn.commit()
+        return len(updates)
@@ -1,62 +1,133 @@
-import keyring
+import os
+import time
 import base64
-from typing import Optional
+import threading
+from typing import Optional, Dict, Tuple
+
+from .crypto_manager import CryptoManager
+from .key_store import KeyStoreBackend, create_backend
 
 class SecureKeyManager:
-    """Manages wrapping keys using Windows Credential Manager (hardware-backed secure storage)"""
+    """
+    Manages wrapping keys in a pluggable key store (OS keyring by default, an encrypted
+    local file on headless hosts) with a short-lived in-process cache of unwrapped keys
+    """
 
     SERVICE_NAME = "Saarthi_IdentityVault"
 
+    # Seconds an unwrapped key stays cached; 0 disables the cache
+    CACHE_TTL_SECONDS = float(os.getenv("SAARTHI_KEY_CACHE_TTL", 300))
+
+    _backend: Optional[KeyStoreBackend] = None
+    # key_name -> (key sealed under a per-process key, expiry); keys never sit in the cache in the clear
+    _cache: Dict[str, Tuple[bytes, float]] = {}
+    _cache_seal_key = CryptoManager.generate_key()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_backend() -> KeyStoreBackend:
+        """Key store in use, created from SAARTHI_KEY_BACKEND on first use"""
+        with SecureKeyManager._lock:
+            if SecureKeyManager._backend is None:
+                SecureKeyManager._backend = create_backend()
+            return SecureKeyManager._backend
+
+    @staticmethod
+    def set_backend(backend: KeyStoreBackend):
+        """Switch key store (drops cached keys from the previous one)"""
+        with SecureKeyManager._lock:
+            SecureKeyManager._backend = backend
+            SecureKeyManager._cache.clear()
+
     @staticmethod
-    def _get_key_name(user_id: str) -> str:
-        """Generate a unique key name for the user"""
-        return f"{SecureKeyManager.SERVICE_NAME}_{user_id}_wrapping_key"
+    def _get_key_name(user_id: str, pending: bool = False) -> str:
+        """Generate a unique key name for the user (pending keys are mid-rotation)"""
+        suffix = "pending_wrapping_key" if pending else "wrapping_key"
+        return f"{SecureKeyManager.SERVICE_NAME}_{user_id}_{suffix}"
 
     @staticmethod
-    def store_wrapping_key(user_id: str, wrapping_key: bytes) -> bool:
+    def _cache_put(key_name: str, wrapping_key: bytes):
+        if SecureKeyManager.CACHE_TTL_SECONDS <= 0:
+            return
+        sealed = CryptoManager.encrypt_with_key(wrapping_key, SecureKeyManager._cache_seal_key)
+        with SecureKeyManager._lock:
+            SecureKeyManager._cache[key_name] = (sealed, time.monotonic() + SecureKeyManager.CACHE_TTL_SECONDS)
+
+    @staticmethod
+    def _cache_get(key_name: str) -> Optional[bytes]:
+        with SecureKeyManager._lock:
+            entry = SecureKeyManager._cache.get(key_name)
+            if entry and entry[1] <= time.monotonic():
+                del SecureKeyManager._cache[key_name]
+                entry = None
+        if not entry:
+            return None
+        return CryptoManager.decrypt_with_key(entry[0], SecureKeyManager._cache_seal_key)
+
+    @staticmethod
+    def clear_cached_keys(user_id: Optional[str] = None):
+        """Drop cached keys for one user (on logout) or for everyone"""
+        with SecureKeyManager._lock:
+            if user_id is None:
+                SecureKeyManager._cache.clear()
+            else:
+                for pending in (False, True):
+                    SecureKeyManager._cache.pop(SecureKeyManager._get_key_name(user_id, pending), None)
+
+    @staticmethod
+    def store_wrapping_key(user_id: str, wrapping_key: bytes, pending: bool = False) -> bool:
         """
-        Store wrapping key in Windows Credential Manager
+        Store wrapping key in the configured key store
         Returns True if successful, False otherwise
         """
         try:
             # Convert bytes to base64 string for storage
             key_b64 = base64.b64encode(wrapping_key).decode('utf-8')
-            key_name = SecureKeyManager._get_key_name(user_id)
+            key_name = SecureKeyManager._get_key_name(user_id, pending)
 
-            # Store in Windows Credential Manager
-            keyring.set_password(SecureKeyManager.SERVICE_NAME, key_name, key_b64)
+            SecureKeyManager.get_backend().set(SecureKeyManager.SERVICE_NAME, key_name, key_b64)
+            SecureKeyManager._cache_put(key_name, wrapping_key)
             return True
         except Exception as e:
             print(f"Failed to store wrapping key: {e}")
             return False
 
     @staticmethod
-    def retrieve_wrapping_key(user_id: str) -> Optional[bytes]:
+    def retrieve_wrapping_key(user_id: str, pending: bool = False, use_cache: bool = True) -> Optional[bytes]:
         """
-        Retrieve wrapping key from Windows Credential Manager
+        Retrieve wrapping key, from the in-process cache when possible
         Returns the key bytes or None if not found
         """
         try:
-            key_name = SecureKeyManager._get_key_name(user_id)
-            key_b64 = keyring.get_password(SecureKeyManager.SERVICE_NAME, key_name)
+            key_name = SecureKeyManager._get_key_name(user_id, pending)
+            if use_cache:
+                cached = SecureKeyManager._cache_get(key_name)
+                if cached:
+                    return cached
+
+            key_b64 = SecureKeyManager.get_backend().get(SecureKeyManager.SERVICE_NAME, key_name)
 
             if key_b64:
                 # Convert base64 string back to bytes
-                return base64.b64decode(key_b64.encode('utf-8'))
+                wrapping_key = base64.b64decode(key_b64.encode('utf-8'))
+                SecureKeyManager._cache_put(key_name, wrapping_key)
+                return wrapping_key
             return None
         except Exception as e:
             print(f"Failed to retrieve wrapping key: {e}")
             return None
 
     @staticmethod
-    def delete_wrapping_key(user_id: str) -> bool:
+    def delete_wrapping_key(user_id: str, pending: bool = False) -> bool:
         """
-        Delete wrapping key from Windows Credential Manager
+        Delete wrapping key from the configured key store
         Returns True if successful, False otherwise
         """
         try:
-            key_name = SecureKeyManager._get_key_name(user_id)
-            keyring.delete_password(SecureKeyManager.SERVICE_NAME, key_name)
+            key_name = SecureKeyManager._get_key_name(user_id, pending)
+            with SecureKeyManager._lock:
+                SecureKeyManager._cache.pop(key_name, None)
+            SecureKeyManager.get_backend().delete(SecureKeyManager.SERVICE_NAME, key_name)
             return True
         except Exception as e:
             print(f"Failed to delete wrapping key: {e}")
@@ -0,0 +1,219 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
+
+from cryptography.exceptions import InvalidTag
+
+from .crypto_manager import CryptoManager
+from .identity_db_manager import DatabaseManager
+from .key_manager import SecureKeyManager
+
+
+def unwrap_user_kek(user_id: str, encrypted_kek: bytes) -> Optional[Tuple[bytes, bytes]]:
+    """
+    Decrypt a user's KEK with the stored wrapping key, falling back to the pending
+    wrapping key while a wrapping-key rotation is in flight, and finally to the key
+    store itself in case the in-process cache predates a rotation.
+    Returns (wrapping_key, kek) or None if no key opens it.
+    """
+    for use_cache in (True, False):
+        for pending in (False, True):
+            wrapping_key = SecureKeyManager.retrieve_wrapping_key(user_id, pending=pending, use_cache=use_cache)
+            if not wrapping_key:
+                continue
+            try:
+                return wrapping_key, CryptoManager.decrypt_with_key(encrypted_kek, wrapping_key)
+            except InvalidTag:
+                continue
+    return None
+
+
+class KeyRotationPipeline:
+    """
+    Rotates per-user KEKs and wrapping keys across the identity vault.
+
+    KEK rotation re-wraps every DEK in user_data. Rows are read in chunks, re-wrapped on a
+    worker pool while the next chunk is read and the previous one committed, and each
+    chunk is written in one transaction together with a checkpoint in `key_rotations`,
+    so an interrupted rotation resumes where it stopped.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, chunk_size: int = 500, workers: int = 4,
+                 max_rows_per_second: Optional[float] = None):
+        """
+        Args:
+            db_manager: Vault to rotate
+            chunk_size: user_data rows read and committed per transaction
+            workers: Threads re-wrapping slices of each chunk
+            max_rows_per_second: Upper bound on re-wrap throughput so live sessions
+                keep getting the write lock; None disables throttling
+        """
+        self.db_manager = db_manager
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.max_rows_per_second = max_rows_per_second
+        # One thread drives the chunk pipeline and fans each chunk out to the slice pool.
+        # Slices never run on the pipeline thread, so a chunk waiting on its slices
+        # cannot hold the workers those slices need, whatever `workers` is.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kek-rotation")
+        self._slice_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kek-rewrap")
+
+    def close(self):
+        """Stop the worker pools"""
+        self._executor.shutdown(wait=True)
+        self._slice_executor.shutdown(wait=True)
+
+    @staticmethod
+    def _rewrap_slice(rows: List[Tuple[int, bytes]], old_kek: bytes, new_kek: bytes) -> List[Tuple[bytes, int, bytes]]:
+        """Unwrap DEKs with the old KEK and wrap them with the new one, as (new DEK, id, DEK as read)"""
+        blobs = [row[1] for row in rows]
+        try:
+            deks = CryptoManager.decrypt_batch(blobs, old_kek)
+        except InvalidTag:
+            # Some rows were already re-wrapped (resumed run, or written by a live session)
+            deks = []
+            for blob in blobs:
+                try:
+                    deks.append(CryptoManager.decrypt_with_key(blob, old_kek))
+                except InvalidTag:
+                    deks.append(CryptoManager.decrypt_with_key(blob, new_kek))
+        wrapped = CryptoManager.encrypt_batch(deks, new_kek)
+        return [(bytes(blob), row[0], row[1]) for blob, row in zip(wrapped, rows)]
+
+    @staticmethod
+    def _rewrap_stale(rows: List[Tuple[int, bytes]], old_kek: bytes, new_kek: bytes) -> List[Tuple[bytes, int]]:
+        """(encrypted_dek, id) updates for the rows whose DEK is still wrapped with the old KEK"""
+        updates = []
+        for row_id, blob in rows:
+            try:
+                CryptoManager.decrypt_with_key(blob, new_kek)
+            except InvalidTag:
+                dek = CryptoManager.decrypt_with_key(blob, old_kek)
+                updates.append((CryptoManager.encrypt_with_key(dek, new_kek), row_id))
+        return updates
+
+    def _rewrap_chunk(self, rows: List[Tuple[int, bytes]], old_kek: bytes, new_kek: bytes) -> List[Tuple[bytes, int, bytes]]:
+        """Split a chunk across the slice pool and gather the re-wrapped rows in order"""
+        step = max(1, -(-len(rows) // self.workers))
+        futures = [
+            self._slice_executor.submit(self._rewrap_slice, rows[start:start + step], old_kek, new_kek)
+            for start in range(0, len(rows), step)
+        ]
+        updates = []
+        for future in futures:
+            updates.extend(future.result())
+        return updates
+
+    def _throttle(self, rows: int, started_at: float):
+        """Sleep so that throughput stays under max_rows_per_second"""
+        if not self.max_rows_per_second:
+            return
+        remaining = rows / self.max_rows_per_second - (time.perf_counter() - started_at)
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def rotate_user_kek(self, user_id: str) -> Dict[str, Any]:
+        """Rotate one user's KEK, resuming an interrupted rotation if there is one"""
+        user = self.db_manager.get_user_by_id(user_id)
+        if not user:
+            return {"result": False, "error": f"User {user_id} not found"}
+
+        keys = unwrap_user_kek(user_id, user['encrypted_kek'])
+        if not keys:
+            return {"result": False, "error": f"Failed to unwrap KEK for {user_id}"}
+        wrapping_key, old_kek = keys
+
+        rotation = self.db_manager.get_key_rotation(user_id)
+        if rotation:
+            new_kek = CryptoManager.decrypt_with_key(rotation['pending_encrypted_kek'], wrapping_key)
+            last_row_id = rotation['last_row_id']
+        else:
+            new_kek = CryptoManager.generate_key()
+            self.db_manager.begin_key_rotation(user_id, CryptoManager.encrypt_with_key(new_kek, wrapping_key))
+            last_row_id = 0
+
+        rows_rewrapped = 0
+        in_flight = None
+        while True:
+            started_at = time.perf_counter()
+            rows = self.db_manager.get_wrapped_deks(user_id, last_row_id, self.chunk_size)
+            submitted = None
+            if rows:
+                # Re-wrap this chunk while the previous one is committed
+                submitted = (self._executor.submit(self._rewrap_chunk, rows, old_kek, new_kek), rows[-1][0])
+                last_row_id = rows[-1][0]
+            if in_flight:
+                future, chunk_last_row_id = in_flight
+                updates = future.result()
+                changed = self.db_manager.apply_rewrapped_deks(user_id, updates, chunk_last_row_id)
+                # Rows a live session rewrote after they were read: re-read and re-wrap those
+                while changed:
+                    reread = self.db_manager.get_wrapped_deks_by_id(user_id, changed)
+                    retry = self._rewrap_slice(reread, old_kek, new_kek) if reread else []
+                    changed = self.db_manager.apply_rewrapped_deks(user_id, retry, chunk_last_row_id)
+                rows_rewrapped += len(updates)
+                self._throttle(len(updates), started_at)
+            if not submitted:
+                break
+            in_flight = submitted
+
+        # Rows written with the old KEK after they were scanned are re-wrapped under the
+        # write lock, in the transaction that promotes the new KEK
+        rows_rewrapped += self.db_manager.finish_key_rotation(
+            user_id, lambda rows: self._rewrap_stale(rows, old_kek, new_kek)
+        )
+        return {"result": True, "user_id": user_id, "rows_rewrapped": rows_rewrapped}
+
+    def rotate_user_wrapping_key(self, user_id: str) -> Dict[str, Any]:
+        """
+        Rotate one user's wrapping key. The new key is parked in a pending keyring slot
+        until the vault has been updated, so a crash at any step is recoverable.
+        """
+        if self.db_manager.get_key_rotation(user_id):
+            # The pending KEK is wrapped with the current wrapping key; finish that first
+            self.rotate_user_kek(user_id)
+
+        user = self.db_manager.get_user_by_id(user_id)
+        if not user:
+            return {"result": False, "error": f"User {user_id} not found"}
+
+        pending_key = SecureKeyManager.retrieve_wrapping_key(user_id, pending=True)
+        vault_updated = False
+        if pending_key:
+            try:
+                kek = CryptoManager.decrypt_with_key(user['encrypted_kek'], pending_key)
+                vault_updated = True
+            except InvalidTag:
+                kek = None
+        if not vault_updated:
+            current_key = SecureKeyManager.retrieve_wrapping_key(user_id)
+            if not current_key:
+                return {"result": False, "error": f"No wrapping key stored for {user_id}"}
+            kek = CryptoManager.decrypt_with_key(user['encrypted_kek'], current_key)
+            if not pending_key:
+                pending_key = CryptoManager.generate_key()
+                if not SecureKeyManager.store_wrapping_key(user_id, pending_key, pending=True):
+                    return {"result": False, "error": "Failed to store pending wrapping key"}
+            self.db_manager.update_encrypted_kek(user_id, CryptoManager.encrypt_with_key(kek, pending_key))
+
+        if not SecureKeyManager.store_wrapping_key(user_id, pending_key):
+            return {"result": False, "error": "Failed to promote pending wrapping key"}
+        SecureKeyManager.delete_wrapping_key(user_id, pending=True)
+        return {"result": True, "user_id": user_id}
+
+    def rotate_vault(self, rotate_kek: bool = True, rotate_wrapping_key: bool = False) -> Dict[str, Any]:
+        """Rotate keys for every user in the vault, streaming user IDs shard by shard"""
+        report = {"users_rotated": 0, "rows_rewrapped": 0, "failures": []}
+        for user_id in self.db_manager.iter_user_ids():
+            results = []
+            if rotate_kek:
+                results.append(self.rotate_user_kek(user_id))
+            if rotate_wrapping_key:
+                results.append(self.rotate_user_wrapping_key(user_id))
+            failed = [result["error"] for result in results if not result["result"]]
+            if failed:
+                report["failures"].extend(failed)
+                continue
+            report["users_rotated"] += 1
+            report["rows_rewrapped"] += sum(result.get("rows_rewrapped", 0) for result in results)
+        return report
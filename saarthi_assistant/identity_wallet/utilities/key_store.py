@@ -0,0 +1,165 @@
+import os
+import json
+import stat
+import base64
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional, Dict
+
+import appdirs
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+from .crypto_manager import CryptoManager
+
+
+class KeyStoreBackend(ABC):
+    """Storage for base64-encoded wrapping keys, addressed by service and key name"""
+
+    name = "abstract"
+
+    @abstractmethod
+    def get(self, service: str, key_name: str) -> Optional[str]:
+        """Return the stored value or None"""
+
+    @abstractmethod
+    def set(self, service: str, key_name: str, value: str):
+        """Store or replace a value"""
+
+    @abstractmethod
+    def delete(self, service: str, key_name: str):
+        """Remove a value"""
+
+
+class KeyringBackend(KeyStoreBackend):
+    """OS secret service via `keyring` (Windows Credential Manager, macOS Keychain, D-Bus)"""
+
+    name = "keyring"
+
+    def get(self, service: str, key_name: str) -> Optional[str]:
+        import keyring
+        return keyring.get_password(service, key_name)
+
+    def set(self, service: str, key_name: str, value: str):
+        import keyring
+        keyring.set_password(service, key_name, value)
+
+    def delete(self, service: str, key_name: str):
+        import keyring
+        keyring.delete_password(service, key_name)
+
+    @staticmethod
+    def is_available() -> bool:
+        """False on headless hosts where keyring falls back to its fail backend"""
+        try:
+            import keyring
+            from keyring.backends import fail
+            return not isinstance(keyring.get_keyring(), fail.Keyring)
+        except Exception:
+            return False
+
+
+class EncryptedFileBackend(KeyStoreBackend):
+    """
+    Local key file for headless servers. Values are AES-GCM encrypted under a key
+    derived with scrypt from SAARTHI_KEYSTORE_PASSPHRASE. The file must be owned by the
+    current user and not readable by group or others, and is rewritten atomically.
+    """
+
+    name = "file"
+
+    def __init__(self, path: Optional[str] = None, passphrase: Optional[str] = None):
+        self.path = path or os.path.join(appdirs.user_data_dir("Saarthi", "AlgoHackers"), "wrapping_keys.json")
+        self._passphrase = passphrase if passphrase is not None else os.getenv("SAARTHI_KEYSTORE_PASSPHRASE")
+        self._lock = threading.Lock()
+        self._file_key: Optional[bytes] = None
+        self._document: Optional[Dict] = None
+        self._mtime: Optional[int] = None
+
+    def _check_permissions(self):
+        info = os.stat(self.path)
+        if hasattr(os, "getuid") and info.st_uid != os.getuid():
+            raise PermissionError(f"{self.path} is not owned by the current user")
+        if info.st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+            raise PermissionError(f"{self.path} must not be accessible by group or others (chmod 600)")
+
+    def _load(self) -> Dict:
+        """Read the key file, re-reading only when another process has replaced it"""
+        mtime = os.stat(self.path).st_mtime_ns if os.path.exists(self.path) else None
+        if self._document is not None and mtime == self._mtime:
+            return self._document
+        if not self._passphrase:
+            raise RuntimeError("SAARTHI_KEYSTORE_PASSPHRASE is required for the file key store")
+
+        if mtime is not None:
+            self._check_permissions()
+            with open(self.path, "r", encoding="utf-8") as key_file:
+                document = json.load(key_file)
+        else:
+            document = {"salt": base64.b64encode(os.urandom(16)).decode("ascii"), "keys": {}}
+
+        # Slow by design, so only repeated when the salt changes; lookups are then a dict read plus one AES-GCM decrypt
+        if self._file_key is None or document["salt"] != (self._document or {}).get("salt"):
+            kdf = Scrypt(salt=base64.b64decode(document["salt"]), length=32, n=2 ** 14, r=8, p=1)
+            self._file_key = kdf.derive(self._passphrase.encode("utf-8"))
+        self._document = document
+        self._mtime = mtime
+        return document
+
+    def _save(self, document: Dict):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as key_file:
+            json.dump(document, key_file)
+            key_file.flush()
+            os.fsync(key_file.fileno())
+        os.replace(temp_path, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    @staticmethod
+    def _entry(service: str, key_name: str) -> str:
+        return f"{service}/{key_name}"
+
+    def get(self, service: str, key_name: str) -> Optional[str]:
+        with self._lock:
+            document = self._load()
+            sealed = document["keys"].get(self._entry(service, key_name))
+            if sealed is None:
+                return None
+            try:
+                return CryptoManager.decrypt_with_key(base64.b64decode(sealed), self._file_key).decode("utf-8")
+            except InvalidTag:
+                raise PermissionError("Key file passphrase is incorrect") from None
+
+    def set(self, service: str, key_name: str, value: str):
+        with self._lock:
+            document = self._load()
+            sealed = CryptoManager.encrypt_with_key(value.encode("utf-8"), self._file_key)
+            document["keys"][self._entry(service, key_name)] = base64.b64encode(sealed).decode("ascii")
+            self._save(document)
+
+    def delete(self, service: str, key_name: str):
+        with self._lock:
+            document = self._load()
+            if document["keys"].pop(self._entry(service, key_name), None) is None:
+                raise KeyError(key_name)
+            self._save(document)
+
+
+def create_backend(name: Optional[str] = None) -> KeyStoreBackend:
+    """
+    Build the backend named by `name` or SAARTHI_KEY_BACKEND: "keyring", "file" or
+    "auto" (default), which uses keyring when a real secret service exists and the
+    encrypted file otherwise.
+    """
+    name = (name or os.getenv("SAARTHI_KEY_BACKEND", "auto")).lower()
+    if name == "keyring":
+        return KeyringBackend()
+    if name == "file":
+        return EncryptedFileBackend()
+    if name == "auto":
+        return KeyringBackend() if KeyringBackend.is_available() else EncryptedFileBackend()
+    raise ValueError(f"Unknown key store backend '{name}'")
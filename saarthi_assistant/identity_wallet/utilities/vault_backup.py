@@ -0,0 +1,246 @@
+import os
+import json
+import base64
+import hashlib
+import sqlite3
+import struct
+import tempfile
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Iterator, Tuple, BinaryIO
+
+from .identity_db_manager import DatabaseManager, get_shard_index
+
+# Archive layout:
+#   MAGIC + FORMAT_VERSION
+#   frames of: type (1 byte) + payload length (4 bytes) + SHA-256 of payload (32 bytes) + zlib payload
+#   'C' frames carry one chunk of rows, the final 'E' frame carries the manifest
+MAGIC = b"SAARTHIVAULT"
+FORMAT_VERSION = 1
+FRAME_HEADER = struct.Struct(">cI32s")
+CHUNK_FRAME = b"C"
+END_FRAME = b"E"
+
+# Columns exported per table; paged by the key column. user_data ids are per-file and
+# are reassigned on restore, in-flight rotations restart their scan.
+BACKUP_TABLES = {
+    "users": {
+        "key": "user_id",
+        "columns": ["user_id", "first_name", "last_name", "dob", "phone", "face_embedding", "encrypted_kek", "created_at"],
+    },
+    "user_data": {
+        "key": "id",
+        "columns": ["id", "user_id", "data_type", "encrypted_data", "encrypted_dek", "version", "created_at"],
+    },
+    "key_rotations": {
+        "key": "user_id",
+        "columns": ["user_id", "pending_encrypted_kek", "last_row_id", "started_at"],
+    },
+}
+
+
+def _encode_value(value):
+    """JSON-safe encoding; BLOBs are tagged base64"""
+    if isinstance(value, bytes):
+        return {"b": base64.b64encode(value).decode("ascii")}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        return base64.b64decode(value["b"])
+    return value
+
+
+def _write_frame(output: BinaryIO, frame_type: bytes, document: Dict[str, Any], level: int) -> str:
+    payload = zlib.compress(json.dumps(document, separators=(",", ":")).encode("utf-8"), level)
+    digest = hashlib.sha256(payload).digest()
+    output.write(FRAME_HEADER.pack(frame_type, len(payload), digest))
+    output.write(payload)
+    return digest.hex()
+
+
+def _read_exact(archive: BinaryIO, size: int) -> bytes:
+    """Read exactly `size` bytes; a short read means the archive was cut off"""
+    data = archive.read(size)
+    if len(data) != size:
+        raise ValueError("truncated backup archive")
+    return data
+
+
+def _read_frames(archive: BinaryIO) -> Iterator[Tuple[bytes, str, Dict[str, Any]]]:
+    """Yield (frame_type, digest, document) triples, verifying every checksum"""
+    if archive.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a Saarthi vault backup")
+    version = _read_exact(archive, 1)[0]
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported backup format version {version}")
+    while True:
+        header = archive.read(FRAME_HEADER.size)
+        if not header:
+            raise ValueError("Backup is truncated: missing end frame")
+        if len(header) != FRAME_HEADER.size:
+            raise ValueError("truncated backup archive")
+        frame_type, length, digest = FRAME_HEADER.unpack(header)
+        payload = _read_exact(archive, length)
+        if hashlib.sha256(payload).digest() != digest:
+            raise ValueError("Backup chunk failed checksum verification")
+        yield frame_type, digest.hex(), json.loads(zlib.decompress(payload))
+        if frame_type == END_FRAME:
+            return
+
+
+def _iter_pages(conn: sqlite3.Connection, table: str, page_size: int) -> Iterator[List[tuple]]:
+    """Keyset-paginated reads; each page is its own short read so writers are not blocked"""
+    spec = BACKUP_TABLES[table]
+    key = spec["key"]
+    query = f"SELECT {', '.join(spec['columns'])} FROM {table} WHERE {key} > ? ORDER BY {key} LIMIT ?"
+    key_index = spec["columns"].index(key)
+    last_key = "" if key == "user_id" else 0
+    while True:
+        rows = conn.execute(query, (last_key, page_size)).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_key = rows[-1][key_index]
+
+
+def _snapshot(shard_path: str, snapshot_path: str, pages_per_step: int = 256):
+    """Copy a live shard with the online backup API, a few pages at a time"""
+    source = sqlite3.connect(shard_path)
+    target = sqlite3.connect(snapshot_path)
+    try:
+        source.backup(target, pages=pages_per_step, sleep=0.005)
+    finally:
+        target.close()
+        source.close()
+
+
+def export_vault(db_manager: DatabaseManager, output_path: str, page_size: int = 1000,
+                 consistent: bool = False, compression_level: int = 6) -> Dict[str, Any]:
+    """
+    Stream every shard's rows, still encrypted, into a chunked, compressed, checksummed archive.
+
+    Memory is bounded by `page_size` rows. With `consistent=True` each shard is first
+    copied with the SQLite online backup API and exported from that snapshot; otherwise
+    rows are paged straight from the live vault (each page is a point-in-time read).
+    """
+    row_counts = {table: 0 for table in BACKUP_TABLES}
+    chunk_digests = []
+    temp_dir = tempfile.mkdtemp(prefix="saarthi_backup_") if consistent else None
+
+    try:
+        with open(output_path, "wb") as output:
+            output.write(MAGIC + bytes([FORMAT_VERSION]))
+            for shard_index, shard_path in enumerate(db_manager.shard_paths):
+                source_path = shard_path
+                if consistent:
+                    source_path = os.path.join(temp_dir, f"shard{shard_index}.db")
+                    _snapshot(shard_path, source_path)
+                conn = sqlite3.connect(source_path)
+                try:
+                    for table, spec in BACKUP_TABLES.items():
+                        for rows in _iter_pages(conn, table, page_size):
+                            chunk_digests.append(_write_frame(output, CHUNK_FRAME, {
+                                "table": table,
+                                "columns": spec["columns"],
+                                "rows": [[_encode_value(value) for value in row] for row in rows],
+                            }, compression_level))
+                            row_counts[table] += len(rows)
+                finally:
+                    conn.close()
+                    if consistent:
+                        os.remove(source_path)
+
+            archive_digest = hashlib.sha256("".join(chunk_digests).encode("ascii")).hexdigest()
+            _write_frame(output, END_FRAME, {
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "row_counts": row_counts,
+                "chunks": len(chunk_digests),
+                "archive_digest": archive_digest,
+            }, compression_level)
+    finally:
+        if temp_dir:
+            os.rmdir(temp_dir)
+
+    return {
+        "result": True,
+        "path": output_path,
+        "row_counts": row_counts,
+        "chunks": len(chunk_digests),
+        "size_bytes": os.path.getsize(output_path),
+    }
+
+
+def restore_vault(db_manager: DatabaseManager, archive_path: str) -> Dict[str, Any]:
+    """
+    Bulk-load an archive produced by export_vault into an empty vault.
+
+    Rows are routed to this manager's shards and inserted chunk by chunk with executemany,
+    with the secondary index dropped during the load and rebuilt afterwards. Each shard
+    is loaded in one transaction that is only committed once the whole archive has been
+    verified, so a corrupt or incomplete archive leaves the vault empty and indexed.
+    """
+    for shard_path in db_manager.shard_paths:
+        with sqlite3.connect(shard_path) as conn:
+            if conn.execute("SELECT EXISTS (SELECT 1 FROM users)").fetchone()[0]:
+                return {"result": False, "error": f"Refusing to restore into non-empty vault {shard_path}"}
+
+    # Transactions are managed explicitly so that the index drop is part of the load
+    connections = [sqlite3.connect(shard_path, isolation_level=None) for shard_path in db_manager.shard_paths]
+    row_counts = {table: 0 for table in BACKUP_TABLES}
+    chunk_digests = []
+    manifest = None
+    try:
+        for conn in connections:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DROP INDEX IF EXISTS idx_user_data_version")
+
+        try:
+            with open(archive_path, "rb") as archive:
+                for frame_type, digest, document in _read_frames(archive):
+                    if frame_type == END_FRAME:
+                        manifest = document
+                        break
+
+                    table = document["table"]
+                    columns = [column for column in document["columns"] if column != "id"]
+                    user_id_index = document["columns"].index("user_id")
+                    keep = [index for index, column in enumerate(document["columns"]) if column != "id"]
+                    insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+                    by_shard: Dict[int, List[tuple]] = {}
+                    for row in document["rows"]:
+                        shard = get_shard_index(row[user_id_index], db_manager.shard_count)
+                        values = [_decode_value(row[index]) for index in keep]
+                        if table == "key_rotations":
+                            values[columns.index("last_row_id")] = 0
+                        by_shard.setdefault(shard, []).append(tuple(values))
+
+                    for shard, rows in by_shard.items():
+                        connections[shard].executemany(insert, rows)
+                    row_counts[table] += len(document["rows"])
+                    chunk_digests.append(digest)
+        except ValueError as e:
+            return {"result": False, "error": f"Backup is corrupt: {str(e)}"}
+
+        if manifest is None:
+            return {"result": False, "error": "Backup has no manifest"}
+        if hashlib.sha256("".join(chunk_digests).encode("ascii")).hexdigest() != manifest["archive_digest"]:
+            return {"result": False, "error": "Backup chunks do not match the manifest digest"}
+        if manifest["row_counts"] != row_counts:
+            return {"result": False, "error": f"Row counts {row_counts} do not match manifest {manifest['row_counts']}"}
+
+        for conn in connections:
+            DatabaseManager.create_version_index(conn.cursor())
+            conn.execute("COMMIT")
+            conn.execute("ANALYZE")
+    finally:
+        for conn in connections:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # The rollback restores the dropped index; recreate it in case a commit got partway
+            DatabaseManager.create_version_index(conn.cursor())
+            conn.close()
+
+    return {"result": True, "row_counts": row_counts, "backup_created_at": manifest["created_at"]}
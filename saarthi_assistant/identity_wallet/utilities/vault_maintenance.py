@@ -0,0 +1,114 @@
+import argparse
+import os
+from typing import Optional, List
+
+from .identity_db_manager import DatabaseManager, get_default_vault_path
+from .key_rotation import KeyRotationPipeline
+from .vault_backup import export_vault, restore_vault
+
+
+def compact_vault(db_path: Optional[str] = None, versions_to_keep: Optional[int] = None, full_vacuum: bool = False,
+                  shard_count: int = 1):
+    """Prune superseded PII versions and vacuum the vault; keeps PII_VERSIONS_TO_KEEP versions by default, as the app does"""
+    db_manager = DatabaseManager(db_path or get_default_vault_path(),
+                                 pii_versions_to_keep=int(os.getenv("PII_VERSIONS_TO_KEEP", 3)), shard_count=shard_count)
+    return db_manager.compact(versions_to_keep=versions_to_keep, full_vacuum=full_vacuum)
+
+
+def rebalance_vault(db_path: Optional[str] = None, from_shards: int = 1, to_shards: int = 1):
+    """Redistribute users from a `from_shards` layout into a `to_shards` layout"""
+    db_manager = DatabaseManager(db_path or get_default_vault_path(), shard_count=to_shards)
+    return db_manager.rebalance(from_shard_count=from_shards)
+
+
+def rotate_vault_keys(db_path: Optional[str] = None, shard_count: int = 1, rotate_kek: bool = True,
+                      rotate_wrapping_key: bool = False, chunk_size: int = 500, workers: int = 4,
+                      max_rows_per_second: Optional[float] = None):
+    """Rotate KEKs and/or wrapping keys for every user in the vault"""
+    db_manager = DatabaseManager(db_path or get_default_vault_path(), shard_count=shard_count)
+    pipeline = KeyRotationPipeline(db_manager, chunk_size=chunk_size, workers=workers,
+                                   max_rows_per_second=max_rows_per_second)
+    try:
+        return pipeline.rotate_vault(rotate_kek=rotate_kek, rotate_wrapping_key=rotate_wrapping_key)
+    finally:
+        pipeline.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Maintenance commands for the identity vault.
+
+    Usage:
+        python -m saarthi_assistant.identity_wallet.utilities.vault_maintenance compact --keep 3
+        python -m saarthi_assistant.identity_wallet.utilities.vault_maintenance rebalance --from-shards 1 --to-shards 4
+        python -m saarthi_assistant.identity_wallet.utilities.vault_maintenance rotate --wrapping-key --max-rows-per-second 2000
+        python -m saarthi_assistant.identity_wallet.utilities.vault_maintenance backup vault.sbk --consistent
+        python -m saarthi_assistant.identity_wallet.utilities.vault_maintenance restore vault.sbk
+    """
+    parser = argparse.ArgumentParser(description="Saarthi identity vault maintenance")
+    parser.add_argument("--db-path", default=None, help="Path to identity_vault.db (defaults to the app data dir)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compact_parser = subparsers.add_parser("compact", help="Prune superseded PII versions and vacuum")
+    compact_parser.add_argument("--keep", type=int, default=None,
+                                help="PII versions to keep per data type (default: PII_VERSIONS_TO_KEEP, 3)")
+    compact_parser.add_argument("--full", action="store_true", help="Force a full VACUUM")
+    compact_parser.add_argument("--shards", type=int, default=1, help="Number of vault shards")
+
+    rebalance_parser = subparsers.add_parser("rebalance", help="Move users between shard layouts")
+    rebalance_parser.add_argument("--from-shards", type=int, required=True, help="Current shard count")
+    rebalance_parser.add_argument("--to-shards", type=int, required=True, help="Target shard count")
+
+    rotate_parser = subparsers.add_parser("rotate", help="Rotate KEKs (re-wrapping every DEK) and/or wrapping keys")
+    rotate_parser.add_argument("--shards", type=int, default=1, help="Number of vault shards")
+    rotate_parser.add_argument("--skip-kek", action="store_true", help="Do not rotate KEKs")
+    rotate_parser.add_argument("--wrapping-key", action="store_true", help="Also rotate keyring wrapping keys")
+    rotate_parser.add_argument("--chunk-size", type=int, default=500, help="Rows per committed batch")
+    rotate_parser.add_argument("--workers", type=int, default=4, help="Re-wrap worker threads")
+    rotate_parser.add_argument("--max-rows-per-second", type=float, default=None, help="Throttle for live vaults")
+
+    backup_parser = subparsers.add_parser("backup", help="Export the still-encrypted vault to an archive")
+    backup_parser.add_argument("output", help="Archive path")
+    backup_parser.add_argument("--shards", type=int, default=1, help="Number of vault shards")
+    backup_parser.add_argument("--page-size", type=int, default=1000, help="Rows per archive chunk")
+    backup_parser.add_argument("--consistent", action="store_true", help="Export from an online-backup snapshot")
+
+    restore_parser = subparsers.add_parser("restore", help="Bulk-load an archive into an empty vault")
+    restore_parser.add_argument("archive", help="Archive path")
+    restore_parser.add_argument("--shards", type=int, default=1, help="Number of vault shards to restore into")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compact":
+        if args.keep is not None and args.keep < 1:
+            parser.error("--keep must be at least 1")
+        report = compact_vault(args.db_path, versions_to_keep=args.keep, full_vacuum=args.full, shard_count=args.shards)
+        print(f"Pruned {report['rows_pruned']} superseded rows ({report['mode']})")
+        print(f"Size: {report['size_before']} -> {report['size_after']} bytes, "
+              f"reclaimed {report['bytes_reclaimed']} bytes")
+    elif args.command == "rebalance":
+        report = rebalance_vault(args.db_path, from_shards=args.from_shards, to_shards=args.to_shards)
+        print(f"Moved {report['users_moved']} users and {report['rows_moved']} PII rows "
+              f"into {report['shard_count']} shards")
+    elif args.command == "rotate":
+        report = rotate_vault_keys(args.db_path, shard_count=args.shards, rotate_kek=not args.skip_kek,
+                                   rotate_wrapping_key=args.wrapping_key, chunk_size=args.chunk_size,
+                                   workers=args.workers, max_rows_per_second=args.max_rows_per_second)
+        print(f"Rotated keys for {report['users_rotated']} users, re-wrapped {report['rows_rewrapped']} DEKs")
+        for failure in report["failures"]:
+            print(f"  failed: {failure}")
+    elif args.command == "backup":
+        db_manager = DatabaseManager(args.db_path or get_default_vault_path(), shard_count=args.shards)
+        report = export_vault(db_manager, args.output, page_size=args.page_size, consistent=args.consistent)
+        print(f"Exported {report['row_counts']} in {report['chunks']} chunks ({report['size_bytes']} bytes)")
+    elif args.command == "restore":
+        db_manager = DatabaseManager(args.db_path or get_default_vault_path(), shard_count=args.shards)
+        report = restore_vault(db_manager, args.archive)
+        if report["result"]:
+            print(f"Restored {report['row_counts']} from backup created at {report['backup_created_at']}")
+        else:
+            print(f"Restore failed: {report['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,10 @@ from typing import Dict, Any, Optional, List, Literal
 from typing_extensions import TypedDict, Annotated
 from langgraph.graph import StateGraph, START, END, add_messages
 from langgraph.prebuilt import ToolNode, InjectedState
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, BaseMessage, trim_messages
 from langchain_core.tools import tool
 from langchain_ollama.chat_models import ChatOllama
-import sqlite3
-from langgraph.checkpoint.sqlite import SqliteSaver
-from langgraph.checkpoint.serde.encrypted import EncryptedSerializer
 from langchain_community.tools import DuckDuckGoSearchRun
 from langchain_tavily import TavilySearch
 from datetime import datetime, timedelta, timezone
@@ -16,6 +14,7 @@ from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from ..utilities.IdentityManger import get_identity_manager
 from .form_filler_graph import fill_web_form
+from .checkpointing import CheckpointRetention, create_checkpointer
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 from dotenv import load_dotenv
 import os
@@ -76,9 +75,11 @@ translator = ChatOpenAI(
 )
 
 # Checkpointer for agent sessions
-agent_checkpointer = SqliteSaver(
-    sqlite3.connect("agent_checkpoint.db", check_same_thread=False),
-    serde=EncryptedSerializer.from_pycryptodome_aes(),
+AGENT_CHECKPOINT_DB = "agent_checkpoint.db"
+agent_checkpointer = create_checkpointer(AGENT_CHECKPOINT_DB)
+# Conversations only resume from their latest checkpoint
+agent_retention = CheckpointRetention.from_env(
+    AGENT_CHECKPOINT_DB, "AGENT", max_age_hours=30 * 24, checkpoints_per_thread=20
 )
 
 # Constants
@@ -442,8 +443,8 @@ def route_summarize(state: AgentState) -> str:
     return "llm_interaction"
 
 # Graph Builder Function
-def create_agent_graph():
-    """Create and compile the agent graph"""
+def create_agent_graph(checkpointer: Optional[BaseCheckpointSaver] = None):
+    """Create and compile the agent graph (with `agent_checkpointer` unless one is given)"""
     builder = StateGraph(
         AgentState,
         input_schema=AgentInputState,
@@ -483,4 +484,4 @@ def create_agent_graph():
     builder.add_edge("tools", "llm_interaction")
     builder.add_edge("handle_error", END)
     
-    return builder.compile(checkpointer=agent_checkpointer) 
\ No newline at end of file
+    return builder.compile(checkpointer=checkpointer or agent_checkpointer) 
\ No newline at end of file
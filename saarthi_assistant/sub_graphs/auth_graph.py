@@ -1,16 +1,18 @@
 from typing import Dict, Any, Optional, Literal, List
 from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
+from langgraph.types import interrupt
 from langchain_core.messages import SystemMessage
-import sqlite3
+import os
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.checkpoint.sqlite import SqliteSaver
-from langgraph.checkpoint.serde.encrypted import EncryptedSerializer
+from .checkpointing import CheckpointRetention, create_checkpointer
 
 from ..utilities.IdentityManger import get_identity_manager
 
 # State Schema
 class AuthState(TypedDict):
-    auth_status: Literal["not_authenticated", "authenticated", "registration_needed", "waiting_for_registration", "registration_data_collected", "registration_data_missing", "pii_collection", "waiting_for_pii", "authentication_failed"]
+    auth_status: Literal["not_authenticated", "authenticated", "registration_needed", "waiting_for_registration", "registration_data_collected", "registration_data_missing", "registration_failed", "pii_collection", "waiting_for_pii", "pii_failed", "authentication_failed"]
     user_info: Optional[Dict[str, Any]]
     error_message: Optional[str]
     registration_data: Optional[Dict[str, str]]
@@ -28,29 +30,19 @@ class AuthOutputState(TypedDict):
     notes: Optional[str]
     pii_collection_complete: Optional[bool]
 
-# Checkpointer for auth sessions
-auth_checkpointer = SqliteSaver(
-    sqlite3.connect("auth_checkpoint.db", check_same_thread=False),
-    serde=EncryptedSerializer.from_pycryptodome_aes(),
-)
-
-# Global variable for HITL data collection
-_pending_user_input = {}
-
-def set_user_input(input_type: str, data: Dict[str, Any]):
-    """Set user input from frontend HITL interactions"""
-    global _pending_user_input
-    _pending_user_input[input_type] = data
-
-def get_user_input(input_type: str) -> Optional[Dict[str, Any]]:
-    """Get user input for HITL interactions"""
-    global _pending_user_input
-    return _pending_user_input.get(input_type)
+# Checkpointer for auth sessions: "sqlite" (default) or "memory" on kiosks that
+# do not need to resume logins across restarts
+AUTH_CHECKPOINT_DB = "auth_checkpoint.db"
+AUTH_CHECKPOINTER = os.getenv("AUTH_CHECKPOINTER", "sqlite")
+AUTH_CHECKPOINT_TTL_SECONDS = float(os.getenv("AUTH_CHECKPOINT_TTL_MINUTES", 15)) * 60
 
-def clear_user_input():
-    """Clear all pending user inputs"""
-    global _pending_user_input
-    _pending_user_input = {}
+auth_checkpointer = create_checkpointer(
+    AUTH_CHECKPOINT_DB, AUTH_CHECKPOINTER, ttl_seconds=AUTH_CHECKPOINT_TTL_SECONDS
+)
+# Login threads are never resumed once the session is over; memory mode evicts on its own
+auth_retention = CheckpointRetention.from_env(
+    AUTH_CHECKPOINT_DB, "AUTH", max_age_hours=24, checkpoints_per_thread=10
+) if isinstance(auth_checkpointer, SqliteSaver) else None
 
 # Node Functions
 def attempt_login(state: AuthState) -> AuthState:
@@ -97,22 +89,27 @@ def attempt_login(state: AuthState) -> AuthState:
             "error_message": str(e)
         } # type: ignore
 
+REQUIRED_REGISTRATION_FIELDS = ("first_name", "dob", "phone")
+
 def collect_registration_data(state: AuthState) -> AuthState:
     """Collect registration data from frontend (HITL)"""
-    # This is a HITL node - data will be set from frontend
-    registration_data = get_user_input("registration")
+    # Pauses the graph here; Command(resume=registration_data) continues from this point.
+    # After a failed enrollment the graph comes back here with the error for the form
+    error = state.get("error_message") if state.get("auth_status") == "registration_failed" else None
+    registration_data = interrupt({"type": "registration", "notes": state.get("notes"), "error": error})
     
-    if registration_data:
+    if registration_data and all(registration_data.get(field) for field in REQUIRED_REGISTRATION_FIELDS):
         return {
             "auth_status": "registration_data_collected",
             "registration_data": registration_data,
             "notes": "Registration data collected successfully"
         } # type: ignore
     else:
-        # Wait for user input - frontend will call this again after form submission
         return {
-            "auth_status": "waiting_for_registration",
-            "notes": "Waiting for registration data from user"
+            "auth_status": "registration_data_missing",
+            "auth_result": False,
+            "notes": "Registration data missing - user needs to choose retry or register",
+            "error_message": "Missing registration data"
         } # type: ignore
 
 def register_user(state: AuthState) -> AuthState:
@@ -128,11 +125,13 @@ def register_user(state: AuthState) -> AuthState:
             }
         
         identity_manager = get_identity_manager()
+        # Enrolls with the face captured by the failed login instead of capturing again
         result = identity_manager.add_user(
             first_name=registration_data["first_name"],
             last_name=registration_data.get("last_name"),
             dob=registration_data["dob"],
-            phone=int(registration_data["phone"])
+            phone=int(registration_data["phone"]),
+            reuse_login_capture=True
         )
         
         if result["result"]:
@@ -146,15 +145,16 @@ def register_user(state: AuthState) -> AuthState:
                 "notes": "Registration successful - PII collection required"
             }
         else:
+            # Back to the registration form; the login capture is still there for the retry
             return {
-                "auth_status": "authentication_failed",
+                "auth_status": "registration_failed",
                 "auth_result": False,
                 "notes": f"Registration failed: {result['error']}",
                 "error_message": result["error"]
             }
     except Exception as e:
         return {
-            "auth_status": "authentication_failed",
+            "auth_status": "registration_failed",
             "auth_result": False,
             "notes": f"Registration error: {str(e)}",
             "error_message": str(e)
@@ -162,18 +162,14 @@ def register_user(state: AuthState) -> AuthState:
 
 def collect_pii(state: AuthState) -> AuthState:
     """Collect and encrypt PII data (HITL)"""
+    # Pauses the graph here; Command(resume=pii_data) continues from this point.
+    # After a failed encryption the graph comes back here with the error for the form
+    error = state.get("error_message") if state.get("auth_status") == "pii_failed" else None
+    pii_data = interrupt({"type": "pii", "notes": state.get("notes"), "error": error})
+    while not pii_data:
+        # Stay paused until the form comes back with data
+        pii_data = interrupt({"type": "pii", "notes": "Waiting for PII data from user"})
     try:
-        # Get PII data from frontend HITL
-        pii_data = get_user_input("pii")
-        
-        if not pii_data:
-            # Wait for user input - frontend will call this again after form submission
-            return {
-                "auth_status": "waiting_for_pii",
-                "auth_result": False,
-                "notes": "Waiting for PII data from user"
-            }
-        
         identity_manager = get_identity_manager()
         
         # Encrypt and store each PII field
@@ -182,7 +178,7 @@ def collect_pii(state: AuthState) -> AuthState:
                 result = identity_manager.encrypt_pii_data(data_type, value)
                 if not result["result"]:
                     return {
-                        "auth_status": "authentication_failed",
+                        "auth_status": "pii_failed",
                         "auth_result": False,
                         "notes": f"PII encryption failed for {data_type}: {result['error']}",
                         "error_message": result["error"]
@@ -197,7 +193,7 @@ def collect_pii(state: AuthState) -> AuthState:
         
     except Exception as e:
         return {
-            "auth_status": "authentication_failed",
+            "auth_status": "pii_failed",
             "auth_result": False,
             "notes": f"PII collection error: {str(e)}",
             "error_message": str(e)
@@ -211,16 +207,6 @@ def handle_auth_error(state: AuthState) -> AuthState:
         "notes": error_message
     }
 
-# Entry point routing function
-def route_entry_point(state: AuthState) -> str:
-    """Route to appropriate starting node based on initial auth_status"""
-    auth_status = state.get("auth_status", "not_authenticated")
-    
-    if auth_status == "pii_collection":
-        return "collect_pii"
-    else:
-        return "attempt_login"
-
 # Routing Function
 def route_auth_result(state: AuthState) -> str:
     """Route based on authentication status"""
@@ -229,28 +215,23 @@ def route_auth_result(state: AuthState) -> str:
     if auth_status == "authenticated":
         return "__end__"
     elif auth_status == "registration_needed":
-        # Check if we have registration data
-        if state.get("registration_data"):
-            return "register_user"
         return "collect_registration_data"
-    elif auth_status == "waiting_for_registration":
-        return "__end__"  # Return to frontend to show registration form
     elif auth_status == "registration_data_collected":
         return "register_user"
+    elif auth_status == "registration_failed":
+        return "collect_registration_data"
     elif auth_status == "registration_data_missing":
         return "__end__"  # Return to frontend to show popup
-    elif auth_status == "pii_collection":
-        return "__end__"  # Return to frontend to show PII form
-    elif auth_status == "waiting_for_pii":
-        return "__end__"  # Return to frontend to show PII form (retry)
+    elif auth_status in ("pii_collection", "pii_failed"):
+        return "collect_pii"
     elif auth_status == "authentication_failed":
         return "handle_auth_error"
     else:
         return "__end__"
 
 # Graph Builder Function
-def create_auth_graph():
-    """Create and compile the authentication graph"""
+def create_auth_graph(checkpointer: Optional[BaseCheckpointSaver] = None):
+    """Create and compile the authentication graph (with `auth_checkpointer` unless one is given)"""
     builder = StateGraph(
         AuthState,
         input_schema=AuthInputState,
@@ -264,23 +245,17 @@ def create_auth_graph():
     builder.add_node("collect_pii", collect_pii)
     builder.add_node("handle_auth_error", handle_auth_error)
     
-    # Add edges - conditional entry point based on initial state
-    builder.add_conditional_edges(
-        START,
-        route_entry_point,
-        {
-            "attempt_login": "attempt_login",
-            "collect_pii": "collect_pii"
-        }
-    )
+    # Add edges - registration and PII collection pause inside their nodes with
+    # interrupt() and resume there, so the login capture never runs twice. A failed
+    # enrollment or PII write routes back to its form node for another attempt
+    builder.add_edge(START, "attempt_login")
     builder.add_conditional_edges(
         "attempt_login",
         route_auth_result,
         {
             "__end__": END,
             "collect_registration_data": "collect_registration_data",
-            "register_user": "register_user",
-            "authentication_failed": "handle_auth_error"
+            "handle_auth_error": "handle_auth_error"
         }
     )
     
@@ -298,8 +273,9 @@ def create_auth_graph():
         route_auth_result,
         {
             "__end__": END,
+            "collect_pii": "collect_pii",
             "collect_registration_data": "collect_registration_data",
-            "authentication_failed": "handle_auth_error"
+            "handle_auth_error": "handle_auth_error"
         }
     )
     
@@ -308,10 +284,11 @@ def create_auth_graph():
         route_auth_result,
         {
             "__end__": END,
-            "authentication_failed": "handle_auth_error"
+            "collect_pii": "collect_pii",
+            "handle_auth_error": "handle_auth_error"
         }
     )
     
     builder.add_edge("handle_auth_error", END)
     
-    return builder.compile(checkpointer=auth_checkpointer) 
\ No newline at end of file
+    return builder.compile(checkpointer=checkpointer or auth_checkpointer) 
\ No newline at end of file
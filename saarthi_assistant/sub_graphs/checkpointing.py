@@ -0,0 +1,495 @@
+import os
+import time
+import uuid
+import zlib
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Tuple, Iterator, Set
+
+import aiosqlite
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver, CheckpointTuple
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.encrypted import EncryptedSerializer
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _checkpoint_id_at(timestamp: float) -> str:
+    """
+    Smallest LangGraph checkpoint ID (uuid6) that could have been created at `timestamp`.
+    uuid6 IDs sort by creation time, so comparing against this string filters by age
+    without decrypting the checkpoint itself.
+    """
+    # 100ns intervals since the Gregorian epoch, as in uuid1/uuid6
+    ticks = int(timestamp * 10_000_000) + 0x01B21DD213814000
+    value = ((ticks >> 12) & 0xFFFFFFFFFFFF) << 80 | 0x6 << 76 | (ticks & 0x0FFF) << 64
+    return str(uuid.UUID(int=value))
+
+
+class CheckpointRetention:
+    """
+    Retention policy for a SqliteSaver database.
+
+    Threads whose newest checkpoint is older than `max_age_seconds` are deleted,
+    threads are trimmed to their `max_checkpoints_per_thread` newest checkpoints, and
+    free pages are returned to the filesystem with incremental vacuum (a full VACUUM
+    first converts the file, and is repeated every `vacuum_interval_seconds`).
+    `start()` runs this every `prune_interval_seconds` in a background thread.
+    """
+
+    def __init__(self, db_path: str, max_age_seconds: Optional[float] = None,
+                 max_checkpoints_per_thread: Optional[int] = None,
+                 prune_interval_seconds: float = 3600, vacuum_interval_seconds: float = 24 * 3600):
+        self.db_path = db_path
+        self.max_age_seconds = max_age_seconds
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.prune_interval_seconds = prune_interval_seconds
+        self.vacuum_interval_seconds = vacuum_interval_seconds
+        self._last_full_vacuum = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, db_path: str, prefix: str, max_age_hours: Optional[float] = None,
+                 checkpoints_per_thread: Optional[int] = None) -> "CheckpointRetention":
+        """
+        Policy from {prefix}_CHECKPOINT_MAX_AGE_HOURS and {prefix}_CHECKPOINTS_PER_THREAD
+        (falling back to the given defaults; 0 disables a limit), CHECKPOINT_PRUNE_INTERVAL_MINUTES
+        and CHECKPOINT_VACUUM_INTERVAL_HOURS
+        """
+        max_age_hours = float(os.getenv(f"{prefix}_CHECKPOINT_MAX_AGE_HOURS", max_age_hours or 0))
+        checkpoints_per_thread = int(os.getenv(f"{prefix}_CHECKPOINTS_PER_THREAD", checkpoints_per_thread or 0))
+        return cls(
+            db_path,
+            max_age_seconds=max_age_hours * 3600 or None,
+            max_checkpoints_per_thread=checkpoints_per_thread or None,
+            prune_interval_seconds=float(os.getenv("CHECKPOINT_PRUNE_INTERVAL_MINUTES", 60)) * 60,
+            vacuum_interval_seconds=float(os.getenv("CHECKPOINT_VACUUM_INTERVAL_HOURS", 24)) * 3600,
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Waits out the saver's own short write transactions
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    @staticmethod
+    def _has_tables(conn: sqlite3.Connection) -> bool:
+        """The saver creates its tables lazily on first use"""
+        return conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ('checkpoints', 'writes')"
+        ).fetchone()[0] == 2
+
+    @staticmethod
+    def _delete_orphan_writes(conn: sqlite3.Connection) -> int:
+        """Pending writes belonging to checkpoints that no longer exist"""
+        return conn.execute('''
+            DELETE FROM writes WHERE NOT EXISTS (
+                SELECT 1 FROM checkpoints c
+                WHERE c.thread_id = writes.thread_id
+                AND c.checkpoint_ns = writes.checkpoint_ns
+                AND c.checkpoint_id = writes.checkpoint_id
+            )
+        ''').rowcount
+
+    def delete_thread(self, thread_id: str) -> int:
+        """Delete every checkpoint and pending write of one thread, returns checkpoints deleted"""
+        try:
+            with self._connect() as conn:
+                if not self._has_tables(conn):
+                    return 0
+                conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+                return conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,)).rowcount
+        except sqlite3.Error as e:
+            print(f"Failed to delete checkpoints for thread {thread_id}: {e}")
+            return 0
+
+    def prune(self) -> Dict[str, int]:
+        """Apply the age and per-thread limits"""
+        expired = trimmed = writes = 0
+        with self._connect() as conn:
+            if not self._has_tables(conn):
+                return {'checkpoints_expired': 0, 'checkpoints_trimmed': 0, 'writes_deleted': 0}
+
+            if self.max_age_seconds:
+                cutoff = _checkpoint_id_at(time.time() - self.max_age_seconds)
+                expired = conn.execute('''
+                    DELETE FROM checkpoints WHERE thread_id IN (
+                        SELECT thread_id FROM checkpoints
+                        GROUP BY thread_id
+                        HAVING MAX(checkpoint_id) < ?
+                    )
+                ''', (cutoff,)).rowcount
+
+            if self.max_checkpoints_per_thread:
+                trimmed = conn.execute('''
+                    DELETE FROM checkpoints WHERE rowid IN (
+                        SELECT rowid FROM (
+                            SELECT rowid, ROW_NUMBER() OVER (
+                                PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                            ) AS position
+                            FROM checkpoints
+                        ) WHERE position > ?
+                    )
+                ''', (self.max_checkpoints_per_thread,)).rowcount
+
+            if expired or trimmed:
+                writes = self._delete_orphan_writes(conn)
+
+        return {'checkpoints_expired': expired, 'checkpoints_trimmed': trimmed, 'writes_deleted': writes}
+
+    def vacuum(self, full: bool = False) -> str:
+        """Return free pages to the filesystem, returns the mode used"""
+        # VACUUM cannot run inside a transaction
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            if full or auto_vacuum != 2:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+                self._last_full_vacuum = time.monotonic()
+                return "vacuum"
+            # The pragma frees one page per step; executescript runs it to completion
+            conn.executescript("PRAGMA incremental_vacuum;")
+            return "incremental_vacuum"
+        finally:
+            conn.close()
+
+    def run_once(self) -> Dict[str, Any]:
+        """One pruning pass followed by a vacuum"""
+        report = self.prune()
+        full = self._last_full_vacuum is None or \
+            time.monotonic() - self._last_full_vacuum >= self.vacuum_interval_seconds
+        report['vacuum'] = self.vacuum(full=full)
+        report['size_bytes'] = os.path.getsize(self.db_path)
+        return report
+
+    def _run_periodically(self):
+        while not self._stop_event.wait(self.prune_interval_seconds):
+            try:
+                self.run_once()
+            except sqlite3.Error as e:
+                print(f"Checkpoint pruning failed for {self.db_path}: {e}")
+
+    def start(self):
+        """Prune in a daemon thread every `prune_interval_seconds`"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run_periodically,
+            name=f"checkpoint-retention-{os.path.basename(self.db_path)}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop the pruning thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+
+class CompressedSerializer(SerializerProtocol):
+    """
+    Compresses the output of another serializer. Sits inside EncryptedSerializer, since
+    ciphertext does not compress.
+
+    Compressed payloads are tagged `<type>~<codec>`, so checkpoints written before
+    compression was enabled still load. Per-checkpoint ratio and time are kept in
+    `last_stats`, running totals in `stats()`.
+    """
+
+    def __init__(self, serde: Optional[SerializerProtocol] = None, codec: str = "zstd",
+                 level: Optional[int] = None, min_size: int = 512, verbose: bool = False):
+        """
+        Args:
+            serde: Serializer whose output is compressed (JsonPlusSerializer by default)
+            codec: "zstd" (falls back to zlib when zstandard is not installed) or "zlib"
+            level: Compression level, codec default when None
+            min_size: Payloads smaller than this are stored as-is
+            verbose: Print ratio and time for every checkpoint
+        """
+        if codec == "zstd" and zstandard is None:
+            codec = "zlib"
+        if codec not in ("zstd", "zlib"):
+            raise ValueError(f"Unknown checkpoint compression codec '{codec}'")
+        self.serde = serde or JsonPlusSerializer()
+        self.codec = codec
+        self.min_size = min_size
+        self.verbose = verbose
+        if codec == "zstd":
+            self.level = 3 if level is None else level
+        else:
+            self.level = 6 if level is None else level
+        self.last_stats: Dict[str, Any] = {}
+        self._totals = {'payloads': 0, 'raw_bytes': 0, 'stored_bytes': 0, 'compress_seconds': 0.0}
+        self._lock = threading.Lock()
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            # Compressor objects are not thread-safe, and cheap to create
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        return zlib.compress(data, self.level)
+
+    @staticmethod
+    def _decompress(codec: str, data: bytes) -> bytes:
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read zstd-compressed checkpoints")
+            return zstandard.ZstdDecompressor().decompress(data)
+        if codec == "zlib":
+            return zlib.decompress(data)
+        raise ValueError(f"Unknown checkpoint compression codec '{codec}'")
+
+    def _record(self, raw_bytes: int, stored_bytes: int, seconds: float):
+        self.last_stats = {
+            'raw_bytes': raw_bytes,
+            'stored_bytes': stored_bytes,
+            'ratio': raw_bytes / stored_bytes if stored_bytes else 1.0,
+            'compress_ms': seconds * 1000,
+        }
+        with self._lock:
+            self._totals['payloads'] += 1
+            self._totals['raw_bytes'] += raw_bytes
+            self._totals['stored_bytes'] += stored_bytes
+            self._totals['compress_seconds'] += seconds
+        if self.verbose:
+            print(f"Checkpoint payload {raw_bytes} -> {stored_bytes} bytes "
+                  f"({self.last_stats['ratio']:.1f}x, {self.last_stats['compress_ms']:.2f} ms)")
+
+    def stats(self) -> Dict[str, Any]:
+        """Totals since this serializer was created"""
+        with self._lock:
+            totals = dict(self._totals)
+        totals['ratio'] = totals['raw_bytes'] / totals['stored_bytes'] if totals['stored_bytes'] else 1.0
+        return totals
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        typ, data = self.serde.dumps_typed(obj)
+        if len(data) < self.min_size:
+            return typ, data
+        started_at = time.perf_counter()
+        compressed = self._compress(data)
+        elapsed = time.perf_counter() - started_at
+        if len(compressed) >= len(data):
+            self._record(len(data), len(data), elapsed)
+            return typ, data
+        self._record(len(data), len(compressed), elapsed)
+        # Not "+": EncryptedSerializer splits its own suffix on the first "+"
+        return f"{typ}~{self.codec}", compressed
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        typ, payload = data
+        if "~" in typ:
+            typ, codec = typ.rsplit("~", 1)
+            payload = self._decompress(codec, payload)
+        return self.serde.loads_typed((typ, payload))
+
+
+def create_checkpoint_serializer() -> SerializerProtocol:
+    """
+    Encrypted checkpoint serializer, compressing before encryption unless
+    CHECKPOINT_COMPRESSION is "none" ("zstd" by default, or "zlib")
+    """
+    codec = os.getenv("CHECKPOINT_COMPRESSION", "zstd").lower()
+    if codec == "none":
+        return EncryptedSerializer.from_pycryptodome_aes()
+    serde = CompressedSerializer(
+        codec=codec, verbose=os.getenv("CHECKPOINT_COMPRESSION_VERBOSE", "").lower() in ("1", "true")
+    )
+    return EncryptedSerializer.from_pycryptodome_aes(serde=serde)
+
+
+class TTLMemorySaver(InMemorySaver):
+    """
+    In-process checkpointer for short-lived threads. A thread that has not been read
+    or written for `ttl_seconds` is evicted; nothing touches the disk.
+    """
+
+    def __init__(self, ttl_seconds: float = 900, serde: Optional[SerializerProtocol] = None):
+        super().__init__(serde=serde)
+        self.ttl_seconds = ttl_seconds
+        self._last_access: Dict[str, float] = {}
+        self._next_sweep = 0.0
+        self._ttl_lock = threading.Lock()
+
+    def _touch(self, config: RunnableConfig):
+        """Record access to the config's thread and evict expired threads"""
+        now = time.monotonic()
+        expired = []
+        with self._ttl_lock:
+            thread_id = config["configurable"].get("thread_id")
+            if thread_id is not None:
+                self._last_access[str(thread_id)] = now
+            # Sweeping is O(threads), so do it at most ten times per TTL
+            if now >= self._next_sweep:
+                self._next_sweep = now + self.ttl_seconds / 10
+                expired = [tid for tid, seen in self._last_access.items() if now - seen > self.ttl_seconds]
+                for tid in expired:
+                    del self._last_access[tid]
+        for tid in expired:
+            super().delete_thread(tid)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = str(config["configurable"].get("thread_id"))
+        with self._ttl_lock:
+            seen = self._last_access.get(thread_id)
+        if seen is not None and time.monotonic() - seen > self.ttl_seconds:
+            self.delete_thread(thread_id)
+            return None
+        if thread_id not in self.storage:
+            # Looking it up would leave an empty entry in the defaultdict
+            return None
+        self._touch(config)
+        return super().get_tuple(config)
+
+    def put(self, config: RunnableConfig, checkpoint, metadata, new_versions) -> RunnableConfig:
+        self._touch(config)
+        return super().put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config: RunnableConfig, writes, task_id: str, task_path: str = "") -> None:
+        self._touch(config)
+        return super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._ttl_lock:
+            self._last_access.pop(str(thread_id), None)
+        super().delete_thread(thread_id)
+
+    def thread_count(self) -> int:
+        """Threads currently held in memory"""
+        return len(self.storage)
+
+
+# Applied to every connection. WAL lets readers run alongside the single writer, and
+# NORMAL sync is durable in WAL mode except for the last commits on power loss.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 10000,
+    "cache_size": -16000,
+    "temp_store": "MEMORY",
+    "mmap_size": 64 * 1024 * 1024,
+}
+
+
+class _ThreadConnection:
+    """A thread's connection, held in thread-local storage; it is closed once the thread exits"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
+class ThreadLocalSqliteSaver(SqliteSaver):
+    """
+    SqliteSaver with one tuned WAL connection per thread instead of one connection
+    shared behind a lock, so parallel sessions only contend inside SQLite itself
+    (concurrent readers, one writer at a time). Each connection is closed when its
+    thread exits, so short-lived threads (one per Streamlit rerun) do not leak them.
+    """
+
+    def __init__(self, db_path: str, serde: Optional[SerializerProtocol] = None,
+                 pragmas: Optional[Dict[str, Any]] = None):
+        self.db_path = db_path
+        self.pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+        self._local = threading.local()
+        self._connections: Set[sqlite3.Connection] = set()
+        self._connections_lock = threading.Lock()
+        super().__init__(self._connect(), serde=serde)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Closed from other threads, by close() or when the owning thread's locals are freed
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               timeout=self.pragmas.get("busy_timeout", 5000) / 1000)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        with self._connections_lock:
+            self._connections.add(conn)
+        return conn
+
+    def _release(self, conn: sqlite3.Connection):
+        with self._connections_lock:
+            self._connections.discard(conn)
+        conn.close()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use"""
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            self.conn = self._connect()
+            holder = self._local.holder
+        return holder.conn
+
+    @conn.setter
+    def conn(self, conn: sqlite3.Connection):
+        holder = _ThreadConnection(conn)
+        # Thread-local values are dropped when their thread exits, which runs the finalizer
+        weakref.finalize(holder, self._release, conn)
+        self._local.holder = holder
+
+    def connection_count(self) -> int:
+        """Connections currently open, one per live thread that has used the saver"""
+        with self._connections_lock:
+            return len(self._connections)
+
+    @contextmanager
+    def cursor(self, transaction: bool = True) -> Iterator[sqlite3.Cursor]:
+        if not self.is_setup:
+            with self.lock:
+                self.setup()
+        conn = self.conn
+        cur = conn.cursor()
+        try:
+            yield cur
+        finally:
+            if transaction:
+                conn.commit()
+            cur.close()
+
+    def close(self):
+        """Close every thread's connection"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, set()
+        for conn in connections:
+            conn.close()
+
+
+def create_checkpointer(db_path: str, backend: str = "sqlite", ttl_seconds: float = 900) -> BaseCheckpointSaver:
+    """
+    Checkpointer for a graph: "sqlite" persists encrypted checkpoints to `db_path`
+    (WAL mode, one connection per thread), "memory" keeps them in this process with TTL eviction (`db_path` is not touched)
+    """
+    backend = backend.lower()
+    if backend == "memory":
+        return TTLMemorySaver(ttl_seconds=ttl_seconds)
+    if backend == "sqlite":
+        return ThreadLocalSqliteSaver(db_path, serde=create_checkpoint_serializer())
+    raise ValueError(f"Unknown checkpointer backend '{backend}'")
+
+
+async def create_async_checkpointer(db_path: str, backend: str = "sqlite",
+                                    ttl_seconds: float = 900) -> BaseCheckpointSaver:
+    """
+    Checkpointer for graphs driven with ainvoke/astream. "sqlite" is an AsyncSqliteSaver
+    on a tuned WAL connection, bound to the running event loop; "memory" is the same
+    TTLMemorySaver as the sync path.
+    """
+    backend = backend.lower()
+    if backend == "memory":
+        return TTLMemorySaver(ttl_seconds=ttl_seconds)
+    if backend == "sqlite":
+        conn = await aiosqlite.connect(db_path, timeout=SQLITE_PRAGMAS["busy_timeout"] / 1000)
+        for name, value in SQLITE_PRAGMAS.items():
+            await conn.execute(f"PRAGMA {name} = {value}")
+        return AsyncSqliteSaver(conn, serde=create_checkpoint_serializer())
+    raise ValueError(f"Unknown checkpointer backend '{backend}'")
@@ -1,8 +1,18 @@
+import asyncio
+import threading
+from abc import ABC, abstractmethod
 import traceback
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator
 import uuid
-from .auth_graph import create_auth_graph, set_user_input, clear_user_input
-from .agent_graph import create_agent_graph
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.types import Command
+from .auth_graph import (
+    create_auth_graph, auth_retention,
+    AUTH_CHECKPOINT_DB, AUTH_CHECKPOINTER, AUTH_CHECKPOINT_TTL_SECONDS
+)
+from .agent_graph import create_agent_graph, agent_retention, AGENT_CHECKPOINT_DB
+from .checkpointing import create_async_checkpointer
 from ..utilities.IdentityManger import reset_identity_manager
 
 class AuthGraphRunner:
@@ -11,12 +21,81 @@ class AuthGraphRunner:
     def __init__(self):
         self.auth_graph = create_auth_graph()
         self.current_thread_id = None
+        if auth_retention:
+            auth_retention.start()
+
+    @staticmethod
+    def _user_id(result: Dict[str, Any]) -> Optional[str]:
+        return result.get("user_info", {}).get("user_id") if result.get("user_info") else None
+
+    @staticmethod
+    def _start_response(result: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "success": True,
+            "auth_result": result.get("auth_result", False),
+            "notes": result.get("notes", ""),
+            "pii_collection_complete": result.get("pii_collection_complete", False),
+            "requires_registration": "registration required" in result.get("notes", "").lower(),
+            "registration_data_missing": "registration data missing" in result.get("notes", "").lower(),
+            "user_id": AuthGraphRunner._user_id(result),
+            "requires_pii": False  # Will be set by continue_with_registration
+        }
+
+    @staticmethod
+    def _registration_response(result: Dict[str, Any]) -> Dict[str, Any]:
+        # Check if we need PII collection - look for specific status or notes
+        requires_pii = (result.get("notes", "").lower().find("pii collection") != -1 or 
+                      result.get("notes", "").lower().find("pii collection required") != -1)
+        return {
+            "success": True,
+            "auth_result": result.get("auth_result", False),
+            "notes": result.get("notes", ""),
+            "pii_collection_complete": result.get("pii_collection_complete", False),
+            "requires_pii": requires_pii,
+            "user_id": AuthGraphRunner._user_id(result)
+        }
+
+    @staticmethod
+    def _pii_response(result: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "success": True,
+            "auth_result": result.get("auth_result", False),
+            "notes": result.get("notes", ""),
+            "pii_collection_complete": result.get("pii_collection_complete", False),
+            "user_id": AuthGraphRunner._user_id(result)
+        }
+
+    @staticmethod
+    def _failure_response(stage: str, error: Exception) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "auth_result": False,
+            "notes": f"{stage} failed: {str(error)}",
+            "error": str(error)
+        }
+
+    @staticmethod
+    def _no_session_response() -> Dict[str, Any]:
+        return {
+            "success": False,
+            "auth_result": False,
+            "notes": "No active authentication session"
+        }
+
+    def _discard_thread(self, thread_id: str):
+        """Drop the checkpoints of a finished or abandoned login thread"""
+        if auth_retention:
+            auth_retention.delete_thread(thread_id)
+        else:
+            self.auth_graph.checkpointer.delete_thread(thread_id)
     
     def start_authentication(self) -> Dict[str, Any]:
         """Start a new authentication session"""
+        # Drop the checkpoints of an abandoned attempt
+        if self.current_thread_id:
+            self._discard_thread(self.current_thread_id)
         # Generate new thread ID for this auth session
         self.current_thread_id = f"auth_{uuid.uuid4()}"
-        clear_user_input()  # Clear any previous user inputs
         
         try:
             # Run the auth graph
@@ -25,81 +104,42 @@ class AuthGraphRunner:
                 config={"configurable": {"thread_id": self.current_thread_id}}
             )
             
-            return {
-                "success": True,
-                "auth_result": result.get("auth_result", False),
-                "notes": result.get("notes", ""),
-                "pii_collection_complete": result.get("pii_collection_complete", False),
-                "requires_registration": "registration required" in result.get("notes", "").lower(),
-                "registration_data_missing": "registration data missing" in result.get("notes", "").lower(),
-                "user_id": result.get("user_info", {}).get("user_id") if result.get("user_info") else None,
-                "requires_pii": False  # Will be set by continue_with_registration
-            }
+            return self._start_response(result)
         except Exception as e:
-            return {
-                "success": False,
-                "auth_result": False,
-                "notes": f"Authentication failed: {str(e)}",
-                "error": str(e)
-            }
+            return self._failure_response("Authentication", e)
     
+    def _resume(self, value: Dict[str, str]) -> Dict[str, Any]:
+        """Resume the session's graph at the interrupt it is paused on"""
+        config = {"configurable": {"thread_id": self.current_thread_id}}
+        if not self.auth_graph.get_state(config).interrupts:
+            raise RuntimeError("session is not waiting for input")
+        result = self.auth_graph.invoke(Command(resume=value), config=config)
+        if result.get("pii_collection_complete"):
+            # The submitted PII sits in the resume checkpoint; nothing resumes a finished thread
+            self._discard_thread(self.current_thread_id)
+        return result
+
     def continue_with_registration(self, registration_data: Dict[str, str]) -> Dict[str, Any]:
         """Continue authentication with registration data"""
         if not self.current_thread_id:
-            return {
-                "success": False,
-                "auth_result": False,
-                "notes": "No active authentication session"
-            }
+            return self._no_session_response()
         
         try:
-            # Set the registration data for HITL
-            set_user_input("registration", registration_data)
+            # Resume at collect_registration_data; enrollment reuses the login capture
+            result = self._resume(registration_data)
             
-            # Continue the auth graph execution
-            result = self.auth_graph.invoke(
-                {},
-                config={"configurable": {"thread_id": self.current_thread_id}}
-            )
-            
-            # Check if we need PII collection - look for specific status or notes
-            requires_pii = (result.get("notes", "").lower().find("pii collection") != -1 or 
-                          result.get("notes", "").lower().find("pii collection required") != -1)
-            
-            return {
-                "success": True,
-                "auth_result": result.get("auth_result", False),
-                "notes": result.get("notes", ""),
-                "pii_collection_complete": result.get("pii_collection_complete", False),
-                "requires_pii": requires_pii,
-                "user_id": result.get("user_info", {}).get("user_id") if result.get("user_info") else None
-            }
+            return self._registration_response(result)
         except Exception as e:
-            return {
-                "success": False,
-                "auth_result": False,
-                "notes": f"Registration failed: {str(e)}",
-                "error": str(e)
-            }
+            return self._failure_response("Registration", e)
     
     def continue_with_pii(self, pii_data: Dict[str, str]) -> Dict[str, Any]:
         """Continue authentication with PII data"""
         if not self.current_thread_id:
-            return {
-                "success": False,
-                "auth_result": False,
-                "notes": "No active authentication session"
-            }
+            return self._no_session_response()
         
         try:
-            # Set the PII data for HITL
-            set_user_input("pii", pii_data)
-            
-            # Continue the auth graph execution
-            result = self.auth_graph.invoke(
-                {},
-                config={"configurable": {"thread_id": self.current_thread_id}}
-            )
+            # Resume at collect_pii
+            result = self._resume(pii_data)
             
             return {
                 "success": True,
@@ -108,51 +148,26 @@ class AuthGraphRunner:
                 "pii_collection_complete": result.get("pii_collection_complete", False)
             }
         except Exception as e:
-            return {
-                "success": False,
-                "auth_result": False,
-                "notes": f"PII collection failed: {str(e)}",
-                "error": str(e)
-            }
+            return self._failure_response("PII collection", e)
     
     def continue_with_pii_direct(self, pii_data: Dict[str, str]) -> Dict[str, Any]:
-        """Continue authentication with PII data by directly invoking collect_pii node"""
+        """Continue authentication with PII data, including the user ID in the response"""
         if not self.current_thread_id:
-            return {
-                "success": False,
-                "auth_result": False,
-                "notes": "No active authentication session"
-            }
+            return self._no_session_response()
         
         try:
-            # Set the PII data for HITL
-            set_user_input("pii", pii_data)
+            # Resume at collect_pii
+            result = self._resume(pii_data)
             
-            # Directly invoke collect_pii node instead of starting from beginning
-            result = self.auth_graph.invoke(
-                {"auth_status": "pii_collection"},  # Start with PII collection status
-                config={"configurable": {"thread_id": self.current_thread_id}}
-            )
-            
-            return {
-                "success": True,
-                "auth_result": result.get("auth_result", False),
-                "notes": result.get("notes", ""),
-                "pii_collection_complete": result.get("pii_collection_complete", False),
-                "user_id": result.get("user_info", {}).get("user_id") if result.get("user_info") else None
-            }
+            return self._pii_response(result)
         except Exception as e:
-            return {
-                "success": False,
-                "auth_result": False,
-                "notes": f"PII collection failed: {str(e)}",
-                "error": str(e)
-            }
+            return self._failure_response("PII collection", e)
 
     def reset_session(self):
         """Reset the current authentication session"""
+        if self.current_thread_id:
+            self._discard_thread(self.current_thread_id)
         self.current_thread_id = None
-        clear_user_input()
 
 class AgentGraphRunner:
     """Simple interface for running the agent graph from frontend"""
@@ -161,7 +176,33 @@ class AgentGraphRunner:
         self.agent_graph = create_agent_graph()
         print(self.agent_graph.get_graph().draw_mermaid())
         self.current_thread_id = None
+        agent_retention.start()
     
+    @staticmethod
+    def _message_response(result: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "success": True,
+            "response": result.get("response", ""),
+            "session_valid": result.get("session_valid", True)
+        }
+
+    @staticmethod
+    def _no_session_response() -> Dict[str, Any]:
+        return {
+            "success": False,
+            "response": "No active conversation session",
+            "session_valid": False
+        }
+
+    @staticmethod
+    def _failure_response(error: Exception) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "response": f"Error processing your request: {str(error)}",
+            "session_valid": False,
+            "error": str(error)
+        }
+
     def start_conversation(self, user_id: str) -> str:
         """Start a new conversation session for a user"""
         # Generate thread ID for this conversation
@@ -174,11 +215,7 @@ class AgentGraphRunner:
         thread_to_use = thread_id or self.current_thread_id
         
         if not thread_to_use:
-            return {
-                "success": False,
-                "response": "No active conversation session",
-                "session_valid": False
-            }
+            return self._no_session_response()
         
         try:
             # Run the agent graph
@@ -187,26 +224,206 @@ class AgentGraphRunner:
                 config={"configurable": {"thread_id": thread_to_use}}
             )
             
-            return {
-                "success": True,
-                "response": result.get("response", ""),
-                "session_valid": result.get("session_valid", True)
-            }
+            return self._message_response(result)
         except Exception as e:
-            return {
-                "success": False,
-                "response": f"Error processing your request: {str(e)}",
-                "session_valid": False,
-                "error": str(e)
-            }
+            return self._failure_response(e)
     
     def end_conversation(self):
         """End the current conversation session"""
+        if self.current_thread_id:
+            agent_retention.delete_thread(self.current_thread_id)
         self.current_thread_id = None
 
+class _LoopResources:
+    """Compiled graph, checkpointer and lock used on one event loop"""
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.graph = None
+        self.checkpointer: Optional[BaseCheckpointSaver] = None
+
+
+class _AsyncGraphRunner(ABC):
+    """
+    Base of the async runners. An aiosqlite checkpointer (and an asyncio.Lock) belongs to
+    the event loop that first uses it, and callers such as Streamlit reruns each run on a
+    fresh loop via asyncio.run, so the graph is compiled per running loop. Resources of
+    loops that have since closed are released on the next call. In-memory checkpointers
+    are not loop-bound and are shared by every loop, so their sessions carry over.
+    """
+
+    def __init__(self):
+        self._resources: Dict[asyncio.AbstractEventLoop, _LoopResources] = {}
+        self._resources_lock = threading.Lock()
+        self._shared_checkpointer: Optional[BaseCheckpointSaver] = None
+
+    @abstractmethod
+    async def _open_checkpointer(self) -> BaseCheckpointSaver:
+        """Open a checkpointer bound to the running loop"""
+
+    @abstractmethod
+    def _compile(self, checkpointer: BaseCheckpointSaver):
+        """Compile the runner's graph with the given checkpointer"""
+
+    @staticmethod
+    def _stop(checkpointer: Optional[BaseCheckpointSaver]):
+        """Stop the connection thread of a checkpointer whose loop is gone"""
+        if isinstance(checkpointer, AsyncSqliteSaver):
+            checkpointer.conn.stop()
+
+    def _loop_resources(self) -> _LoopResources:
+        loop = asyncio.get_running_loop()
+        with self._resources_lock:
+            for closed_loop in [other for other in self._resources if other.is_closed()]:
+                self._stop(self._resources.pop(closed_loop).checkpointer)
+            resources = self._resources.get(loop)
+            if resources is None:
+                resources = self._resources[loop] = _LoopResources()
+        return resources
+
+    async def _get_graph(self):
+        resources = self._loop_resources()
+        # Sessions starting together must not each open a checkpointer
+        async with resources.lock:
+            if resources.graph is None:
+                checkpointer = self._shared_checkpointer or await self._open_checkpointer()
+                if not isinstance(checkpointer, AsyncSqliteSaver):
+                    self._shared_checkpointer = checkpointer
+                resources.checkpointer = checkpointer
+                resources.graph = self._compile(checkpointer)
+        return resources.graph
+
+    @property
+    def checkpointer(self) -> Optional[BaseCheckpointSaver]:
+        """Checkpointer used on the running loop, if its graph has been compiled"""
+        resources = self._resources.get(asyncio.get_running_loop())
+        return resources.checkpointer if resources else self._shared_checkpointer
+
+    async def close(self):
+        """Close the running loop's checkpointer connection and stop those of other loops"""
+        loop = asyncio.get_running_loop()
+        with self._resources_lock:
+            resources, self._resources = self._resources, {}
+        for resources_loop, loop_resources in resources.items():
+            if resources_loop is loop and isinstance(loop_resources.checkpointer, AsyncSqliteSaver):
+                await loop_resources.checkpointer.conn.close()
+            else:
+                self._stop(loop_resources.checkpointer)
+        self._shared_checkpointer = None
+
+
+class AsyncAuthGraphRunner(_AsyncGraphRunner):
+    """
+    Asyncio interface to the authentication graph. Sessions are addressed by thread ID
+    instead of a single current session, so many logins can share one event loop; the
+    graph is compiled on first use on each loop, with a checkpointer bound to that loop.
+    """
+
+    async def _open_checkpointer(self) -> BaseCheckpointSaver:
+        return await create_async_checkpointer(
+            AUTH_CHECKPOINT_DB, AUTH_CHECKPOINTER, ttl_seconds=AUTH_CHECKPOINT_TTL_SECONDS
+        )
+
+    def _compile(self, checkpointer: BaseCheckpointSaver):
+        return create_auth_graph(checkpointer=checkpointer)
+
+    async def start_authentication_async(self) -> Dict[str, Any]:
+        """Start a new authentication session; the response carries its thread_id"""
+        thread_id = f"auth_{uuid.uuid4()}"
+        try:
+            graph = await self._get_graph()
+            result = await graph.ainvoke({}, config={"configurable": {"thread_id": thread_id}})
+            return {**AuthGraphRunner._start_response(result), "thread_id": thread_id}
+        except Exception as e:
+            return {**AuthGraphRunner._failure_response("Authentication", e), "thread_id": thread_id}
+
+    async def _resume_async(self, thread_id: str, value: Dict[str, str]) -> Dict[str, Any]:
+        """Resume a session's graph at the interrupt it is paused on"""
+        graph = await self._get_graph()
+        config = {"configurable": {"thread_id": thread_id}}
+        if not (await graph.aget_state(config)).interrupts:
+            raise RuntimeError("session is not waiting for input")
+        result = await graph.ainvoke(Command(resume=value), config=config)
+        if result.get("pii_collection_complete"):
+            await self.reset_session_async(thread_id)
+        return result
+
+    async def continue_with_registration_async(self, thread_id: str, registration_data: Dict[str, str]) -> Dict[str, Any]:
+        """Continue an authentication session with registration data"""
+        if not thread_id:
+            return AuthGraphRunner._no_session_response()
+        try:
+            result = await self._resume_async(thread_id, registration_data)
+            return AuthGraphRunner._registration_response(result)
+        except Exception as e:
+            return AuthGraphRunner._failure_response("Registration", e)
+
+    async def continue_with_pii_async(self, thread_id: str, pii_data: Dict[str, str]) -> Dict[str, Any]:
+        """Continue an authentication session paused at the PII collection step"""
+        if not thread_id:
+            return AuthGraphRunner._no_session_response()
+        try:
+            result = await self._resume_async(thread_id, pii_data)
+            return AuthGraphRunner._pii_response(result)
+        except Exception as e:
+            return AuthGraphRunner._failure_response("PII collection", e)
+
+    async def reset_session_async(self, thread_id: str):
+        """Drop an authentication session's checkpoints"""
+        if auth_retention:
+            await asyncio.to_thread(auth_retention.delete_thread, thread_id)
+        elif self.checkpointer is not None:
+            await self.checkpointer.adelete_thread(thread_id)
+
+class AsyncAgentGraphRunner(_AsyncGraphRunner):
+    """
+    Asyncio interface to the agent graph. Every call names its conversation thread, so
+    many conversations can share one event loop.
+    """
+
+    async def _open_checkpointer(self) -> BaseCheckpointSaver:
+        return await create_async_checkpointer(AGENT_CHECKPOINT_DB)
+
+    def _compile(self, checkpointer: BaseCheckpointSaver):
+        return create_agent_graph(checkpointer=checkpointer)
+
+    def start_conversation(self, user_id: str) -> str:
+        """Thread ID for a new conversation"""
+        return f"agent_{user_id}_{uuid.uuid4()}"
+
+    async def send_message_async(self, user_query: str, thread_id: str) -> Dict[str, Any]:
+        """Send a message to the agent and get response"""
+        if not thread_id:
+            return AgentGraphRunner._no_session_response()
+        try:
+            graph = await self._get_graph()
+            result = await graph.ainvoke(
+                {"user_query": user_query},
+                config={"configurable": {"thread_id": thread_id}}
+            )
+            return AgentGraphRunner._message_response(result)
+        except Exception as e:
+            return AgentGraphRunner._failure_response(e)
+
+    async def stream_message_async(self, user_query: str, thread_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Send a message and yield each node's state update as it completes"""
+        graph = await self._get_graph()
+        async for update in graph.astream(
+            {"user_query": user_query},
+            config={"configurable": {"thread_id": thread_id}},
+            stream_mode="updates"
+        ):
+            yield update
+
+    async def end_conversation_async(self, thread_id: str):
+        """Drop a conversation's checkpoints"""
+        await asyncio.to_thread(agent_retention.delete_thread, thread_id)
+
 # Global instances for frontend use
 auth_runner = AuthGraphRunner()
 agent_runner = AgentGraphRunner()
+async_auth_runner = AsyncAuthGraphRunner()
+async_agent_runner = AsyncAgentGraphRunner()
 
 def run_authentication() -> Dict[str, Any]:
     """Simple function to start authentication - used by frontend"""
@@ -235,4 +452,12 @@ def send_agent_message(user_query: str, thread_id: Optional[str] = None) -> Dict
 
 def end_agent_conversation():
     """End agent conversation - used by frontend"""
-    agent_runner.end_conversation() 
\ No newline at end of file
+    agent_runner.end_conversation()
+
+async def run_authentication_async() -> Dict[str, Any]:
+    """Start authentication on the event loop; keep the returned thread_id"""
+    return await async_auth_runner.start_authentication_async()
+
+async def send_agent_message_async(user_query: str, thread_id: str) -> Dict[str, Any]:
+    """Send message to agent on the event loop"""
+    return await async_agent_runner.send_message_async(user_query, thread_id) 
\ No newline at end of file
@@ -0,0 +1,111 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .main import STTModel
+
+STT_MAX_BATCH_SIZE = int(os.getenv("STT_MAX_BATCH_SIZE", 8))
+STT_MAX_BATCH_WAIT_MS = float(os.getenv("STT_MAX_BATCH_WAIT_MS", 20))
+
+
+class BatchingSTTService:
+    """
+    Micro-batching front for STTModel shared by concurrent sessions. Requests are queued;
+    a single worker takes the first waiting utterance, collects more for up to
+    `max_wait_ms` (or until `max_batch_size`), and runs them as one padded batch through
+    feature extraction and generate. Each submit() gets its own future.
+    """
+
+    def __init__(self, max_batch_size: Optional[int] = None, max_wait_ms: Optional[float] = None,
+                 sample_rate: int = 16000):
+        self.max_batch_size = max_batch_size or STT_MAX_BATCH_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else STT_MAX_BATCH_WAIT_MS) / 1000
+        self.sample_rate = sample_rate
+        self._queue: "queue.Queue[Optional[Tuple[np.ndarray, Optional[Sequence[str]], Future, float, bool]]]" = queue.Queue()
+        self._stopped = False
+        # Running totals for monitoring and the benchmark (the service lives as long as the process)
+        self.batches_run = 0
+        self.utterances_run = 0
+        self._worker = threading.Thread(target=self._run, name="stt-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, audio_array: np.ndarray, languages: Optional[Sequence[str]] = None,
+               defer_display_text: bool = False) -> Future:
+        """
+        Queue one mono utterance at the service sample rate; the future yields the result
+        dict. `languages` fixes the decoded targets (default: planned per utterance);
+        `defer_display_text` lets a planned utterance leave hindi_text as None.
+        """
+        if self._stopped:
+            raise RuntimeError("STT service is closed")
+        future = Future()
+        self._queue.put((audio_array, languages, future, time.perf_counter(), defer_display_text))
+        return future
+
+    def transcribe(self, audio_array: np.ndarray, timeout: Optional[float] = None,
+                   languages: Optional[Sequence[str]] = None) -> Dict[str, Union[str, float, bool]]:
+        """Blocking submit; same result keys as STTModel.transcribe_from_numpy"""
+        return self.submit(audio_array, languages).result(timeout)
+
+    def _collect(self, first) -> Tuple[list, bool]:
+        """Fill a batch; the flag is False once the close() sentinel has been taken"""
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                return batch, False
+            batch.append(request)
+        return batch, True
+
+    def _run(self):
+        running = True
+        while running:
+            request = self._queue.get()
+            if request is None:
+                break
+            batch, running = self._collect(request)
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if batch:
+                self.batches_run += 1
+                self.utterances_run += len(batch)
+                results = STTModel.transcribe_batch([item[0] for item in batch], self.sample_rate,
+                                                    [item[1] for item in batch], [item[4] for item in batch])
+                finished_at = time.perf_counter()
+                for (_, _, future, queued_at, _), result in zip(batch, results):
+                    # Time from submit, including the wait for the batch to fill
+                    future.set_result({**result, "processing_time": finished_at - queued_at, "batch_size": len(batch)})
+
+    @property
+    def mean_batch_size(self) -> float:
+        """Utterances per batch run so far"""
+        return self.utterances_run / self.batches_run if self.batches_run else 0.0
+
+    def close(self):
+        """Finish queued requests and stop the worker"""
+        if not self._stopped:
+            self._stopped = True
+            self._queue.put(None)
+        self._worker.join()
+
+
+_service: Optional[BatchingSTTService] = None
+_service_lock = threading.Lock()
+
+
+def get_stt_service() -> BatchingSTTService:
+    """Process-wide batching service, created on first use"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = BatchingSTTService()
+        return _service
@@ -0,0 +1,140 @@
+"""
+Spoken-language identification on the STT speech encoder output: a softmax regression
+over the time-averaged encoder states. Train it on labelled clips (one directory per
+language code, e.g. clips/eng/*.wav and clips/hin/*.wav) with
+
+    python -m saarthi_assistant.voice.language_id clips/ --output lid.npz
+
+and point STT_LID_WEIGHTS at the result.
+"""
+import argparse
+import os
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+
+LID_WEIGHTS_PATH = os.getenv("STT_LID_WEIGHTS", "")
+# Below this probability the language counts as unknown and every target is decoded
+LID_MIN_CONFIDENCE = float(os.getenv("STT_LID_MIN_CONFIDENCE", 0.8))
+# "auto" runs language ID; a language code (e.g. "hin") fixes it for single-language deployments
+SPOKEN_LANGUAGE = os.getenv("STT_SPOKEN_LANGUAGE", "auto")
+
+
+def pool_encoder_states(hidden_states: torch.Tensor, feature_mask: Optional[torch.Tensor]) -> np.ndarray:
+    """
+    Mean of each utterance's encoder states over its unpadded frames. The encoder
+    sub-samples time, so the feature-level mask is scaled to the encoder length.
+    """
+    batch, frames = hidden_states.shape[:2]
+    if feature_mask is None:
+        lengths = torch.full((batch,), frames, device=hidden_states.device)
+    else:
+        lengths = torch.ceil(feature_mask.sum(dim=1) * frames / feature_mask.shape[1]).clamp(1, frames)
+    mask = (torch.arange(frames, device=hidden_states.device)[None, :] < lengths[:, None]).to(hidden_states.dtype)
+    pooled = (hidden_states * mask[..., None]).sum(dim=1) / lengths[:, None].to(hidden_states.dtype)
+    return pooled.float().cpu().numpy()
+
+
+class SpokenLanguageID:
+    """Softmax regression on standardized pooled encoder states"""
+
+    def __init__(self, languages: Sequence[str], weight: np.ndarray, bias: np.ndarray, mean: np.ndarray, std: np.ndarray):
+        self.languages = list(languages)
+        self.weight = weight
+        self.bias = bias
+        self.mean = mean
+        self.std = std
+
+    def probabilities(self, pooled: np.ndarray) -> np.ndarray:
+        logits = ((pooled - self.mean) / self.std) @ self.weight.T + self.bias
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict(self, pooled: np.ndarray, min_confidence: float = LID_MIN_CONFIDENCE) -> List[Tuple[Optional[str], float]]:
+        """(language, probability) per utterance; language is None below min_confidence"""
+        predictions = []
+        for row in self.probabilities(pooled):
+            best = int(np.argmax(row))
+            predictions.append((self.languages[best] if row[best] >= min_confidence else None, float(row[best])))
+        return predictions
+
+    @classmethod
+    def fit(cls, pooled: np.ndarray, labels: Sequence[str], max_iter: int = 500, weight_decay: float = 1e-3) -> "SpokenLanguageID":
+        languages = sorted(set(labels))
+        mean = pooled.mean(axis=0)
+        std = pooled.std(axis=0) + 1e-6
+        features = torch.from_numpy((pooled - mean) / std).float()
+        targets = torch.tensor([languages.index(label) for label in labels])
+        layer = torch.nn.Linear(features.shape[1], len(languages))
+        optimizer = torch.optim.LBFGS(layer.parameters(), max_iter=max_iter)
+
+        def closure():
+            optimizer.zero_grad()
+            loss = torch.nn.functional.cross_entropy(layer(features), targets) + weight_decay * layer.weight.square().sum()
+            loss.backward()
+            return loss
+
+        optimizer.step(closure)
+        return cls(languages, layer.weight.detach().numpy(), layer.bias.detach().numpy(), mean, std)
+
+    def save(self, path: str):
+        np.savez(path, languages=np.array(self.languages), weight=self.weight, bias=self.bias, mean=self.mean, std=self.std)
+
+    @classmethod
+    def load(cls, path: str) -> "SpokenLanguageID":
+        data = np.load(path)
+        return cls([str(language) for language in data["languages"]], data["weight"], data["bias"], data["mean"], data["std"])
+
+
+_language_id: Optional[SpokenLanguageID] = None
+_language_id_lock = threading.Lock()
+
+
+def get_language_id() -> Optional[SpokenLanguageID]:
+    """Classifier from STT_LID_WEIGHTS, loaded once; None when not configured"""
+    global _language_id
+    if not LID_WEIGHTS_PATH:
+        return None
+    with _language_id_lock:
+        if _language_id is None:
+            _language_id = SpokenLanguageID.load(LID_WEIGHTS_PATH)
+        return _language_id
+
+
+if __name__ == "__main__":
+    import torchaudio
+
+    from .main import STTModel
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data_dir", help="Directory with one sub-directory of clips per language code")
+    parser.add_argument("--output", default="lid.npz")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fraction of clips kept for evaluation")
+    args = parser.parse_args()
+
+    STTModel.load()
+    pooled, labels = [], []
+    for language in sorted(os.listdir(args.data_dir)):
+        directory = os.path.join(args.data_dir, language)
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            audio, orig_freq = torchaudio.load(os.path.join(directory, name))
+            pooled.append(STTModel.pooled_encoder_states([audio[0].numpy()], orig_freq)[0])
+            labels.append(language)
+
+    pooled = np.stack(pooled)
+    order = np.random.RandomState(0).permutation(len(labels))
+    split = int(len(order) * (1 - args.holdout))
+    train, test = order[:split], order[split:]
+    model = SpokenLanguageID.fit(pooled[train], [labels[i] for i in train])
+    for name, rows in (("train", train), ("holdout", test)):
+        if len(rows):
+            predicted = model.predict(pooled[rows], min_confidence=0.0)
+            accuracy = np.mean([prediction[0] == labels[i] for prediction, i in zip(predicted, rows)])
+            print(f"{name}: {len(rows)} clips, accuracy {accuracy:.1%}")
+    model.save(args.output)
+    print(f"Saved {args.output} ({', '.join(model.languages)})")
@@ -0,0 +1,62 @@
+import os
+import unicodedata
+from typing import List, Tuple
+
+import numpy as np
+
+from .preprocessing import frame_levels_db
+
+# Windows for long recordings (helpline calls, voice notes): bounded length, cut in pauses
+LONG_FORM_WINDOW_SECONDS = float(os.getenv("STT_LONG_FORM_WINDOW_SECONDS", 20))
+LONG_FORM_OVERLAP_SECONDS = float(os.getenv("STT_LONG_FORM_OVERLAP_SECONDS", 1.0))
+# transcribe_from_bytes switches to long-form above this duration
+LONG_FORM_THRESHOLD_SECONDS = float(os.getenv("STT_LONG_FORM_THRESHOLD_SECONDS", 30))
+
+
+def plan_windows(audio: np.ndarray, sample_rate: int = 16000, window_seconds: float = LONG_FORM_WINDOW_SECONDS,
+                 overlap_seconds: float = LONG_FORM_OVERLAP_SECONDS, frame_ms: int = 30) -> List[Tuple[int, int]]:
+    """
+    Split a recording into (start, end) sample ranges of at most `window_seconds`. Each
+    cut is placed in the quietest frame of the second half of the window, so words are
+    rarely split, and neighbouring windows share `overlap_seconds` around the cut in case
+    a word straddles it anyway. The overlap is capped at half a window.
+    """
+    total = len(audio)
+    window = int(window_seconds * sample_rate)
+    # Keeps the cut search range non-empty, so no window outgrows `window_seconds`
+    half_overlap = min(int(overlap_seconds * sample_rate) // 2, window // 4)
+    if total <= window:
+        return [(0, total)]
+
+    frame_size = sample_rate * frame_ms // 1000
+    levels = frame_levels_db(audio, frame_size)
+    windows = []
+    start = 0
+    while start + window < total:
+        # Look for the pause between the middle and the end of the window (minus the overlap)
+        first = (start + window // 2) // frame_size
+        last = max(first + 1, (start + window - half_overlap) // frame_size)
+        cut = (first + int(np.argmin(levels[first:last]))) * frame_size + frame_size // 2
+        windows.append((start, min(total, cut + half_overlap)))
+        start = max(start + 1, cut - half_overlap)
+    windows.append((start, total))
+    return windows
+
+
+def _normalize(word: str) -> str:
+    """Casefold and drop punctuation/symbols; combining marks (matras, virama) are kept"""
+    return "".join(c for c in word.casefold() if unicodedata.category(c)[0] not in "PS")
+
+
+def merge_overlap(previous: str, following: str, max_words: int = 12) -> str:
+    """
+    Return `following` without the words it repeats from the end of `previous`: the
+    longest run (up to `max_words`) where the tail of one matches the head of the other.
+    """
+    tail = [_normalize(word) for word in previous.split()[-max_words:]]
+    words = following.split()
+    head = [_normalize(word) for word in words[:max_words]]
+    for size in range(min(len(tail), len(head)), 0, -1):
+        if tail[-size:] == head[:size] and any(tail[-size:]):
+            return " ".join(words[size:])
+    return following
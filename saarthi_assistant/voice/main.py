@@ -1,19 +1,338 @@
 import torchaudio
 from transformers import SeamlessM4Tv2ForSpeechToText
 from transformers import SeamlessM4TTokenizer, SeamlessM4TFeatureExtractor
+from transformers.modeling_outputs import BaseModelOutput
 import time
 import torch
 import io
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 import numpy as np
-from typing import Dict, Union
+from typing import Dict, Union, Optional, Any, List, Callable, Iterator, Sequence, Tuple
 import warnings
 
-torch.cuda.empty_cache()
+from .long_form import LONG_FORM_OVERLAP_SECONDS, LONG_FORM_THRESHOLD_SECONDS, LONG_FORM_WINDOW_SECONDS, merge_overlap, plan_windows
+from .language_id import SPOKEN_LANGUAGE, get_language_id, pool_encoder_states
+from .preprocessing import preprocess_audio, resample
+from .vad import EnergyVAD
+from .worker import USE_STT_WORKER, get_worker_client
+
+MODEL_NAME = "ai4bharat/indic-seamless"
+# Rate the feature extractor expects; every input is resampled to it
+MODEL_SAMPLE_RATE = 16000
+
+# Inference profiles: "gpu" (bfloat16 on CUDA), "cpu-int8" (int8 dynamic quantization
+# of the linear layers), "cpu-fp32" (unquantized CPU baseline); "auto" picks gpu or cpu-int8
+STT_PROFILES = ("gpu", "cpu-int8", "cpu-fp32")
+
+
+def resolve_stt_profile(profile: Optional[str] = None) -> str:
+    """Profile named by `profile` or STT_PROFILE, with "auto" resolved for this host"""
+    profile = (profile or os.getenv("STT_PROFILE", "auto")).lower()
+    if profile == "auto":
+        return "gpu" if torch.cuda.is_available() else "cpu-int8"
+    if profile not in STT_PROFILES:
+        raise ValueError(f"Unknown STT profile '{profile}', expected one of {STT_PROFILES} or 'auto'")
+    return profile
+
+
+def configure_cpu_threads(num_threads: Optional[int] = None):
+    """
+    Intra-op threads for CPU inference from `num_threads` or STT_NUM_THREADS (default:
+    torch's own choice). Inter-op parallelism is not used by generate, so it is pinned to 1.
+    """
+    num_threads = num_threads or int(os.getenv("STT_NUM_THREADS", 0))
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set before the first parallel region; keep whatever is in place
+        pass
+
+
+def _select_rows(tensor: torch.Tensor, rows: torch.Tensor) -> torch.Tensor:
+    """Batch rows by index, repeats allowed (a view, no copy, when the batch has one row)"""
+    if tensor.shape[0] == 1:
+        return tensor.expand(len(rows), *tensor.shape[1:])
+    return tensor.index_select(0, rows)
+
 
 class STTModel():
-    model = SeamlessM4Tv2ForSpeechToText.from_pretrained("ai4bharat/indic-seamless", torch_dtype=torch.bfloat16, device_map="cuda" if torch.cuda.is_available() else "cpu")
-    processor = SeamlessM4TFeatureExtractor.from_pretrained("ai4bharat/indic-seamless")
-    tokenizer = SeamlessM4TTokenizer.from_pretrained("ai4bharat/indic-seamless")
+    """
+    Speech-to-text on indic-seamless. Nothing is loaded at import: the model is
+    loaded on first use, or ahead of time on a background thread via preload(),
+    and status() reports progress for the UI.
+    """
+    model: Optional[SeamlessM4Tv2ForSpeechToText] = None
+    processor: Optional[SeamlessM4TFeatureExtractor] = None
+    tokenizer: Optional[SeamlessM4TTokenizer] = None
+    device = "cpu"
+    profile: Optional[str] = None
+
+    # The agent reads agent_language; the UI shows what the user said in display_language
+    agent_language = "eng"
+    display_language = "hin"
+    # Decoded for every utterance when the spoken language is unknown
+    target_languages = (agent_language, display_language)
+    # Speakers identified as non-English: decode only agent_language up front and leave the
+    # display text to a later languages=(display_language,) request, for callers that
+    # submit with defer_display_text=True (see the frontend). Needs STT_SPOKEN_LANGUAGE
+    # or a LID classifier; when the spoken language is unknown both are decoded at once.
+    lazy_display_text = os.getenv("STT_LAZY_DISPLAY_TEXT", "0") == "1"
+
+    _load_lock = threading.Lock()
+    _loader: Optional[threading.Thread] = None
+    _ready = threading.Event()
+    # state: not_loaded | loading | ready | failed
+    _status: Dict[str, Any] = {"state": "not_loaded", "stage": None, "progress": 0.0, "error": None, "load_time": None}
+
+    @classmethod
+    def _set_status(cls, **fields):
+        cls._status = {**cls._status, **fields}
+
+    @classmethod
+    def load(cls):
+        """Load processor, tokenizer and model (blocking, loads only once)"""
+        if cls._ready.is_set():
+            return
+        with cls._load_lock:
+            if cls._ready.is_set():
+                return
+            start_time = time.perf_counter()
+            cls._set_status(state="loading", stage="feature extractor", progress=0.0, error=None)
+            try:
+                cls.profile = resolve_stt_profile()
+                cls.device = "cuda" if cls.profile == "gpu" else "cpu"
+                if cls.device == "cuda":
+                    torch.cuda.empty_cache()
+                cls.processor = SeamlessM4TFeatureExtractor.from_pretrained(MODEL_NAME)
+                cls._set_status(stage="tokenizer", progress=0.05)
+                cls.tokenizer = SeamlessM4TTokenizer.from_pretrained(MODEL_NAME)
+                cls._set_status(stage="model", progress=0.1)
+                cls.model = cls.build_model(cls.profile, on_stage=lambda stage: cls._set_status(stage=stage))
+            except Exception as e:
+                cls._set_status(state="failed", error=str(e))
+                raise
+            cls._set_status(state="ready", stage=None, progress=1.0, load_time=time.perf_counter() - start_time)
+            cls._ready.set()
+
+    @staticmethod
+    def build_model(profile: str, on_stage=None, compile_model: Optional[bool] = None) -> SeamlessM4Tv2ForSpeechToText:
+        """
+        Load the model for an inference profile. CPU profiles load in float32 (bfloat16
+        matmuls are slow or emulated on most x86 CPUs); cpu-int8 then swaps every
+        nn.Linear for a dynamically quantized int8 one. With `compile_model` (default:
+        STT_COMPILE=1) the speech encoder, which runs once per utterance on a fixed
+        feature layout, is wrapped in torch.compile.
+        """
+        on_stage = on_stage or (lambda stage: None)
+        if profile == "gpu":
+            return SeamlessM4Tv2ForSpeechToText.from_pretrained(MODEL_NAME, torch_dtype=torch.bfloat16, device_map="cuda")
+
+        configure_cpu_threads()
+        model = SeamlessM4Tv2ForSpeechToText.from_pretrained(MODEL_NAME, torch_dtype=torch.float32)
+        model.eval()
+        if profile == "cpu-int8":
+            on_stage("int8 quantization")
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        if compile_model is None:
+            compile_model = os.getenv("STT_COMPILE", "0") == "1"
+        if compile_model:
+            on_stage("compiling")
+            try:
+                model.speech_encoder = torch.compile(model.speech_encoder, dynamic=True)
+            except Exception as e:
+                print(f"torch.compile unavailable, running eagerly: {e}")
+        return model
+
+    @classmethod
+    def preload(cls) -> threading.Thread:
+        """Start loading on a daemon thread; safe to call on every app rerun"""
+        with cls._load_lock:
+            if cls._loader is None or (not cls._loader.is_alive() and cls._status["state"] == "failed"):
+                cls._set_status(state="loading", stage="starting", progress=0.0, error=None)
+                cls._loader = threading.Thread(target=cls._preload, name="stt-preload", daemon=True)
+                cls._loader.start()
+            return cls._loader
+
+    @classmethod
+    def _preload(cls):
+        try:
+            cls.load()
+        except Exception as e:
+            print(f"STT model failed to load: {e}")
+
+    @classmethod
+    def is_ready(cls) -> bool:
+        return cls._ready.is_set()
+
+    @classmethod
+    def wait_until_ready(cls, timeout: Optional[float] = None) -> bool:
+        """Block until the model is loaded; False on timeout"""
+        return cls._ready.wait(timeout)
+
+    @classmethod
+    def status(cls) -> Dict[str, Any]:
+        """Snapshot with keys: state, stage, progress (0-1), error, load_time, profile"""
+        return {**cls._status, "profile": cls.profile}
+
+    @classmethod
+    def _plan_languages(cls, hidden_states: torch.Tensor, feature_mask: Optional[torch.Tensor],
+                        defer_display_text: Sequence[bool]) -> List[Tuple[Optional[str], Tuple[str, ...]]]:
+        """
+        (spoken language, languages to decode) per utterance. An English speaker only
+        needs the English decode, which doubles as the display text; anyone else needs
+        agent_language now and display_language now, or later if the caller deferred it.
+        """
+        if SPOKEN_LANGUAGE != "auto":
+            spoken = [SPOKEN_LANGUAGE] * hidden_states.shape[0]
+        else:
+            language_id = get_language_id()
+            if language_id is None:
+                spoken = [None] * hidden_states.shape[0]
+            else:
+                spoken = [language for language, _ in language_id.predict(pool_encoder_states(hidden_states, feature_mask))]
+
+        plans = []
+        for language, defer in zip(spoken, defer_display_text):
+            if language == cls.agent_language or (language is not None and defer and cls.lazy_display_text):
+                plans.append((language, (cls.agent_language,)))
+            else:
+                plans.append((language, cls.target_languages))
+        return plans
+
+    @classmethod
+    def _generate_translations(cls, audio_inputs, languages: Optional[List[Optional[Sequence[str]]]] = None,
+                               defer_display_text: Optional[List[bool]] = None) -> List[Dict[str, Any]]:
+        """
+        Decode a batch of utterances. The speech encoder runs once per utterance and its
+        output feeds a single batched decode with one row per (utterance, language) pair.
+        `languages` gives the targets per utterance; None entries (or None) are planned
+        from the spoken language, leaving out the display text where `defer_display_text`
+        allows it. Returns {"language": spoken or None, "texts": {lang: text}}.
+        """
+        lang_to_id = cls.model.generation_config.text_decoder_lang_to_code_id
+        input_features = audio_inputs["input_features"]
+        attention_mask = audio_inputs.get("attention_mask")
+        batch_size = input_features.shape[0]
+        languages = languages or [None] * batch_size
+        defer_display_text = defer_display_text or [False] * batch_size
+
+        with torch.inference_mode():
+            encoder_outputs = cls.model.speech_encoder(input_features=input_features, attention_mask=attention_mask)
+            hidden_states = encoder_outputs.last_hidden_state
+            plans = [(None, tuple(targets)) if targets else None for targets in languages]
+            if None in plans:
+                planned = cls._plan_languages(hidden_states, attention_mask, defer_display_text)
+                plans = [plan or planned[index] for index, plan in enumerate(plans)]
+
+            rows = [(index, language) for index, (_, targets) in enumerate(plans) for language in targets]
+            row_index = torch.tensor([index for index, _ in rows], device=input_features.device)
+            generate_kwargs = {
+                "encoder_outputs": BaseModelOutput(last_hidden_state=_select_rows(hidden_states, row_index)),
+                "decoder_input_ids": torch.tensor([[lang_to_id[language]] for _, language in rows], device=input_features.device),
+            }
+            if attention_mask is not None:
+                generate_kwargs["attention_mask"] = _select_rows(attention_mask, row_index)
+            # Base generate: SeamlessM4Tv2's own generate derives decoder_input_ids from a single tgt_lang
+            output_ids = super(SeamlessM4Tv2ForSpeechToText, cls.model).generate(
+                _select_rows(input_features, row_index), **generate_kwargs
+            )
+
+        texts = cls.tokenizer.batch_decode(output_ids.cpu(), clean_up_tokenization_spaces=True, skip_special_tokens=True)
+        transcriptions = [{"language": spoken, "texts": {}} for spoken, _ in plans]
+        for (index, language), text in zip(rows, texts):
+            transcriptions[index]["texts"][language] = text.strip()
+        return transcriptions
+
+    @classmethod
+    def _result(cls, transcription: Dict[str, Any], processing_time: float) -> Dict[str, Union[str, float, bool, None]]:
+        """
+        Result dict for one utterance. hindi_text is the display-language decode, the
+        English transcript when English was spoken, or None when the caller deferred it.
+        """
+        texts = transcription["texts"]
+        text = texts.get(cls.agent_language, "")
+        if cls.display_language in texts:
+            display_text = texts[cls.display_language]
+        elif transcription["language"] == cls.agent_language:
+            display_text = text
+        else:
+            display_text = None
+        return {
+            "text": text,
+            "hindi_text": display_text,
+            "language": transcription["language"],
+            "success": True,
+            "error": None,
+            "processing_time": processing_time
+        }
+
+    @staticmethod
+    def _silence_result(processing_time: float) -> Dict[str, Union[str, float, bool, None]]:
+        """Result for an utterance with no speech left after trimming (the model is not run)"""
+        return {
+            "text": "",
+            "hindi_text": "",
+            "language": None,
+            "success": True,
+            "error": None,
+            "processing_time": processing_time
+        }
+
+    @classmethod
+    def pooled_encoder_states(cls, audio_arrays: List[np.ndarray], sample_rate: int = 16000) -> np.ndarray:
+        """Time-averaged speech encoder output per utterance (the language ID features)"""
+        cls.load()
+        # Preprocessed as for transcription, so the features match what the classifier sees there
+        audio_arrays = [preprocess_audio(audio, sample_rate, MODEL_SAMPLE_RATE) for audio in audio_arrays]
+        audio_inputs = cls.processor(audio_arrays, sampling_rate=MODEL_SAMPLE_RATE, padding=True, return_tensors="pt").to(cls.device)
+        with torch.inference_mode():
+            encoder_outputs = cls.model.speech_encoder(input_features=audio_inputs["input_features"],
+                                                       attention_mask=audio_inputs.get("attention_mask"))
+        return pool_encoder_states(encoder_outputs.last_hidden_state, audio_inputs.get("attention_mask"))
+
+    @classmethod
+    def transcribe_batch(cls, audio_arrays: List[np.ndarray], sample_rate: int = 16000,
+                         languages: Optional[List[Optional[Sequence[str]]]] = None,
+                         defer_display_text: Optional[List[bool]] = None) -> List[Dict[str, Union[str, float, bool]]]:
+        """
+        Transcribe several mono utterances with one padded feature extraction and one
+        generate call. `languages` optionally fixes the decoded targets per utterance;
+        `defer_display_text` marks those whose hindi_text may be left as None (see
+        lazy_display_text). Returns one result dict per utterance, as transcribe_from_numpy does.
+        """
+        start_time = time.perf_counter()
+        
+        try:
+            cls.load()
+            
+            # Utterances that are all silence are answered without running the model
+            audio_arrays = [preprocess_audio(audio, sample_rate, MODEL_SAMPLE_RATE) for audio in audio_arrays]
+            speech = [index for index, audio in enumerate(audio_arrays) if audio.size]
+            transcriptions = {}
+            if speech:
+                audio_inputs = cls.processor([audio_arrays[index] for index in speech], sampling_rate=MODEL_SAMPLE_RATE,
+                                             padding=True, return_tensors="pt").to(cls.device)
+                plans = [languages[index] for index in speech] if languages else None
+                defer = [defer_display_text[index] for index in speech] if defer_display_text else None
+                transcriptions = dict(zip(speech, cls._generate_translations(audio_inputs, plans, defer)))
+            
+            processing_time = time.perf_counter() - start_time
+            return [
+                cls._result(transcriptions[index], processing_time) if index in transcriptions else cls._silence_result(processing_time)
+                for index in range(len(audio_arrays))
+            ]
+            
+        except Exception as e:
+            processing_time = time.perf_counter() - start_time
+            return [
+                {"text": "", "success": False, "error": str(e), "processing_time": processing_time}
+                for _ in audio_arrays
+            ]
 
     @classmethod
     def transcribe_from_bytes(cls, audio_bytes: bytes, sample_rate: int = 16000, format: str = "wav") -> Dict[str, Union[str, float, bool]]:
@@ -22,7 +341,7 @@ class STTModel():
         
         Args:
             audio_bytes: Audio data as bytes
-            sample_rate: Sample rate of the audio (default: 16000)
+            sample_rate: Rate the audio is decoded at before preprocessing (default: 16000)
             format: Audio format (default: "wav")
             
         Returns:
@@ -31,40 +350,36 @@ class STTModel():
         start_time = time.perf_counter()
         
         try:
-            # Convert bytes to audio tensor
-            audio_buffer = io.BytesIO(audio_bytes)
-            audio, orig_freq = torchaudio.load(audio_buffer, format=format)
+            cls.load()
             
-            # Resample to 16kHz if needed
-            if orig_freq != sample_rate:
-                audio = torchaudio.functional.resample(audio, orig_freq=orig_freq, new_freq=sample_rate)
+            audio = cls._decode_audio(audio_bytes, sample_rate, format)
             
-            # Ensure mono audio (take first channel if stereo)
-            if audio.shape[0] > 1:
-                audio = audio[0:1, :]
+            # Long recordings go through bounded windows (each preprocessed) instead of one generate
+            if len(audio) > LONG_FORM_THRESHOLD_SECONDS * sample_rate:
+                for partial in cls.transcribe_long_form(audio, sample_rate):
+                    if not partial["success"]:
+                        raise RuntimeError(partial["error"])
+                return {
+                    "text": partial["transcript"],
+                    "hindi_text": partial["hindi_transcript"],
+                    "language": None,
+                    "success": True,
+                    "error": None,
+                    "processing_time": time.perf_counter() - start_time
+                }
+            
+            # Only the speech, at the model rate, reaches the model
+            audio = preprocess_audio(audio, sample_rate, MODEL_SAMPLE_RATE)
+            if not audio.size:
+                return cls._silence_result(time.perf_counter() - start_time)
             
             # Process audio
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            audio_inputs = cls.processor(audio, sampling_rate=sample_rate, return_tensors="pt").to(device)
+            audio_inputs = cls.processor(audio, sampling_rate=MODEL_SAMPLE_RATE, return_tensors="pt").to(cls.device)
             
-            # Generate transcription
-            with torch.no_grad():
-                text_out = cls.model.generate(**audio_inputs, tgt_lang="eng")[0].cpu().numpy().squeeze()
-                hindi_text_out = cls.model.generate(**audio_inputs, tgt_lang="hin")[0].cpu().numpy().squeeze()
+            # Generate transcription (one encoder pass for both languages)
+            transcription = cls._generate_translations(audio_inputs)[0]
             
-            # Decode text
-            transcribed_text = cls.tokenizer.decode(text_out, clean_up_tokenization_spaces=True, skip_special_tokens=True)
-            transcribed_hindi_text = cls.tokenizer.decode(hindi_text_out, clean_up_tokenization_spaces=True, skip_special_tokens=True)
-            
-            processing_time = time.perf_counter() - start_time
-            
-            return {
-                "text": transcribed_text.strip(),
-                "hindi_text": transcribed_hindi_text.strip(),
-                "success": True,
-                "error": None,
-                "processing_time": processing_time
-            }
+            return cls._result(transcription, time.perf_counter() - start_time)
             
         except Exception as e:
             processing_time = time.perf_counter() - start_time
@@ -75,52 +390,80 @@ class STTModel():
                 "processing_time": processing_time
             }
 
+    @staticmethod
+    def _decode_audio(audio_bytes: bytes, sample_rate: int, format: str) -> np.ndarray:
+        """Decode an audio file to mono float32 samples at `sample_rate`, first channel only"""
+        audio, orig_freq = torchaudio.load(io.BytesIO(audio_bytes), format=format)
+        
+        # Ensure mono audio (take first channel if stereo), then resample if needed
+        return resample(audio[0].numpy(), orig_freq, sample_rate)
+
+    @classmethod
+    def transcribe_long_form(cls, audio_array: np.ndarray, sample_rate: int = 16000,
+                             window_seconds: float = LONG_FORM_WINDOW_SECONDS,
+                             overlap_seconds: float = LONG_FORM_OVERLAP_SECONDS,
+                             batch_size: int = 4) -> Iterator[Dict[str, Any]]:
+        """
+        Transcribe a recording of any length. It is split in pauses into windows of at
+        most `window_seconds` that overlap by `overlap_seconds`, windows are transcribed
+        `batch_size` at a time, and words repeated across an overlap are dropped.
+
+        Yields one dict per window, in order, as soon as its batch is done:
+        'window', 'windows', 'start', 'end' (seconds), 'text' and 'hindi_text' (new text
+        from this window), 'transcript' and 'hindi_transcript' (everything so far),
+        'success' and 'error'. Stops after the first failed window.
+        """
+        audio = np.asarray(audio_array, dtype=np.float32).reshape(-1)
+        windows = plan_windows(audio, sample_rate, window_seconds, overlap_seconds)
+        transcript, hindi_transcript = "", ""
+        for batch_start in range(0, len(windows), batch_size):
+            batch = windows[batch_start:batch_start + batch_size]
+            results = cls.transcribe_batch([audio[start:end] for start, end in batch], sample_rate,
+                                           [cls.target_languages] * len(batch))
+            for index, ((start, end), result) in enumerate(zip(batch, results), batch_start):
+                partial = {"window": index, "windows": len(windows), "start": start / sample_rate, "end": end / sample_rate}
+                if not result["success"]:
+                    yield {**partial, "text": "", "hindi_text": "", "transcript": transcript,
+                           "hindi_transcript": hindi_transcript, "success": False, "error": result["error"]}
+                    return
+                text = merge_overlap(transcript, result["text"])
+                hindi_text = merge_overlap(hindi_transcript, result["hindi_text"])
+                transcript = " ".join(filter(None, (transcript, text)))
+                hindi_transcript = " ".join(filter(None, (hindi_transcript, hindi_text)))
+                yield {**partial, "text": text, "hindi_text": hindi_text, "transcript": transcript,
+                       "hindi_transcript": hindi_transcript, "success": True, "error": None}
+
     @classmethod
-    def transcribe_from_numpy(cls, audio_array: np.ndarray, sample_rate: int = 16000) -> Dict[str, Union[str, float, bool]]:
+    def transcribe_from_numpy(cls, audio_array: np.ndarray, sample_rate: int = 16000,
+                              languages: Optional[Sequence[str]] = None) -> Dict[str, Union[str, float, bool]]:
         """
         Transcribe audio from numpy array
         
         Args:
             audio_array: Audio data as numpy array
             sample_rate: Sample rate of the audio (default: 16000)
+            languages: Languages to decode (default: planned from the spoken language)
             
         Returns:
-            Dict with keys: 'text', 'success', 'error', 'processing_time'
+            Dict with keys: 'text', 'hindi_text', 'language', 'success', 'error', 'processing_time'
         """
         start_time = time.perf_counter()
         
         try:
-            # Convert numpy array to torch tensor
-            if audio_array.ndim == 1:
-                audio = torch.from_numpy(audio_array).float().unsqueeze(0)
-            else:
-                audio = torch.from_numpy(audio_array).float()
-                
-            # Ensure mono audio (take first channel if stereo)
-            if audio.shape[0] > 1:
-                audio = audio[0:1, :]
+            cls.load()
+            
+            # Mono (first channel if stereo), at the model rate, silence trimmed and RMS normalized
+            audio = preprocess_audio(audio_array, sample_rate, MODEL_SAMPLE_RATE)
+            if not audio.size:
+                return cls._silence_result(time.perf_counter() - start_time)
             
             # Process audio
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            audio_inputs = cls.processor(audio, sampling_rate=sample_rate, return_tensors="pt").to(device)
+            audio_inputs = cls.processor(audio, sampling_rate=MODEL_SAMPLE_RATE, return_tensors="pt").to(cls.device)
             
-            # Generate transcription
-            with torch.no_grad():
-                text_out = cls.model.generate(**audio_inputs, tgt_lang="eng")[0].cpu().numpy().squeeze()
-                hindi_text_out = cls.model.generate(**audio_inputs, tgt_lang="hin")[0].cpu().numpy().squeeze()
-            # Decode text
-            transcribed_text = cls.tokenizer.decode(text_out, clean_up_tokenization_spaces=True, skip_special_tokens=True)
-            transcribed_hindi_text = cls.tokenizer.decode(hindi_text_out, clean_up_tokenization_spaces=True, skip_special_tokens=True)
+            # Generate transcription (one encoder pass for both languages)
+            transcription = cls._generate_translations(audio_inputs, [languages])[0]
             
-            processing_time = time.perf_counter() - start_time
-            
-            return {
-                "text": transcribed_text.strip(),
-                "hindi_text": transcribed_hindi_text.strip(),
-                "success": True,
-                "error": None,
-                "processing_time": processing_time
-            }
+            return cls._result(transcription, time.perf_counter() - start_time)
             
         except Exception as e:
             processing_time = time.perf_counter() - start_time
@@ -131,19 +474,164 @@ class STTModel():
                 "processing_time": processing_time
             }
 
+    @classmethod
+    def open_stream(cls, sample_rate: int = 16000, **options) -> "StreamingTranscriber":
+        """Start a streaming transcription; feed() it audio while recording, then finish()"""
+        return StreamingTranscriber(sample_rate, **options)
+
     @classmethod
     def transcribe(cls) -> str:
         """Legacy method for backward compatibility"""
         warnings.warn("transcribe() is deprecated. Use transcribe_from_bytes() or transcribe_from_numpy()", DeprecationWarning)
         audio, orig_freq = torchaudio.load("/home/ishant-gupta/Downloads/input.ogg", format="ogg")
-        audio = torchaudio.functional.resample(audio, orig_freq=orig_freq, new_freq=16_000)
+        cls.load()
         start = time.perf_counter()
-        audio_inputs = cls.processor(audio, sampling_rate=16_000, return_tensors="pt").to("cuda")
-        text_out = cls.model.generate(**audio_inputs, tgt_lang="eng")[0].cpu().numpy().squeeze()
-        hindi_text_out = cls.model.generate(**audio_inputs, tgt_lang="hin")[0].cpu().numpy().squeeze()
+        audio = preprocess_audio(audio[0].numpy(), orig_freq, MODEL_SAMPLE_RATE)
+        audio_inputs = cls.processor(audio, sampling_rate=MODEL_SAMPLE_RATE, return_tensors="pt").to(cls.device)
+        texts = cls._generate_translations(audio_inputs, [cls.target_languages])[0]["texts"]
         end = time.perf_counter()
         print(end-start)
-        return cls.tokenizer.decode(text_out, clean_up_tokenization_spaces=True, skip_special_tokens=True), cls.tokenizer.decode(hindi_text_out, clean_up_tokenization_spaces=True, skip_special_tokens=True)
+        return texts["eng"], texts["hin"]
+
+
+class StreamingTranscriber:
+    """
+    Transcribes an utterance while it is still being recorded. Audio is fed in chunks of
+    any size, split into frames and cut into segments at pauses (`pause_seconds` of
+    non-speech once a segment is at least `min_segment_seconds` long, or hard at
+    `max_segment_seconds`). Each finished segment is transcribed on a background worker
+    while recording continues, so finish() only waits for the last segment. Segments go
+    to `submit` (e.g. BatchingSTTService.submit, to batch with other sessions) or to a
+    worker of this class.
+    """
+
+    # One worker shared by all streams: segments run in order and never compete for the model
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 30, pause_seconds: float = 0.3,
+                 min_segment_seconds: float = 2.0, max_segment_seconds: float = 12.0,
+                 pre_roll_seconds: float = 0.2, vad: Optional[EnergyVAD] = None,
+                 submit: Optional[Callable[[np.ndarray], Future]] = None):
+        self.sample_rate = sample_rate
+        self.submit = submit
+        self.frame_size = sample_rate * frame_ms // 1000
+        frame_seconds = self.frame_size / sample_rate
+        to_frames = lambda seconds: max(1, int(round(seconds / frame_seconds)))
+        self.pause_frames = to_frames(pause_seconds)
+        self.min_segment_frames = to_frames(min_segment_seconds)
+        self.max_segment_frames = to_frames(max_segment_seconds)
+        self.vad = vad or EnergyVAD()
+
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._pre_roll = deque(maxlen=to_frames(pre_roll_seconds))
+        self._segment: List[np.ndarray] = []
+        self._last_voiced = 0
+        self._silence_run = 0
+        self._futures: List[Future] = []
+        self._closed = False
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt-stream")
+            return cls._executor
+
+    def feed(self, chunk: np.ndarray):
+        """Add captured audio (float32 mono, or the first channel is used)"""
+        if self._closed:
+            raise RuntimeError("Stream is already finished")
+        chunk = np.asarray(chunk, dtype=np.float32)
+        if chunk.ndim > 1:
+            chunk = chunk[:, 0]
+        self._pending = np.concatenate([self._pending, chunk]) if self._pending.size else chunk
+        frames = len(self._pending) // self.frame_size
+        for index in range(frames):
+            self._push_frame(self._pending[index * self.frame_size:(index + 1) * self.frame_size])
+        self._pending = self._pending[frames * self.frame_size:]
+
+    def _push_frame(self, frame: np.ndarray):
+        speech = self.vad.is_speech(frame)
+        if not self._segment:
+            # Drop silence between segments, keeping a little before the next onset
+            self._pre_roll.append(frame)
+            if speech:
+                self._segment = list(self._pre_roll)
+                self._pre_roll.clear()
+                self._last_voiced = len(self._segment)
+                self._silence_run = 0
+            return
+
+        self._segment.append(frame)
+        if speech:
+            self._last_voiced = len(self._segment)
+            self._silence_run = 0
+        else:
+            self._silence_run += 1
+        if self._silence_run >= self.pause_frames and len(self._segment) >= self.min_segment_frames:
+            self._submit_segment()
+        elif len(self._segment) >= self.max_segment_frames:
+            self._submit_segment(cut_at_pause=False)
+
+    def _submit_segment(self, cut_at_pause: bool = True):
+        # Keep half the pause as the segment's tail; the rest seeds the next pre-roll
+        end = min(len(self._segment), self._last_voiced + self.pause_frames // 2) if cut_at_pause else len(self._segment)
+        audio = np.concatenate(self._segment[:end])
+        self._pre_roll.extend(self._segment[end:])
+        self._segment = []
+        if self.submit:
+            self._futures.append(self.submit(audio))
+        else:
+            self._futures.append(self._get_executor().submit(STTModel.transcribe_from_numpy, audio, self.sample_rate))
+
+    @property
+    def segments(self) -> int:
+        """Segments handed to the worker so far"""
+        return len(self._futures)
+
+    def partial_text(self) -> str:
+        """English text of the segments transcribed so far, in order"""
+        texts = []
+        for future in self._futures:
+            if not future.done():
+                break
+            texts.append(future.result().get("text", ""))
+        return " ".join(text for text in texts if text)
+
+    def finish(self, timeout: Optional[float] = None) -> Dict[str, Union[str, float, bool]]:
+        """
+        Flush the last segment and stitch all segment transcripts. Same keys as
+        STTModel.transcribe_from_numpy; processing_time is the wait after the call.
+        """
+        start_time = time.perf_counter()
+        if not self._closed:
+            self._closed = True
+            if self._segment:
+                self._segment = self._segment[:self._last_voiced]
+                self._submit_segment(cut_at_pause=False)
+
+        results = [future.result(timeout) for future in self._futures]
+        failed = [result["error"] for result in results if not result["success"]]
+        hindi_texts = [result.get("hindi_text") for result in results]
+        languages = [result.get("language") for result in results if result.get("language")]
+        return {
+            "text": " ".join(result["text"] for result in results if result["text"]),
+            # None when any segment left its display text for later: it is decoded over the whole utterance
+            "hindi_text": None if None in hindi_texts else " ".join(text for text in hindi_texts if text),
+            "language": languages[0] if languages else None,
+            "success": not failed,
+            "error": failed[0] if failed else None,
+            "processing_time": time.perf_counter() - start_time,
+            "segments": len(results),
+        }
+
+    def cancel(self):
+        """Drop buffered audio and any segment not yet started"""
+        self._closed = True
+        self._segment = []
+        for future in self._futures:
+            future.cancel()
 
 
 # Convenience function for easy import
@@ -151,7 +639,47 @@ def transcribe_audio_bytes(audio_bytes: bytes, sample_rate: int = 16000, format:
     """Convenience function to transcribe audio from bytes"""
     return STTModel.transcribe_from_bytes(audio_bytes, sample_rate, format)
 
-def transcribe_audio_numpy(audio_array: np.ndarray, sample_rate: int = 16000) -> Dict[str, Union[str, float, bool]]:
-    """Convenience function to transcribe audio from numpy array"""
-    return STTModel.transcribe_from_numpy(audio_array, sample_rate)
+def transcribe_audio_long_form(audio_bytes: bytes, sample_rate: int = 16000, format: str = "wav") -> Iterator[Dict[str, Any]]:
+    """Convenience generator over the partial results of a long audio file"""
+    return STTModel.transcribe_long_form(STTModel._decode_audio(audio_bytes, sample_rate, format), sample_rate)
+
+def transcribe_audio_numpy(audio_array: np.ndarray, sample_rate: int = 16000,
+                           languages: Optional[Sequence[str]] = None) -> Dict[str, Union[str, float, bool]]:
+    """Convenience function to transcribe audio from numpy array (in the STT worker when enabled)"""
+    if USE_STT_WORKER:
+        client = get_worker_client()
+        # Resampled here so that the model is only ever loaded in the worker
+        audio = np.asarray(audio_array, dtype=np.float32)
+        audio = np.ascontiguousarray(audio[0] if audio.ndim > 1 else audio)
+        return client.transcribe(resample(audio, sample_rate, client.sample_rate), languages=languages)
+    return STTModel.transcribe_from_numpy(audio_array, sample_rate, languages)
+
+def submit_audio_numpy(audio_array: np.ndarray, languages: Optional[Sequence[str]] = None,
+                       defer_display_text: bool = False) -> Future:
+    """
+    Queue a 16 kHz utterance for batched transcription, in the STT worker when enabled
+    and on the in-process BatchingSTTService otherwise; the future yields the result dict.
+    `languages` fixes the decoded targets, e.g. ("hin",) for a deferred display text.
+    With `defer_display_text` hindi_text may be None (see STTModel.lazy_display_text).
+    """
+    if USE_STT_WORKER:
+        return get_worker_client().submit(audio_array, languages, defer_display_text)
+    from .batching import get_stt_service
+    return get_stt_service().submit(audio_array, languages, defer_display_text)
+
+def preload_stt_model():
+    """Start loading the STT model in the background (in the STT worker when enabled)"""
+    if USE_STT_WORKER:
+        get_worker_client().start()
+    else:
+        STTModel.preload()
+
+def stt_model_status() -> Dict[str, Any]:
+    """Loading state of the STT model, for display in the UI"""
+    if USE_STT_WORKER:
+        return get_worker_client().status()
+    return STTModel.status()
 
+def open_transcription_stream(sample_rate: int = 16000, submit: Optional[Callable[[np.ndarray], Future]] = None) -> StreamingTranscriber:
+    """Convenience function to start a streaming transcription"""
+    return STTModel.open_stream(sample_rate, submit=submit)
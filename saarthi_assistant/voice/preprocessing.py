@@ -0,0 +1,81 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+import torch
+import torchaudio
+
+# Frames less than TRIM_MARGIN_DB above the recording's noise floor are silence, as are
+# frames below TRIM_FLOOR_DB whatever the noise floor
+TRIM_MARGIN_DB = float(os.getenv("STT_TRIM_MARGIN_DB", 10))
+TRIM_FLOOR_DB = float(os.getenv("STT_TRIM_FLOOR_DB", -55))
+# Speech is normalized to this RMS level; quiet input is boosted by at most TARGET_MAX_GAIN_DB
+TARGET_RMS_DB = float(os.getenv("STT_TARGET_RMS_DB", -20))
+TARGET_MAX_GAIN_DB = 30.0
+
+
+def frame_levels_db(audio: np.ndarray, frame_size: int) -> np.ndarray:
+    """RMS level in dBFS of each whole frame"""
+    frames = len(audio) // frame_size
+    if frames == 0:
+        return np.zeros(0)
+    power = np.mean(np.square(audio[:frames * frame_size].reshape(frames, frame_size), dtype=np.float64), axis=1)
+    return 10 * np.log10(np.maximum(power, 1e-20))
+
+
+@lru_cache(maxsize=8)
+def get_resampler(orig_freq: int, new_freq: int) -> torchaudio.transforms.Resample:
+    """Resampler per rate pair; the filter kernel is built once instead of on every call"""
+    return torchaudio.transforms.Resample(orig_freq=orig_freq, new_freq=new_freq)
+
+
+def resample(audio: np.ndarray, orig_freq: int, new_freq: int) -> np.ndarray:
+    if orig_freq == new_freq:
+        return audio
+    with torch.inference_mode():
+        return get_resampler(orig_freq, new_freq)(torch.from_numpy(audio)).numpy()
+
+
+def trim_silence(audio: np.ndarray, sample_rate: int, frame_ms: int = 20, padding_seconds: float = 0.1) -> np.ndarray:
+    """
+    Cut leading and trailing silence, keeping `padding_seconds` around the first and
+    last voiced frame. The noise floor is the 10th percentile of the frame levels; the
+    threshold never exceeds the loudest frame minus the margin, so a recording that is
+    all speech is kept whole. Returns an empty array if nothing is voiced.
+    """
+    frame_size = max(1, sample_rate * frame_ms // 1000)
+    levels = frame_levels_db(audio, frame_size)
+    if levels.size == 0:
+        return audio
+    threshold = min(max(np.percentile(levels, 10) + TRIM_MARGIN_DB, TRIM_FLOOR_DB), levels.max() - TRIM_MARGIN_DB)
+    voiced = np.flatnonzero(levels >= max(threshold, TRIM_FLOOR_DB))
+    if voiced.size == 0:
+        return audio[:0]
+    padding = int(padding_seconds * sample_rate)
+    start = max(0, voiced[0] * frame_size - padding)
+    end = min(len(audio), (voiced[-1] + 1) * frame_size + padding)
+    return audio[start:end]
+
+
+def normalize_rms(audio: np.ndarray) -> np.ndarray:
+    """Scale to TARGET_RMS_DB, limited so that the peak stays below full scale"""
+    if not audio.size:
+        return audio
+    rms = np.sqrt(np.mean(np.square(audio, dtype=np.float64)))
+    peak = np.max(np.abs(audio))
+    if rms <= 0:
+        return audio
+    gain = min(10 ** (TARGET_RMS_DB / 20) / rms, 10 ** (TARGET_MAX_GAIN_DB / 20), 0.99 / peak)
+    return (audio * gain).astype(np.float32)
+
+
+def preprocess_audio(audio: np.ndarray, sample_rate: int, target_rate: int = 16000) -> np.ndarray:
+    """
+    Mono float32 at `target_rate` with silence trimmed and RMS normalized. Accepts a 1-D
+    array or (channels, samples), of which the first channel is used.
+    """
+    audio = np.asarray(audio, dtype=np.float32)
+    if audio.ndim > 1:
+        audio = audio[0]
+    audio = resample(np.ascontiguousarray(audio), sample_rate, target_rate)
+    return normalize_rms(trim_silence(audio, target_rate))
@@ -0,0 +1,132 @@
+import os
+from collections import deque
+from typing import Optional, Callable
+
+import numpy as np
+
+# Recording defaults, overridable per call
+TRAILING_SILENCE_SECONDS = float(os.getenv("VOICE_TRAILING_SILENCE_MS", 800)) / 1000
+MAX_RECORDING_SECONDS = float(os.getenv("VOICE_MAX_RECORDING_SECONDS", 15))
+START_TIMEOUT_SECONDS = float(os.getenv("VOICE_START_TIMEOUT_SECONDS", 5))
+
+
+class EnergyVAD:
+    """
+    Frame-level voice activity detection on signal energy. A frame is speech when its
+    level is `margin_db` above the background noise floor (tracked on non-speech
+    frames, seeded from the first frames) and above `min_speech_db`.
+    """
+
+    def __init__(self, margin_db: float = 10.0, min_speech_db: float = -50.0, noise_adaptation: float = 0.05):
+        self.margin_db = margin_db
+        self.min_speech_db = min_speech_db
+        self.noise_adaptation = noise_adaptation
+        self.noise_floor_db: Optional[float] = None
+
+    @staticmethod
+    def level_db(frame: np.ndarray) -> float:
+        """RMS level in dBFS"""
+        rms = np.sqrt(np.mean(np.square(frame, dtype=np.float64)))
+        return 20 * np.log10(max(rms, 1e-10))
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        level = self.level_db(frame)
+        if self.noise_floor_db is None:
+            # Assume the user starts speaking after the first frame
+            self.noise_floor_db = level
+        speech = level >= max(self.noise_floor_db + self.margin_db, self.min_speech_db)
+        if not speech:
+            self.noise_floor_db += self.noise_adaptation * (level - self.noise_floor_db)
+        return speech
+
+
+class UtteranceSegmenter:
+    """
+    Cuts one utterance out of a stream of fixed-size frames: it starts after
+    `min_speech_seconds` of consecutive speech (keeping `pre_roll_seconds` before it so
+    onsets are not clipped), ends after `trailing_silence_seconds` without speech or at
+    `max_duration_seconds`, and gives up if nobody speaks within `start_timeout_seconds`.
+    """
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 30,
+                 trailing_silence_seconds: Optional[float] = None, max_duration_seconds: Optional[float] = None,
+                 start_timeout_seconds: Optional[float] = None, pre_roll_seconds: float = 0.3,
+                 min_speech_seconds: float = 0.09, vad: Optional[EnergyVAD] = None):
+        self.sample_rate = sample_rate
+        self.frame_size = sample_rate * frame_ms // 1000
+        frame_seconds = self.frame_size / sample_rate
+        to_frames = lambda seconds: max(1, int(round(seconds / frame_seconds)))
+        self.trailing_silence_frames = to_frames(trailing_silence_seconds or TRAILING_SILENCE_SECONDS)
+        self.max_frames = to_frames(max_duration_seconds or MAX_RECORDING_SECONDS)
+        self.start_timeout_frames = to_frames(start_timeout_seconds or START_TIMEOUT_SECONDS)
+        self.min_speech_frames = to_frames(min_speech_seconds)
+        self.vad = vad or EnergyVAD()
+
+        self._pre_roll = deque(maxlen=to_frames(pre_roll_seconds) + self.min_speech_frames)
+        self._frames = []
+        self._speech_run = 0
+        self._silence_run = 0
+        self._frames_seen = 0
+        self._last_voiced = 0
+        self.started = False
+        self.done = False
+
+    def push(self, frame: np.ndarray) -> bool:
+        """Feed one frame; returns True once the utterance is complete (or timed out)"""
+        if self.done:
+            return True
+        frame = np.asarray(frame, dtype=np.float32).reshape(-1)
+        speech = self.vad.is_speech(frame)
+        self._frames_seen += 1
+
+        if not self.started:
+            self._pre_roll.append(frame)
+            self._speech_run = self._speech_run + 1 if speech else 0
+            if self._speech_run >= self.min_speech_frames:
+                self.started = True
+                self._frames = list(self._pre_roll)
+                self._last_voiced = len(self._frames)
+            elif self._frames_seen >= self.start_timeout_frames:
+                self.done = True
+            return self.done
+
+        self._frames.append(frame)
+        if speech:
+            self._silence_run = 0
+            self._last_voiced = len(self._frames)
+        else:
+            self._silence_run += 1
+        if self._silence_run >= self.trailing_silence_frames or len(self._frames) >= self.max_frames:
+            self.done = True
+        return self.done
+
+    def utterance(self) -> np.ndarray:
+        """Voiced span (pre-roll to the last speech frame), empty if there was no speech"""
+        if not self.started:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(self._frames[:self._last_voiced])
+
+    @property
+    def duration(self) -> float:
+        """Seconds of audio consumed so far"""
+        return self._frames_seen * self.frame_size / self.sample_rate
+
+
+def record_utterance(sample_rate: int = 16000, frame_ms: int = 30, on_frame: Optional[Callable[[np.ndarray], None]] = None,
+                     **segmenter_options) -> np.ndarray:
+    """
+    Record from the default microphone until the speaker stops (see
+    UtteranceSegmenter for the options) and return the voiced span as float32 mono.
+    `on_frame` receives every captured block as it arrives, e.g. a streaming transcriber.
+    """
+    import sounddevice as sd
+
+    segmenter = UtteranceSegmenter(sample_rate, frame_ms, **segmenter_options)
+    with sd.InputStream(samplerate=sample_rate, channels=1, dtype="float32", blocksize=segmenter.frame_size) as stream:
+        while True:
+            frame = stream.read(segmenter.frame_size)[0]
+            if on_frame:
+                on_frame(frame[:, 0])
+            if segmenter.push(frame):
+                break
+    return segmenter.utterance()
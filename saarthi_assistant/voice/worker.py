@@ -0,0 +1,243 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+# Run STT in a separate process (STT_WORKER=0 keeps it in the app process)
+USE_STT_WORKER = os.getenv("STT_WORKER", "1") == "1"
+# Cores the worker is pinned to, e.g. "0-3" or "4,5,6,7"; empty leaves placement to the OS
+STT_WORKER_CPUS = os.getenv("STT_WORKER_CPUS", "")
+# The worker posts its status this often; a worker silent for STATUS_TIMEOUT_INTERVALS of them is unresponsive
+STT_WORKER_STATUS_INTERVAL_SECONDS = float(os.getenv("STT_WORKER_STATUS_INTERVAL_SECONDS", 1.0))
+STATUS_TIMEOUT_INTERVALS = 5
+
+
+def parse_cpu_list(spec: str) -> Set[int]:
+    """"0-3,6" -> {0, 1, 2, 3, 6}"""
+    cpus = set()
+    for part in filter(None, (part.strip() for part in spec.split(","))):
+        start, _, end = part.partition("-")
+        cpus.update(range(int(start), int(end or start) + 1))
+    return cpus
+
+
+def _report_status(results, worker_state: Dict[str, Any], stop: threading.Event):
+    """
+    Post the model status (load stage, failures, last error) as the worker's heartbeat.
+    Starts before torch and transformers are imported, reporting that stage until then.
+    """
+    while not stop.is_set():
+        model = worker_state["model"]
+        if model is None:
+            status = {"state": "loading", "stage": "importing libraries", "progress": 0.0, "error": None,
+                      "load_time": None, "profile": None}
+        else:
+            status = model.status()
+        results.put(("status", None, {**status, "last_error": worker_state["last_error"]}))
+        stop.wait(STT_WORKER_STATUS_INTERVAL_SECONDS)
+
+
+def _worker_main(requests, results, sample_rate: int, cpus: Set[int]):
+    """
+    Entry point of the STT process: loads the model in the background, feeds requests
+    to an in-process BatchingSTTService and posts each result back as it completes.
+    The model status is posted every STT_WORKER_STATUS_INTERVAL_SECONDS meanwhile.
+    """
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+        # One intra-op thread per pinned core unless configured otherwise
+        os.environ.setdefault("STT_NUM_THREADS", str(len(cpus)))
+
+    # The heartbeat starts first: importing torch and transformers takes several seconds
+    worker_state: Dict[str, Any] = {"model": None, "last_error": None}
+    stop_reporting = threading.Event()
+    threading.Thread(target=_report_status, args=(results, worker_state, stop_reporting),
+                     name="stt-worker-status", daemon=True).start()
+
+    from .batching import BatchingSTTService
+    from .main import STTModel
+
+    # Requests queued while loading wait inside the service until the model is ready
+    STTModel.preload()
+    worker_state["model"] = STTModel
+
+    def post_result(done: Future, request_id: int):
+        result = done.result()
+        if not result["success"]:
+            worker_state["last_error"] = result["error"]
+        results.put(("result", request_id, result))
+
+    service = BatchingSTTService(sample_rate=sample_rate)
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, shm_name, length, languages, defer_display_text = request
+        # The client owns the segment and unlinks it once the result is back
+        shm = SharedMemory(name=shm_name)
+        try:
+            audio = np.ndarray((length,), dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+        future = service.submit(audio, languages, defer_display_text)
+        future.add_done_callback(lambda done, request_id=request_id: post_result(done, request_id))
+    service.close()
+    stop_reporting.set()
+
+
+class STTWorkerClient:
+    """
+    Runs STTModel in a dedicated process so the model's memory, threads and crashes
+    stay out of the app process. Audio is written into a shared-memory float32 buffer
+    (only its name goes over the request queue, nothing is pickled); results come back
+    over a result queue. A crashed worker fails its in-flight requests and is
+    restarted on the next submit.
+    """
+
+    def __init__(self, sample_rate: int = 16000, cpus: Optional[Set[int]] = None):
+        self.sample_rate = sample_rate
+        self.cpus = cpus if cpus is not None else parse_cpu_list(STT_WORKER_CPUS)
+        self._context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._process = None
+        self._requests = None
+        self._results = None
+        self._request_ids = itertools.count()
+        # request_id -> (future, shared memory holding its audio)
+        self._pending: Dict[int, Tuple[Future, SharedMemory]] = {}
+        self._status: Dict[str, Any] = {"state": "not_loaded", "stage": None, "progress": 0.0, "error": None,
+                                        "load_time": None, "profile": None, "last_error": None}
+        self._last_heartbeat: Optional[float] = None
+
+    def start(self):
+        """Start the worker process if it is not running (the model loads there in the background)"""
+        with self._lock:
+            if self._process is not None and self._process.is_alive():
+                return
+            if self._process is not None:
+                # Crashed before its result collector noticed; nothing in flight will complete
+                self._fail_pending(f"STT worker exited with code {self._process.exitcode}")
+            self._requests = self._context.Queue()
+            self._results = self._context.Queue()
+            self._process = self._context.Process(target=_worker_main, args=(self._requests, self._results, self.sample_rate, self.cpus),
+                                                  name="stt-worker", daemon=True)
+            self._process.start()
+            self._status = {**self._status, "state": "loading", "stage": "worker process", "error": None}
+            self._last_heartbeat = None
+            threading.Thread(target=self._collect_results, args=(self._process, self._results),
+                             name="stt-worker-results", daemon=True).start()
+
+    def status(self) -> Dict[str, Any]:
+        """
+        State of the model in the worker, with the keys of STTModel.status() plus
+        'alive', 'heartbeat_age' (seconds since the worker last reported) and
+        'last_error' (the most recent failed transcription). A worker that stops
+        reporting is shown as failed; one still starting up has not reported yet.
+        """
+        status = dict(self._status)
+        process = self._process
+        alive = process is not None and process.is_alive()
+        heartbeat_age = time.monotonic() - self._last_heartbeat if alive and self._last_heartbeat else None
+        if heartbeat_age is not None and heartbeat_age > STATUS_TIMEOUT_INTERVALS * STT_WORKER_STATUS_INTERVAL_SECONDS:
+            alive = False
+            status.update(state="failed", error=f"STT worker has not reported for {heartbeat_age:.0f}s")
+        return {**status, "alive": alive, "heartbeat_age": heartbeat_age}
+
+    def submit(self, audio_array: np.ndarray, languages: Optional[Sequence[str]] = None,
+               defer_display_text: bool = False) -> Future:
+        """
+        Queue one mono utterance at the client sample rate; the future yields the result
+        dict. `languages` fixes the decoded targets (default: planned in the worker);
+        `defer_display_text` lets a planned utterance leave hindi_text as None.
+        """
+        self.start()
+        audio = np.ascontiguousarray(audio_array, dtype=np.float32).reshape(-1)
+        shm = SharedMemory(create=True, size=max(audio.nbytes, 1))
+        np.ndarray(audio.shape, dtype=np.float32, buffer=shm.buf)[:] = audio
+        future = Future()
+        with self._lock:
+            request_id = next(self._request_ids)
+            self._pending[request_id] = (future, shm)
+            self._requests.put((request_id, shm.name, len(audio), tuple(languages) if languages else None,
+                                defer_display_text))
+        return future
+
+    def transcribe(self, audio_array: np.ndarray, timeout: Optional[float] = None,
+                   languages: Optional[Sequence[str]] = None) -> Dict[str, Union[str, float, bool]]:
+        """Blocking submit; same result keys as STTModel.transcribe_from_numpy"""
+        start_time = time.perf_counter()
+        result = self.submit(audio_array, languages).result(timeout)
+        return {**result, "processing_time": time.perf_counter() - start_time}
+
+    @staticmethod
+    def _release(shm: SharedMemory):
+        shm.close()
+        shm.unlink()
+
+    def _collect_results(self, process, results):
+        """Resolve futures from the result queue until the worker exits"""
+        while True:
+            try:
+                kind, request_id, payload = results.get(timeout=0.5)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                break
+            if kind == "status":
+                self._status = payload
+                self._last_heartbeat = time.monotonic()
+                continue
+            with self._lock:
+                entry = self._pending.pop(request_id, None)
+            if entry:
+                future, shm = entry
+                self._release(shm)
+                future.set_result(payload)
+
+        with self._lock:
+            if self._process is process:
+                self._fail_pending(f"STT worker exited with code {process.exitcode}")
+
+    def _fail_pending(self, error: str):
+        """Resolve every in-flight request with an error result (caller holds the lock)"""
+        self._status = {**self._status, "state": "failed", "error": error}
+        pending, self._pending = self._pending, {}
+        for future, shm in pending.values():
+            self._release(shm)
+            future.set_result({"text": "", "success": False, "error": error, "processing_time": 0.0})
+
+    def close(self, timeout: float = 10.0):
+        """Stop the worker after it finishes queued requests"""
+        with self._lock:
+            process = self._process
+            if process is None:
+                return
+            self._requests.put(None)
+        process.join(timeout)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+        with self._lock:
+            self._process = None
+            self._status = {**self._status, "state": "not_loaded"}
+            self._last_heartbeat = None
+
+
+_client: Optional[STTWorkerClient] = None
+_client_lock = threading.Lock()
+
+
+def get_worker_client() -> STTWorkerClient:
+    """Process-wide STT worker client, created on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = STTWorkerClient()
+        return _client
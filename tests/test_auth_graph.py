@@ -0,0 +1,97 @@
+import os
+
+os.environ.setdefault("AUTH_CHECKPOINTER", "memory")
+
+import pytest
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.types import Command
+
+from saarthi_assistant.sub_graphs import auth_graph
+
+REGISTRATION = {"first_name": "Asha", "last_name": "Verma", "dob": "1990-01-01", "phone": "9876543210"}
+PII = {"aadhaar": "1234 5678 9012", "address": "12 MG Road"}
+
+
+class FakeIdentityManager:
+    """Login never matches; add_user and encrypt_pii_data fail a set number of times first"""
+
+    def __init__(self, add_user_failures=0, pii_failures=0):
+        self.add_user_failures = add_user_failures
+        self.pii_failures = pii_failures
+        self.logins = 0
+        self.enrollments = []
+        self.stored_pii = {}
+
+    def login(self):
+        self.logins += 1
+        return {"result": False, "error": "Face not recognized"}
+
+    def add_user(self, first_name, dob, phone, last_name=None, reuse_login_capture=False):
+        self.enrollments.append(first_name)
+        if self.add_user_failures:
+            self.add_user_failures -= 1
+            return {"result": False, "error": "Could not store the face template"}
+        return {"result": True, "user_id": "user_1", "message": "User added"}
+
+    def encrypt_pii_data(self, data_type, pii_data):
+        if self.pii_failures:
+            self.pii_failures -= 1
+            raise RuntimeError("vault is locked")
+        self.stored_pii[data_type] = pii_data
+        return {"result": True}
+
+
+@pytest.fixture
+def flow(monkeypatch):
+    """Start a login that needs registration; returns the graph, its config and the fake manager"""
+    def start(**failures):
+        manager = FakeIdentityManager(**failures)
+        monkeypatch.setattr(auth_graph, "get_identity_manager", lambda: manager)
+        graph = auth_graph.create_auth_graph(checkpointer=InMemorySaver())
+        config = {"configurable": {"thread_id": "auth_test"}}
+        result = graph.invoke({}, config=config)
+        assert "registration required" in result["notes"]
+        return graph, config, manager
+    return start
+
+
+def resume(graph, config, value):
+    # Same guard as AuthGraphRunner._resume
+    interrupts = graph.get_state(config).interrupts
+    assert interrupts, "session is not waiting for input"
+    return graph.invoke(Command(resume=value), config=config)
+
+
+def test_failed_enrollment_returns_to_the_registration_form(flow):
+    graph, config, manager = flow(add_user_failures=1)
+
+    result = resume(graph, config, REGISTRATION)
+    assert not result["auth_result"]
+    assert result["notes"] == "Registration failed: Could not store the face template"
+    # Paused on the registration form again, with the error for the user
+    (pending,) = graph.get_state(config).interrupts
+    assert pending.value == {"type": "registration", "notes": result["notes"],
+                             "error": "Could not store the face template"}
+
+    result = resume(graph, config, REGISTRATION)
+    assert "pii collection required" in result["notes"].lower()
+    result = resume(graph, config, PII)
+    assert result["auth_result"] and result["pii_collection_complete"]
+    # The retry enrolled again without another face capture
+    assert manager.enrollments == ["Asha", "Asha"] and manager.logins == 1
+    assert manager.stored_pii == PII
+
+
+def test_failed_pii_write_returns_to_the_pii_form(flow):
+    graph, config, manager = flow(pii_failures=1)
+    resume(graph, config, REGISTRATION)
+
+    result = resume(graph, config, PII)
+    assert not result["auth_result"] and not result.get("pii_collection_complete")
+    (pending,) = graph.get_state(config).interrupts
+    assert pending.value["type"] == "pii" and pending.value["error"] == "vault is locked"
+
+    result = resume(graph, config, PII)
+    assert result["auth_result"] and result["pii_collection_complete"]
+    assert manager.stored_pii == PII
+    assert not graph.get_state(config).interrupts
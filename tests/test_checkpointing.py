@@ -0,0 +1,108 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, List
+
+from typing_extensions import TypedDict
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph import StateGraph, START, END, add_messages
+
+from saarthi_assistant.sub_graphs.checkpointing import ThreadLocalSqliteSaver
+
+THREADS = 8
+TURNS = 3
+LOAD_SECONDS = 0.05
+
+
+class SlowSerializer(JsonPlusSerializer):
+    """Deserializing takes LOAD_SECONDS; records how many loads were in flight at once"""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.loads = 0
+
+    def loads_typed(self, data):
+        with self._lock:
+            self.in_flight += 1
+            self.loads += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(LOAD_SECONDS)
+            return super().loads_typed(data)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class SessionState(TypedDict):
+    messages: Annotated[List, add_messages]
+    steps: int
+
+
+def respond(state: SessionState) -> SessionState:
+    return {"messages": [AIMessage(content=f"reply {state['steps']}")], "steps": state["steps"] + 1}
+
+
+def build_graph(checkpointer):
+    builder = StateGraph(SessionState)
+    builder.add_node("respond", respond)
+    builder.add_edge(START, "respond")
+    builder.add_edge("respond", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def run_sessions(checkpointer):
+    """One session per thread; returns each thread's final state and connection, and the wall time"""
+    graph = build_graph(checkpointer)
+    start_barrier = threading.Barrier(THREADS)
+
+    def session(index: int):
+        config = {"configurable": {"thread_id": f"session_{index}"}}
+        start_barrier.wait()
+        for turn in range(TURNS):
+            graph.invoke({"messages": [("user", f"turn {turn}")], "steps": turn}, config)
+        return graph.get_state(config).values, checkpointer.conn
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = list(pool.map(session, range(THREADS)))
+    return results, time.perf_counter() - started_at
+
+
+def test_parallel_sessions_do_not_serialize(tmp_path):
+    serde = SlowSerializer()
+    saver = ThreadLocalSqliteSaver(str(tmp_path / "checkpoints.db"), serde=serde)
+    try:
+        results, elapsed = run_sessions(saver)
+
+        for values, _ in results:
+            assert values["steps"] == TURNS and len(values["messages"]) == 2 * TURNS
+        # Every thread used its own connection, none of them the constructing thread's
+        connections = [conn for _, conn in results]
+        assert len({id(conn) for conn in connections}) == THREADS
+        assert saver.conn not in connections
+
+        # Checkpoint reads ran side by side: well under the time they take back to back
+        assert serde.max_in_flight > 1
+        assert elapsed < 0.5 * serde.loads * LOAD_SECONDS
+    finally:
+        saver.close()
+
+
+def test_shared_connection_saver_serializes(tmp_path):
+    # Control for the test above: the stock saver holds one lock around every read
+    serde = SlowSerializer()
+    conn = sqlite3.connect(str(tmp_path / "checkpoints.db"), check_same_thread=False)
+    try:
+        results, elapsed = run_sessions(SqliteSaver(conn, serde=serde))
+        assert all(values["steps"] == TURNS for values, _ in results)
+        assert serde.max_in_flight == 1
+        assert elapsed >= serde.loads * LOAD_SECONDS
+    finally:
+        conn.close()
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from saarthi_assistant.voice.long_form import _normalize, merge_overlap, plan_windows
+
+SAMPLE_RATE = 16000
+
+
+def tone(seconds: float, amplitude: float = 0.1) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def silence(seconds: float) -> np.ndarray:
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+
+def check_windows(windows, total, window_seconds, sample_rate=SAMPLE_RATE):
+    """Windows cover the recording in order, each at most window_seconds long"""
+    assert windows[0][0] == 0 and windows[-1][1] == total
+    for (start, end), (next_start, next_end) in zip(windows, windows[1:]):
+        assert start < next_start and end <= next_end
+        assert next_start <= end
+    for start, end in windows:
+        assert 0 < end - start <= window_seconds * sample_rate
+
+
+def test_plan_windows_short_audio_is_one_window():
+    audio = tone(3)
+    assert plan_windows(audio, SAMPLE_RATE, window_seconds=10) == [(0, len(audio))]
+    assert plan_windows(silence(0), SAMPLE_RATE, window_seconds=10) == [(0, 0)]
+
+
+def test_plan_windows_exactly_one_window():
+    audio = tone(10)
+    assert plan_windows(audio, SAMPLE_RATE, window_seconds=10) == [(0, 10 * SAMPLE_RATE)]
+
+
+def test_plan_windows_cuts_in_pauses():
+    # 3 s of speech then 0.5 s of pause, repeated: one minute in all
+    pauses = []
+    chunks = []
+    offset = 0
+    for _ in range(17):
+        chunks += [tone(3), silence(0.5)]
+        offset += 3 * SAMPLE_RATE
+        pauses.append((offset, offset + SAMPLE_RATE // 2))
+        offset += SAMPLE_RATE // 2
+    audio = np.concatenate(chunks)
+
+    windows = plan_windows(audio, SAMPLE_RATE, window_seconds=10, overlap_seconds=1.0)
+    check_windows(windows, len(audio), 10)
+    assert len(windows) >= 6
+    for (_, end), (next_start, _) in zip(windows, windows[1:]):
+        # Neighbours share overlap_seconds around a cut placed in a pause
+        assert end - next_start == SAMPLE_RATE
+        cut = (end + next_start) // 2
+        assert any(pause_start <= cut < pause_end for pause_start, pause_end in pauses)
+
+
+def test_plan_windows_all_silence():
+    audio = silence(45)
+    windows = plan_windows(audio, SAMPLE_RATE, window_seconds=10, overlap_seconds=1.0)
+    check_windows(windows, len(audio), 10)
+    # No pause to prefer: each cut falls at the middle of its window
+    assert len(windows) == 9
+
+
+def test_plan_windows_progresses_when_overlap_exceeds_window():
+    sample_rate = 1000
+    audio = np.zeros(3 * sample_rate, dtype=np.float32)
+    windows = plan_windows(audio, sample_rate, window_seconds=1, overlap_seconds=2.5)
+    check_windows(windows, len(audio), 1, sample_rate)
+    # The overlap is capped at half a window
+    assert all(end - next_start <= sample_rate // 2 for (_, end), (next_start, _) in zip(windows, windows[1:]))
+
+
+def test_normalize_keeps_devanagari_marks():
+    # काम (work) and कम (less) differ only by the ा matra
+    assert _normalize("काम") != _normalize("कम")
+    assert _normalize("क्या?") == "क्या"
+    assert _normalize("Hello,") == _normalize("hello")
+
+
+@pytest.mark.parametrize("previous, following, expected", [
+    ("मुझे यह काम", "काम करना है", "करना है"),
+    ("मुझे यह कम", "काम करना है", "काम करना है"),
+    ("my phone number is", "Number is nine", "nine"),
+    ("hello there", "general kenobi", "general kenobi"),
+])
+def test_merge_overlap(previous, following, expected):
+    assert merge_overlap(previous, following) == expected
@@ -0,0 +1,163 @@
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from saarthi_assistant.voice.main import StreamingTranscriber
+from saarthi_assistant.voice.vad import UtteranceSegmenter
+
+SAMPLE_RATE = 16000
+FRAME = SAMPLE_RATE * 30 // 1000
+
+
+def tone(frames: int) -> np.ndarray:
+    t = np.arange(frames * FRAME) / SAMPLE_RATE
+    return (0.1 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def silence(frames: int) -> np.ndarray:
+    return np.zeros(frames * FRAME, dtype=np.float32)
+
+
+def feed(target, audio: np.ndarray, chunk: int = 1000):
+    """Feed in chunks that do not line up with frames, as a microphone callback would"""
+    for start in range(0, len(audio), chunk):
+        target(audio[start:start + chunk])
+
+
+class FakeSTT:
+    """submit() stand-in: records each segment and returns an already completed future"""
+
+    def __init__(self, hindi_text=True, fail_segment=None):
+        self.segments = []
+        self.hindi_text = hindi_text
+        self.fail_segment = fail_segment
+
+    def __call__(self, audio: np.ndarray) -> Future:
+        index = len(self.segments)
+        self.segments.append(audio)
+        future = Future()
+        if index == self.fail_segment:
+            future.set_result({"text": "", "success": False, "error": "boom", "processing_time": 0.0})
+        else:
+            future.set_result({"text": f"english {index}", "hindi_text": f"hindi {index}" if self.hindi_text else None,
+                               "language": "hin", "success": True, "error": None, "processing_time": 0.0})
+        return future
+
+
+def frames(start: int, end: int) -> slice:
+    return slice(start * FRAME, end * FRAME)
+
+
+def test_stream_cuts_segments_at_pauses():
+    # 20 silent frames, 100 speech, a 20-frame pause, 50 speech, 5 silent
+    audio = np.concatenate([silence(20), tone(100), silence(20), tone(50), silence(5)])
+    stt = FakeSTT()
+    stream = StreamingTranscriber(SAMPLE_RATE, submit=stt)
+    feed(stream.feed, audio)
+    # The first segment was handed off at the pause, while "recording" continued
+    assert stream.segments == 1
+
+    result = stream.finish()
+    first, second = stt.segments
+    # 7 frames of pre-roll (ending in the onset), the speech, then half the 10-frame pause as its tail
+    np.testing.assert_array_equal(first, audio[frames(14, 125)])
+    # The last segment is flushed by finish() up to its last voiced frame
+    np.testing.assert_array_equal(second, audio[frames(134, 190)])
+    assert result == {**result, "text": "english 0 english 1", "hindi_text": "hindi 0 hindi 1",
+                      "language": "hin", "success": True, "error": None, "segments": 2}
+
+
+def test_stream_keeps_short_pauses_inside_a_segment():
+    # The pause comes before min_segment_seconds of audio, so nothing is cut
+    audio = np.concatenate([silence(20), tone(20), silence(15), tone(20), silence(5)])
+    stt = FakeSTT()
+    stream = StreamingTranscriber(SAMPLE_RATE, submit=stt)
+    feed(stream.feed, audio)
+    result = stream.finish()
+    np.testing.assert_array_equal(stt.segments[0], audio[frames(14, 75)])
+    assert result["segments"] == 1 and result["text"] == "english 0"
+
+
+def test_stream_cuts_hard_at_max_segment_length():
+    audio = np.concatenate([silence(20), tone(450)])
+    stt = FakeSTT()
+    stream = StreamingTranscriber(SAMPLE_RATE, submit=stt)
+    feed(stream.feed, audio)
+    stream.finish()
+    first, second = stt.segments
+    assert len(first) == 400 * FRAME
+    np.testing.assert_array_equal(first, audio[frames(14, 414)])
+    np.testing.assert_array_equal(second, audio[frames(414, 470)])
+
+
+def test_stream_hindi_text_is_none_when_any_segment_deferred_it():
+    audio = np.concatenate([silence(20), tone(100), silence(20), tone(50)])
+    stream = StreamingTranscriber(SAMPLE_RATE, submit=FakeSTT(hindi_text=False))
+    feed(stream.feed, audio)
+    result = stream.finish()
+    assert result["text"] == "english 0 english 1"
+    assert result["hindi_text"] is None
+
+
+def test_stream_reports_a_failed_segment():
+    audio = np.concatenate([silence(20), tone(100), silence(20), tone(50)])
+    stream = StreamingTranscriber(SAMPLE_RATE, submit=FakeSTT(fail_segment=1))
+    feed(stream.feed, audio)
+    result = stream.finish()
+    assert not result["success"] and result["error"] == "boom"
+    assert result["text"] == "english 0"
+
+
+def test_stream_without_speech_submits_nothing():
+    stt = FakeSTT()
+    stream = StreamingTranscriber(SAMPLE_RATE, submit=stt)
+    feed(stream.feed, silence(100))
+    result = stream.finish()
+    assert stt.segments == []
+    assert result["text"] == "" and result["hindi_text"] == "" and result["segments"] == 0
+    with pytest.raises(RuntimeError):
+        stream.feed(silence(1))
+
+
+def push_frames(segmenter: UtteranceSegmenter, audio: np.ndarray) -> int:
+    """Push frame by frame until the segmenter is done; returns the frames consumed"""
+    for index in range(len(audio) // FRAME):
+        if segmenter.push(audio[frames(index, index + 1)]):
+            return index + 1
+    return len(audio) // FRAME
+
+
+def test_segmenter_ends_after_trailing_silence():
+    audio = np.concatenate([silence(10), tone(40), silence(30)])
+    segmenter = UtteranceSegmenter(SAMPLE_RATE, trailing_silence_seconds=0.6, max_duration_seconds=10,
+                                   start_timeout_seconds=5, pre_roll_seconds=0.3)
+    assert push_frames(segmenter, audio) == 70
+    assert segmenter.started and segmenter.done
+    # Pre-roll (all 10 silent frames fit) up to the last speech frame
+    np.testing.assert_array_equal(segmenter.utterance(), audio[frames(0, 50)])
+    assert segmenter.duration == pytest.approx(2.1)
+
+
+def test_segmenter_ignores_blips_shorter_than_min_speech():
+    audio = np.concatenate([silence(10), tone(2), silence(10), tone(40), silence(30)])
+    segmenter = UtteranceSegmenter(SAMPLE_RATE, trailing_silence_seconds=0.6, max_duration_seconds=10,
+                                   start_timeout_seconds=5, pre_roll_seconds=0.3)
+    push_frames(segmenter, audio)
+    # Starts at the real onset: 10 frames of pre-roll plus the 3 frames that confirmed speech
+    np.testing.assert_array_equal(segmenter.utterance(), audio[frames(12, 62)])
+
+
+def test_segmenter_stops_at_max_duration():
+    segmenter = UtteranceSegmenter(SAMPLE_RATE, trailing_silence_seconds=0.6, max_duration_seconds=1.5,
+                                   start_timeout_seconds=5, pre_roll_seconds=0.3)
+    push_frames(segmenter, np.concatenate([silence(10), tone(200)]))
+    assert segmenter.done and len(segmenter.utterance()) == 50 * FRAME
+
+
+def test_segmenter_times_out_without_speech():
+    segmenter = UtteranceSegmenter(SAMPLE_RATE, trailing_silence_seconds=0.6, max_duration_seconds=10,
+                                   start_timeout_seconds=1.0)
+    assert push_frames(segmenter, silence(100)) == 33
+    assert segmenter.done and not segmenter.started
+    assert segmenter.utterance().size == 0